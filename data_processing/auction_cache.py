@@ -0,0 +1,177 @@
+"""
+竞价数据持久化缓存
+按 (股票代码, 日期, 数据来源) 保存提取出的竞价数据以及 9:15-9:30 的分笔序列（zlib 压缩），
+存放在 full_stock_data/auction_cache.db。历史日期的数据收盘后不会再变化，永久有效；
+当天的数据只在短时间内有效。缓存条数超过上限时按最近访问时间淘汰
+"""
+
+import os
+import json
+import time
+import zlib
+import sqlite3
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# 当天数据的有效期（秒），竞价期间数据仍在变化
+TODAY_TTL_SECONDS = 60
+
+# 缓存条数上限，超过后按最近访问时间淘汰
+MAX_ENTRIES = 200000
+
+
+def _default_data_dir():
+    """项目根目录下的 full_stock_data"""
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(project_root, "full_stock_data")
+
+
+def _pack(ticks) -> Optional[bytes]:
+    if ticks is None:
+        return None
+    return zlib.compress(json.dumps(ticks, ensure_ascii=False).encode('utf-8'))
+
+
+def _unpack(blob) -> Optional[List[Dict]]:
+    if blob is None:
+        return None
+    return json.loads(zlib.decompress(blob).decode('utf-8'))
+
+
+class AuctionCache:
+    def __init__(self, data_dir=None, max_entries: int = MAX_ENTRIES):
+        if data_dir is None:
+            data_dir = _default_data_dir()
+        self.db_path = os.path.join(data_dir, "auction_cache.db")
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.init_table()
+
+    def _connect(self):
+        # 并发获取时多个线程可能同时写入，等待锁释放而不是立即失败
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def init_table(self):
+        """初始化数据表"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS auction_cache (
+                code TEXT,
+                date TEXT,
+                source TEXT,
+                auction TEXT,
+                ticks BLOB,
+                fetched_at REAL,
+                expires_at REAL,
+                last_access REAL,
+                PRIMARY KEY (code, date, source)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_auction_cache_access ON auction_cache (last_access)')
+        conn.commit()
+        conn.close()
+
+    # ------------------------------------------------------------------ 读取
+
+    def get_many(self, stock_codes: List[str], date_str: str, source: str = 'minute') -> Dict[str, Dict]:
+        """
+        批量查询缓存
+        :return: {股票代码: {'auction': 竞价数据, 'ticks': 分笔序列或None}}，只包含命中的股票
+        """
+        stock_codes = list(dict.fromkeys(stock_codes))
+        if not stock_codes:
+            return {}
+        now = time.time()
+        placeholders = ','.join('?' * len(stock_codes))
+        conn = self._connect()
+        rows = conn.execute(
+            f"SELECT code, auction, ticks, expires_at FROM auction_cache "
+            f"WHERE date = ? AND source = ? AND code IN ({placeholders})",
+            [date_str, source] + stock_codes).fetchall()
+
+        result = {}
+        for code, auction, ticks, expires_at in rows:
+            if expires_at is not None and expires_at < now:
+                continue
+            result[code] = {'auction': json.loads(auction), 'ticks': _unpack(ticks)}
+        if result:
+            with conn:
+                conn.executemany("UPDATE auction_cache SET last_access = ? WHERE code = ? AND date = ? AND source = ?",
+                                 [(now, code, date_str, source) for code in result])
+        conn.close()
+
+        self.hits += len(result)
+        self.misses += len(stock_codes) - len(result)
+        return result
+
+    def get(self, stock_code: str, date_str: str, source: str = 'minute') -> Optional[Dict]:
+        """查询单只股票的缓存，未命中或已过期返回None"""
+        return self.get_many([stock_code], date_str, source).get(stock_code)
+
+    def get_auction(self, stock_code: str, date_str: str, source: str = 'minute') -> Optional[Dict]:
+        """只取竞价数据，未命中返回None"""
+        entry = self.get(stock_code, date_str, source)
+        return entry['auction'] if entry else None
+
+    # ------------------------------------------------------------------ 写入
+
+    def put_many(self, entries: Dict[str, Dict], date_str: str, source: str = 'minute'):
+        """
+        批量写入缓存
+        :param entries: {股票代码: {'auction': 竞价数据, 'ticks': 分笔序列（可选）}}
+        """
+        if not entries:
+            return
+        now = time.time()
+        # 当天的数据还会变化，只短时间有效；历史数据永久有效
+        expires_at = now + TODAY_TTL_SECONDS if date_str >= datetime.now().strftime('%Y-%m-%d') else None
+        rows = [
+            (code, date_str, source, json.dumps(entry['auction'], ensure_ascii=False, default=str),
+             _pack(entry.get('ticks')), now, expires_at, now)
+            for code, entry in entries.items()
+        ]
+        conn = self._connect()
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO auction_cache VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        conn.close()
+        self.evict()
+
+    def put(self, stock_code: str, date_str: str, auction: Dict, ticks: List[Dict] = None, source: str = 'minute'):
+        """写入单只股票的缓存"""
+        self.put_many({stock_code: {'auction': auction, 'ticks': ticks}}, date_str, source)
+
+    def evict(self) -> int:
+        """删除已过期的条目，条数仍超过上限时按最近访问时间淘汰最久未用的条目"""
+        conn = self._connect()
+        with conn:
+            removed = conn.execute("DELETE FROM auction_cache WHERE expires_at IS NOT NULL AND expires_at < ?",
+                                   (time.time(),)).rowcount
+            count = conn.execute("SELECT COUNT(*) FROM auction_cache").fetchone()[0]
+            if count > self.max_entries:
+                removed += conn.execute(
+                    "DELETE FROM auction_cache WHERE (code, date, source) IN "
+                    "(SELECT code, date, source FROM auction_cache ORDER BY last_access LIMIT ?)",
+                    (count - self.max_entries,)).rowcount
+        conn.close()
+        return removed
+
+    def stats(self) -> Dict:
+        """缓存统计：条目数、本进程命中/未命中次数"""
+        conn = self._connect()
+        count = conn.execute("SELECT COUNT(*) FROM auction_cache").fetchone()[0]
+        conn.close()
+        return {'entries': count, 'hits': self.hits, 'misses': self.misses}
+
+
+def main():
+    """命令行：清理过期条目并显示缓存条目数"""
+    import sys
+    cache = AuctionCache(sys.argv[1] if len(sys.argv) > 1 else None)
+    removed = cache.evict()
+    print(f"竞价缓存: {cache.stats()['entries']} 条，本次清理 {removed} 条，数据库: {cache.db_path}")
+
+
+if __name__ == "__main__":
+    main()
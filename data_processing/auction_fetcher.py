@@ -0,0 +1,226 @@
+"""
+集合竞价数据批量获取
+通过复用连接的 requests.Session 并发请求本地分笔接口（/api/minute-trade-all），
+并发数有上限，单个请求和整批请求都有截止时间，超时或失败的股票留空由调用方回退处理，
+结果整理为以股票代码为索引的竞价价格/成交量表。
+传入 AuctionCache 时先查本地缓存，只请求未命中的股票，并把结果和 9:15-9:30 分笔写回缓存；
+同一次请求的全天分笔同时聚合为1分钟K线写入缓存，供回测按分钟撮合
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+# 本地分笔数据接口
+AUCTION_API_URL = "http://localhost:8080/api/minute-trade-all"
+
+# 竞价表的列
+AUCTION_COLUMNS = ['time', 'price', 'volume', 'direction', 'order']
+
+# 集合竞价撮合后的时段
+AUCTION_MINUTES = ('T09:25:', 'T09:26:', 'T09:27:', 'T09:28:', 'T09:29:')
+
+# 写入缓存的分笔时段（9:15-9:30）
+AUCTION_WINDOW = ('09:15:00', '09:30:59')
+
+# 缓存中的数据来源标识
+CACHE_SOURCE = 'minute-trade-all'
+
+# 缓存中1分钟K线的数据来源标识（ticks 列保存 [时间HH:MM, 开, 高, 低, 收, 成交量] 列表）
+MINUTE_SOURCE = 'minute-bars'
+
+
+def _trade_to_auction(trade: Dict) -> Dict:
+    """分笔记录 -> 竞价数据（价格单位为厘，成交量单位为手）"""
+    return {
+        'time': trade.get('Time', ''),
+        'price': trade.get('Price', 0) / 1000,
+        'volume': trade.get('Volume', 0) * 100,
+        'direction': 'B' if trade.get('Status') == 1 else 'S',
+        'order': trade.get('Number', 0),
+    }
+
+
+def auction_window_trades(trade_list: List[Dict]) -> List[Dict]:
+    """取 9:15-9:30 之间的分笔记录（Time 形如 2025-01-02T09:25:00）"""
+    start, end = AUCTION_WINDOW
+    return [t for t in trade_list if start <= t.get('Time', '')[11:19] <= end]
+
+
+def minute_bars(trade_list: List[Dict]) -> List[List]:
+    """把全天分笔聚合为1分钟K线：[[HH:MM, 开, 高, 低, 收, 成交量(股)], ...]，按时间升序"""
+    bars = []
+    for trade in trade_list:
+        minute = trade.get('Time', '')[11:16]
+        price = trade.get('Price', 0) / 1000
+        volume = trade.get('Volume', 0) * 100
+        if not minute or price <= 0:
+            continue
+        if bars and bars[-1][0] == minute:
+            bar = bars[-1]
+            bar[2] = max(bar[2], price)
+            bar[3] = min(bar[3], price)
+            bar[4] = price
+            bar[5] += volume
+        else:
+            bars.append([minute, price, price, price, price, volume])
+    return bars
+
+
+def extract_auction(trade_list: List[Dict]) -> Optional[Dict]:
+    """
+    从当日分笔列表中取竞价数据
+    优先取 9:25-9:29 的最后一笔，其次取 9 点时段的最后一笔，最后取整个列表的最后一笔
+    """
+    if not trade_list:
+        return None
+    auction_trades = [t for t in trade_list if any(m in t.get('Time', '') for m in AUCTION_MINUTES)]
+    if auction_trades:
+        return _trade_to_auction(auction_trades[-1])
+    morning_trades = [t for t in trade_list if 'T09:' in t.get('Time', '')]
+    if morning_trades:
+        return _trade_to_auction(morning_trades[-1])
+    return _trade_to_auction(trade_list[-1])
+
+
+class AuctionFetcher:
+    """
+    并发竞价数据获取器
+    :param max_workers: 最大并发请求数（同时也是连接池大小）
+    :param timeout: 单个请求的超时时间（秒）
+    :param deadline: 整批请求的截止时间（秒），到期未返回的股票视为缺失
+    :param cache: 可选的 AuctionCache，命中时不再请求接口
+    """
+
+    def __init__(self, api_url: str = AUCTION_API_URL, max_workers: int = 16,
+                 timeout: float = 3.0, deadline: float = 8.0, cache=None):
+        self.api_url = api_url
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.deadline = deadline
+        self.cache = cache
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _params(self, stock_code: str, date_str: str) -> Dict:
+        # 当天的数据不带日期参数，接口返回实时数据
+        params = {'code': stock_code}
+        if date_str != datetime.now().strftime('%Y-%m-%d'):
+            params['date'] = date_str.replace('-', '')
+        return params
+
+    def _fetch_remote(self, stock_code: str, date_str: str) -> Optional[Dict]:
+        """
+        请求接口获取单只股票的竞价数据，失败返回None
+        :return: {'auction': 竞价数据, 'ticks': 9:15-9:30 分笔, 'bars': 全天1分钟K线}
+        """
+        try:
+            response = self.session.get(self.api_url, params=self._params(stock_code, date_str), timeout=self.timeout)
+            if response.status_code != 200:
+                print(f"竞价接口请求失败，状态码: {response.status_code}，股票 {stock_code} 在 {date_str}")
+                return None
+            data = response.json()
+            trade_list = (data.get('data') or {}).get('List')
+            if trade_list is None:
+                print(f"竞价接口返回格式错误，缺少'data.List'字段，股票 {stock_code} 在 {date_str}")
+                return None
+            auction = extract_auction(trade_list)
+            if auction is None:
+                return None
+            return {'auction': auction, 'ticks': auction_window_trades(trade_list), 'bars': minute_bars(trade_list)}
+        except (requests.RequestException, ValueError) as e:
+            print(f"竞价接口调用异常，股票 {stock_code} 在 {date_str}: {e}")
+            return None
+
+    def fetch_one(self, stock_code: str, date_str: str) -> Optional[Dict]:
+        """获取单只股票的竞价数据（优先读缓存），失败返回None"""
+        if self.cache is not None:
+            cached = self.cache.get_auction(stock_code, date_str, CACHE_SOURCE)
+            if cached is not None:
+                return cached
+        entry = self._fetch_remote(stock_code, date_str)
+        if entry is None:
+            return None
+        self._cache_entries({stock_code: entry}, date_str)
+        return entry['auction']
+
+    def _cache_entries(self, entries: Dict[str, Dict], date_str: str):
+        """把接口结果写入缓存：竞价数据+竞价分笔，以及竞价数据+1分钟K线"""
+        if self.cache is None or not entries:
+            return
+        self.cache.put_many(entries, date_str, CACHE_SOURCE)
+        self.cache.put_many({code: {'auction': entry['auction'], 'ticks': entry['bars']}
+                             for code, entry in entries.items()}, date_str, MINUTE_SOURCE)
+
+    def _fetch_missing(self, stock_codes: List[str], date_str: str):
+        """
+        并发请求接口并写入缓存，整批截止时间到达后不再等待
+        :return: ({股票代码: 接口结果}, 超时的股票数)
+        """
+        if not stock_codes:
+            return {}, 0
+        executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(stock_codes)))
+        futures = {executor.submit(self._fetch_remote, code, date_str): code for code in stock_codes}
+        done, not_done = wait(futures, timeout=self.deadline)
+        # 截止时间到达后不再等待未完成的请求
+        executor.shutdown(wait=False, cancel_futures=True)
+
+        fetched = {}
+        for future in done:
+            result = future.result()
+            if result is not None:
+                fetched[futures[future]] = result
+        self._cache_entries(fetched, date_str)
+        return fetched, len(not_done)
+
+    def fetch_batch(self, stock_codes: List[str], date_str: str) -> pd.DataFrame:
+        """
+        并发获取一批股票的竞价数据（也用于批量预取到缓存）
+        :return: 以股票代码为索引、列为 time/price/volume/direction/order 的DataFrame，
+                 只包含成功获取的股票；超时或失败的股票不在表中
+        """
+        stock_codes = list(dict.fromkeys(stock_codes))
+        if not stock_codes:
+            return pd.DataFrame(columns=AUCTION_COLUMNS)
+
+        start_time = time.time()
+        records = {}
+        if self.cache is not None:
+            cached = self.cache.get_many(stock_codes, date_str, CACHE_SOURCE)
+            records = {code: entry['auction'] for code, entry in cached.items()}
+        missing = [code for code in stock_codes if code not in records]
+
+        fetched, timed_out = self._fetch_missing(missing, date_str)
+        records.update((code, entry['auction']) for code, entry in fetched.items())
+
+        print(f"批量获取竞价数据完成：{len(stock_codes)} 只股票，缓存命中 {len(stock_codes) - len(missing)} 只，"
+              f"成功 {len(records)} 只，超时 {timed_out} 只，耗时 {time.time() - start_time:.2f}秒")
+        table = pd.DataFrame.from_dict(records, orient='index', columns=AUCTION_COLUMNS).sort_index()
+        table.index.name = 'code'
+        return table
+
+    def fetch_minute_bars(self, stock_codes: List[str], date_str: str) -> Dict[str, Dict]:
+        """
+        获取一批股票某日的竞价数据和1分钟K线（优先读缓存，未命中的并发请求并写入缓存）
+        :return: {股票代码: {'auction': 竞价数据, 'bars': 1分钟K线}}，只包含成功获取的股票
+        """
+        stock_codes = list(dict.fromkeys(stock_codes))
+        result = {}
+        if self.cache is not None:
+            cached = self.cache.get_many(stock_codes, date_str, MINUTE_SOURCE)
+            result = {code: {'auction': entry['auction'], 'bars': entry['ticks'] or []}
+                      for code, entry in cached.items()}
+        fetched, _ = self._fetch_missing([code for code in stock_codes if code not in result], date_str)
+        result.update((code, {'auction': entry['auction'], 'bars': entry['bars']}) for code, entry in fetched.items())
+        return result
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,132 @@
+"""
+日线数据的标准格式
+定义日线CSV的标准列、列顺序和数据类型，以及各数据源出现过的列名到标准列的映射。
+标准格式的CSV（表头与 CANONICAL_COLUMNS 完全一致、按日期升序且无重复日期）由 read_bars 直接按列和类型读取，
+不再逐次重命名、推断类型、去重排序；旧格式文件（中英文列混杂、money/amount 并存）回退到标准化后再读取，
+并可由数据目录的迁移（DataCatalog.migrate）一次性改写为标准格式
+"""
+
+import os
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+# 标准格式版本（数据目录中记录每个文件的格式版本，旧格式为1）
+SCHEMA_VERSION = 2
+LEGACY_SCHEMA_VERSION = 1
+
+# 标准列及其内存中的类型：date 为 1970-01-01 起的天数（dates='days' 时），成交量 int64，
+# 其余保留 float64 以与CSV中的数值完全一致（撮合价格、列式存储、格式迁移都依赖精确值；
+# 选股和Web应用读取列式存储和 float32 的行情面板，不直接读CSV，因此这里不再另设 float32 的紧凑类型）
+BAR_SCHEMA = {
+    'date': np.int32,
+    'open': np.float64,
+    'high': np.float64,
+    'low': np.float64,
+    'close': np.float64,
+    'volume': np.int64,
+    'amount': np.float64,
+    'amplitude': np.float64,
+    'pct_change': np.float64,
+    'change': np.float64,
+    'turnover': np.float64,
+}
+
+CANONICAL_COLUMNS = list(BAR_SCHEMA)
+
+# 各数据源出现过的列名 -> 标准列名，同一标准列的多个别名按顺序合并（先出现的优先）
+COLUMN_ALIASES = {
+    'date': ['date', '日期'],
+    'open': ['open', '开盘', '开　盘', '开　　盘'],
+    'high': ['high', '最高', '最　高', '最　　高'],
+    'low': ['low', '最低', '最　低', '最　　低'],
+    'close': ['close', '收盘', '收　盘', '收　　盘'],
+    'volume': ['volume', '成交量', '成　交　量', '成　　交　量'],
+    'amount': ['amount', 'money', '成交额', '成　交　额', '成　　交　额'],
+    'amplitude': ['amplitude', '振幅', '振　幅', '振　　幅'],
+    'pct_change': ['pct_change', '涨跌幅', '涨　跌　幅', '涨　　跌　　幅'],
+    'change': ['change', '涨跌额', '涨　跌　额', '涨　　跌　　额'],
+    'turnover': ['turnover', '换手率', '换　手　率', '换　　手　　率'],
+}
+
+
+def read_header(path: str) -> List[str]:
+    """CSV的表头"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.readline().rstrip('\r\n').split(',')
+
+
+def is_canonical(columns: List[str]) -> bool:
+    """表头是否为标准格式"""
+    return list(columns) == CANONICAL_COLUMNS
+
+
+def normalize_bar_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    将原始日线数据统一为标准英文列
+    同一字段在文件中可能同时存在中英文两列（其中一列大量为空），按别名顺序合并
+    """
+    result = pd.DataFrame(index=df.index)
+    for field, aliases in COLUMN_ALIASES.items():
+        present = [col for col in aliases if col in df.columns]
+        if not present:
+            result[field] = np.nan
+            continue
+        series = df[present[0]]
+        for col in present[1:]:
+            series = series.fillna(df[col])
+        result[field] = series
+    return result
+
+
+def to_canonical(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    任意来源的日线 -> 标准列（date 为 datetime，按日期升序，同一日期保留最后一行）
+    数值列只做数值化，不改变精度；缺失的成交量按0处理
+    """
+    df = normalize_bar_columns(df)
+    df['date'] = pd.to_datetime(df['date'], errors='coerce')
+    df = df.dropna(subset=['date'])
+    df = df.drop_duplicates(subset=['date'], keep='last').sort_values('date')
+    for field in CANONICAL_COLUMNS[1:]:
+        df[field] = pd.to_numeric(df[field], errors='coerce')
+    df['volume'] = df['volume'].fillna(0)
+    return df.reset_index(drop=True)
+
+
+def _finish(df: pd.DataFrame, columns: List[str], dates: str) -> pd.DataFrame:
+    if dates == 'days':
+        df['date'] = df['date'].values.astype('datetime64[D]').astype(np.int64).astype(BAR_SCHEMA['date'])
+    for field in columns:
+        if field != 'date' and df[field].dtype != BAR_SCHEMA[field]:
+            df[field] = df[field].astype(BAR_SCHEMA[field])
+    return df[columns]
+
+
+def read_bars(path: str, columns: List[str] = None, dates: str = 'datetime') -> pd.DataFrame:
+    """
+    读取日线CSV（唯一的日线文件读取入口）
+    :param columns: 需要的标准列（date 总会包含），默认全部；如只需日期时只解析日期列
+    :param dates: 'datetime' 返回 datetime 列，'days' 返回 int32 天数
+    :return: 按日期升序的标准列
+    """
+    columns = ['date'] + [col for col in (columns or CANONICAL_COLUMNS) if col != 'date']
+    if is_canonical(read_header(path)):
+        # 标准格式：只解析需要的列，类型直接指定，无需重命名和去重排序
+        df = pd.read_csv(path, usecols=columns, dtype={col: BAR_SCHEMA[col] for col in columns if col != 'date'},
+                         engine='c')
+        df['date'] = pd.to_datetime(df['date'], format='%Y-%m-%d')
+    else:
+        df = to_canonical(pd.read_csv(path))
+    return _finish(df, columns, dates)
+
+
+def write_bars(path: str, df: pd.DataFrame):
+    """写入标准格式的CSV：先写临时文件再替换"""
+    df = to_canonical(df)
+    df['date'] = df['date'].dt.strftime('%Y-%m-%d')
+    df['volume'] = df['volume'].astype(np.int64)
+    tmp_path = path + ".tmp"
+    df[CANONICAL_COLUMNS].to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
@@ -0,0 +1,351 @@
+"""
+日线列式存储
+把 daily_data 下逐只股票的 CSV 合并成按 (股票代码, 日期) 排序的 NumPy 列文件，
+读取时通过内存映射直接访问，避免每次逐个解析 CSV 再重命名中文列
+"""
+
+import os
+import json
+import glob
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from bar_schema import read_bars
+
+try:
+    import fcntl
+except ImportError:  # Windows 没有 fcntl，只依靠进程独立的临时目录
+    fcntl = None
+
+
+# 存储格式版本，布局变化时递增
+STORE_VERSION = 1
+
+# 列文件的存储类型（与 bar_schema 的标准列和类型相同，价格为 float64，与日线CSV中的数值完全一致）
+BAR_FIELDS = {
+    'date': np.int32,
+    'open': np.float64,
+    'high': np.float64,
+    'low': np.float64,
+    'close': np.float64,
+    'volume': np.int64,
+    'amount': np.float64,
+    'amplitude': np.float64,
+    'pct_change': np.float64,
+    'change': np.float64,
+    'turnover': np.float64,
+}
+
+
+def _default_data_dir():
+    """项目根目录下的 full_stock_data"""
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(project_root, "full_stock_data")
+
+
+def _dates_to_days(dates) -> np.ndarray:
+    """日期 -> 1970-01-01 起的天数"""
+    return pd.to_datetime(dates).values.astype('datetime64[D]').astype(np.int64).astype(np.int32)
+
+
+def _days_to_dates(days: np.ndarray) -> pd.DatetimeIndex:
+    """1970-01-01 起的天数 -> 日期"""
+    return pd.DatetimeIndex(np.asarray(days, dtype=np.int64).astype('datetime64[D]').astype('datetime64[ns]'))
+
+
+@contextmanager
+def _store_lock(store_dir: str, exclusive: bool = True):
+    """存储目录的进程间文件锁（<store_dir>.lock）：写者替换目录时独占，读者打开列文件时共享"""
+    if fcntl is None:
+        yield
+        return
+    with open(store_dir + ".lock", 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _new_tmp_dir(store_dir: str) -> str:
+    """本进程独有的临时目录，并发的写者不会互相清空对方写了一半的文件"""
+    tmp_dir = f"{store_dir}.tmp{os.getpid()}"
+    if os.path.exists(tmp_dir):
+        for name in os.listdir(tmp_dir):
+            os.remove(os.path.join(tmp_dir, name))
+    else:
+        os.makedirs(tmp_dir)
+    return tmp_dir
+
+
+def _swap_dir(tmp_dir: str, store_dir: str):
+    """持有独占锁时用写好的临时目录整体替换存储目录，再删除旧目录"""
+    old_dir = f"{store_dir}.old{os.getpid()}"
+    with _store_lock(store_dir):
+        if os.path.exists(store_dir):
+            os.replace(store_dir, old_dir)
+        os.replace(tmp_dir, store_dir)
+    if os.path.exists(old_dir):
+        for name in os.listdir(old_dir):
+            os.remove(os.path.join(old_dir, name))
+        os.rmdir(old_dir)
+
+
+class BarStore:
+    """
+    列式日线存储
+    目录结构（<data_dir>/bar_store/）:
+        meta.json      版本、字段、行数、生成时间、生成时数据目录（bar_catalog）的签名
+        codes.npy      股票代码，按代码排序
+        offsets.npy    每只股票在列文件中的起止行，长度为股票数+1
+        <field>.npy    各字段的列数据，所有股票首尾相接
+    """
+
+    def __init__(self, data_dir=None):
+        if data_dir is None:
+            data_dir = _default_data_dir()
+        self.data_dir = data_dir
+        self.daily_data_dir = os.path.join(data_dir, "daily_data")
+        self.store_dir = os.path.join(data_dir, "bar_store")
+        self.meta_path = os.path.join(self.store_dir, "meta.json")
+
+        self._columns = None
+        self._codes = None
+        self._offsets = None
+        self._code_index = None
+
+    # ------------------------------------------------------------------ 迁移
+
+    def exists(self) -> bool:
+        """列式存储是否已生成"""
+        return os.path.exists(self.meta_path)
+
+    def _read_csv_normalized(self, csv_path: str) -> pd.DataFrame:
+        """读取单个CSV为标准列（按存储类型）"""
+        return read_bars(csv_path)
+
+    def build_from_csv(self, daily_data_dir: Optional[str] = None) -> int:
+        """
+        一次性从 daily_data 下的CSV生成列式存储
+        :return: 写入的股票数量
+        """
+        # 记录生成时的数据目录签名（只对本数据目录下的CSV），之后CSV有写入时读者可以发现存储已过期
+        signature = None
+        if daily_data_dir is None:
+            catalog = self._catalog()
+            catalog.refresh()
+            signature = catalog.signature()
+        daily_data_dir = daily_data_dir or self.daily_data_dir
+        csv_files = sorted(glob.glob(os.path.join(daily_data_dir, "*.csv")))
+
+        print(f"正在从 {daily_data_dir} 迁移 {len(csv_files)} 个CSV文件到列式存储...")
+        start_time = time.time()
+
+        codes = []
+        frames = []
+        for csv_path in csv_files:
+            stock_code = os.path.basename(csv_path).replace('.csv', '')
+            try:
+                df = self._read_csv_normalized(csv_path)
+            except Exception as e:
+                print(f"读取文件 {csv_path} 时出错: {e}")
+                continue
+            if df.empty:
+                continue
+            codes.append(stock_code)
+            frames.append(df)
+
+        lengths = np.array([len(df) for df in frames], dtype=np.int64)
+        offsets = np.zeros(len(frames) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        combined = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=list(BAR_FIELDS))
+
+        self._write(np.array(codes, dtype='<U6'), offsets, combined, signature)
+
+        print(f"列式存储生成完成，耗时: {time.time() - start_time:.2f}秒，"
+              f"共 {len(codes)} 只股票，{int(offsets[-1])} 行数据，保存路径: {self.store_dir}")
+        return len(codes)
+
+    def _write(self, codes: np.ndarray, offsets: np.ndarray, combined: pd.DataFrame, signature: str = None):
+        """写入列文件：先写临时目录再整体替换，避免读者看到写了一半的存储"""
+        tmp_dir = _new_tmp_dir(self.store_dir)
+
+        np.save(os.path.join(tmp_dir, "codes.npy"), codes)
+        np.save(os.path.join(tmp_dir, "offsets.npy"), offsets)
+        for field, dtype in BAR_FIELDS.items():
+            if field == 'date':
+                values = _dates_to_days(combined['date']) if len(combined) else np.empty(0, dtype=dtype)
+            elif np.issubdtype(dtype, np.integer):
+                values = pd.to_numeric(combined[field], errors='coerce').fillna(0).to_numpy(dtype=dtype)
+            else:
+                values = pd.to_numeric(combined[field], errors='coerce').to_numpy(dtype=dtype)
+            np.save(os.path.join(tmp_dir, f"{field}.npy"), values)
+
+        meta = {
+            'version': STORE_VERSION,
+            'fields': list(BAR_FIELDS),
+            'n_codes': int(len(codes)),
+            'n_rows': int(offsets[-1]) if len(offsets) else 0,
+            'built_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'catalog_signature': signature,
+        }
+        with open(os.path.join(tmp_dir, "meta.json"), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+
+        _swap_dir(tmp_dir, self.store_dir)
+
+        self._columns = None
+
+    # ------------------------------------------------------------------ 读取
+
+    def _catalog(self):
+        # data_catalog 依赖本模块，在使用时再导入
+        from data_catalog import DataCatalog
+        return DataCatalog(self.data_dir)
+
+    def is_stale(self) -> bool:
+        """生成后日线CSV是否有写入（数据目录签名与生成时不同）；未生成返回False"""
+        if not self.exists():
+            return False
+        with open(self.meta_path, 'r', encoding='utf-8') as f:
+            built_signature = json.load(f).get('catalog_signature')
+        return built_signature != self._catalog().signature()
+
+    def _load(self):
+        """
+        以内存映射方式打开列文件（只在首次访问时执行）
+        读者不重新生成存储：过期时只提示，由写入CSV的一方调用 refresh_derived_stores 重新生成
+        """
+        if self._columns is not None:
+            return
+        if self.is_stale():
+            print("警告: 日线CSV在列式存储生成后有更新，当前读取的是旧的列式存储"
+                  "（写入后应调用 derived_stores.refresh_derived_stores 或运行 python bar_store.py）")
+        # 共享锁保证读到的各列文件来自同一次生成（写者替换目录时持有独占锁）
+        with _store_lock(self.store_dir, exclusive=False):
+            self._codes = np.load(os.path.join(self.store_dir, "codes.npy"))
+            self._offsets = np.load(os.path.join(self.store_dir, "offsets.npy"))
+            self._columns = {
+                field: np.load(os.path.join(self.store_dir, f"{field}.npy"), mmap_mode='r')
+                for field in BAR_FIELDS
+            }
+        self._code_index = {code: i for i, code in enumerate(self._codes.tolist())}
+
+    def get_codes(self) -> List[str]:
+        """获取所有股票代码"""
+        if not self.exists():
+            return sorted(f.replace('.csv', '') for f in os.listdir(self.daily_data_dir) if f.endswith('.csv'))
+        self._load()
+        return self._codes.tolist()
+
+    def get_columns(self):
+        """
+        获取底层列数据（内存映射，只读）
+        :return: (股票代码数组, 行偏移数组, {字段: 列数组})
+        """
+        self._load()
+        return self._codes, self._offsets, self._columns
+
+    def get_built_at(self) -> Optional[str]:
+        """列式存储的生成时间，未生成则返回None"""
+        if not self.exists():
+            return None
+        with open(self.meta_path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('built_at')
+
+    def _slice_frame(self, start: int, end: int) -> pd.DataFrame:
+        data = {'date': _days_to_dates(self._columns['date'][start:end])}
+        for field in BAR_FIELDS:
+            if field != 'date':
+                data[field] = np.asarray(self._columns[field][start:end])
+        return pd.DataFrame(data)
+
+    def get_stock_data(self, stock_code: str, start_date: str = None, end_date: str = None,
+                       count: int = None) -> pd.DataFrame:
+        """
+        获取单只股票的日线数据（标准英文列，date 为 datetime 列，按日期升序）
+        存储未生成时回退到读取CSV
+        :param start_date: 起始日期（含），格式 YYYY-MM-DD
+        :param end_date: 结束日期（含），格式 YYYY-MM-DD
+        :param count: 只返回最后 count 行
+        """
+        stock_code = stock_code.split('.')[0]
+        if self.exists():
+            self._load()
+            i = self._code_index.get(stock_code)
+            if i is None:
+                return pd.DataFrame(columns=list(BAR_FIELDS))
+            start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+            days = self._columns['date']
+            # 每只股票内部按日期有序，二分定位日期范围
+            if start_date is not None:
+                start += int(np.searchsorted(days[start:end], _dates_to_days([start_date])[0], side='left'))
+            if end_date is not None:
+                end = start + int(np.searchsorted(days[start:end], _dates_to_days([end_date])[0], side='right'))
+            if count is not None:
+                start = max(start, end - count)
+            return self._slice_frame(start, end)
+
+        csv_path = os.path.join(self.daily_data_dir, f"{stock_code}.csv")
+        if not os.path.exists(csv_path):
+            return pd.DataFrame(columns=list(BAR_FIELDS))
+        df = self._read_csv_normalized(csv_path)
+        if start_date is not None:
+            df = df[df['date'] >= pd.to_datetime(start_date)]
+        if end_date is not None:
+            df = df[df['date'] <= pd.to_datetime(end_date)]
+        if count is not None:
+            df = df.tail(count)
+        return df.reset_index(drop=True)
+
+    def get_bar(self, stock_code: str, date_str: str) -> Optional[Dict]:
+        """获取单只股票某一日的日线，不存在则返回None"""
+        df = self.get_stock_data(stock_code, start_date=date_str, end_date=date_str)
+        if df.empty:
+            return None
+        return df.iloc[0].to_dict()
+
+    def load_all(self) -> Dict[str, pd.DataFrame]:
+        """
+        加载所有股票数据
+        :return: {股票代码: 以 date 为索引的DataFrame}
+        """
+        if not self.exists():
+            all_data = {}
+            for stock_code in self.get_codes():
+                try:
+                    df = self.get_stock_data(stock_code)
+                except Exception as e:
+                    print(f"加载股票 {stock_code} 时出错: {e}")
+                    continue
+                all_data[stock_code] = df.set_index('date')
+            return all_data
+
+        self._load()
+        combined = self._slice_frame(0, int(self._offsets[-1])).set_index('date')
+        offsets = self._offsets.tolist()
+        return {
+            code: combined.iloc[offsets[i]:offsets[i + 1]]
+            for i, code in enumerate(self._codes.tolist())
+        }
+
+
+def main():
+    """命令行：从CSV迁移生成列式存储"""
+    import sys
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else None
+    store = BarStore(data_dir)
+    store.build_from_csv()
+
+    start_time = time.time()
+    all_data = store.load_all()
+    print(f"验证加载：{len(all_data)} 只股票，耗时 {time.time() - start_time:.2f}秒")
+
+
+if __name__ == "__main__":
+    main()
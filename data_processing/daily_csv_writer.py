@@ -0,0 +1,229 @@
+"""
+日线CSV追加写入
+每只股票的CSV按日期升序保存，增量更新只需要在文件末尾追加新日期的行。
+文件的表头、最后日期、行数、大小和校验和记录在数据目录（data_catalog.DataCatalog）中，
+更新时由目录直接得到最后日期，不再整文件读取、去重、排序后重写；
+每次写入后在同一事务中更新目录，校验和按追加的字节增量计算。
+目录与文件不一致（文件被其他程序改写）时只重新扫描该文件。
+全市场批量写入（收盘快照）由 append_bars 一次格式化所有行后逐文件追加，目录在一个事务中更新；
+旧格式文件在第一次追加时整文件改写为标准格式。
+写入器记录本次写入过的每只股票的最早日期（written_since），刷新派生存储时据此重算已有日期上新增或改写的行
+"""
+
+import os
+import zlib
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from bar_schema import CANONICAL_COLUMNS, SCHEMA_VERSION, read_bars, to_canonical, write_bars
+from data_catalog import TAIL_BYTES, DataCatalog, _parse_line, scan_csv
+
+
+class DailyCsvWriter:
+    """
+    按股票追加写入日线CSV，并维护数据目录
+    :param data_dir: 数据目录，CSV在 <data_dir>/daily_data/，目录表在 <data_dir>/stock_data.db
+    """
+
+    def __init__(self, data_dir="full_stock_data", catalog: DataCatalog = None):
+        self.data_dir = data_dir
+        self.daily_data_dir = os.path.join(data_dir, "daily_data")
+        os.makedirs(self.daily_data_dir, exist_ok=True)
+        self.catalog = catalog or DataCatalog(data_dir)
+        self.written_since = {}  # {股票代码（6位）: 本写入器写入或改写过的最早日期 YYYY-MM-DD}
+
+    def _mark_written(self, stock_code: str, first_date: str):
+        """记录一只股票写入或改写的最早日期"""
+        if first_date and (stock_code not in self.written_since or first_date < self.written_since[stock_code]):
+            self.written_since[stock_code] = first_date
+
+    def csv_path(self, stock_code: str) -> str:
+        return self.catalog.csv_path(stock_code)
+
+    def tail(self, stock_code: str) -> Optional[Dict]:
+        """
+        文件的目录记录：{'columns': 表头, 'first_date', 'last_date': YYYY-MM-DD, 'rows': 数据行数, ...}
+        文件不存在返回None
+        """
+        return self.catalog.entry(stock_code)
+
+    def last_row(self, stock_code: str, info: Dict = None) -> Optional[Dict]:
+        """
+        最新一根K线的标准字段，如 {'date': ..., 'close': ...}（标准格式文件只读取文件末尾）
+        :param info: 已取得的目录记录（默认由 tail 取得）
+        :return: 文件不存在或没有数据行时返回None
+        """
+        info = info or self.tail(stock_code)
+        if info is None or info['last_date'] is None:
+            return None
+        if info['schema_version'] != SCHEMA_VERSION:
+            # 旧格式文件可能未按日期排序，最后一行不一定是最新的K线
+            return read_bars(self.csv_path(stock_code.split('.')[0])).iloc[-1].to_dict()
+        with open(self.csv_path(stock_code.split('.')[0]), 'rb') as f:
+            f.seek(max(info['bytes'] - TAIL_BYTES, 0))
+            lines = [line for line in f.read().decode('utf-8', errors='ignore').splitlines() if line.strip()]
+        return dict(zip(info['columns'], _parse_line(lines[-1])))
+
+    def append(self, stock_code: str, df: pd.DataFrame) -> int:
+        """
+        追加新日期的日线（只写晚于文件最后日期的行，同一日期已存在时保留原有行），按 bar_schema 的标准列写入；
+        旧格式文件第一次追加时与原有数据合并，整文件改写为标准格式
+        :param df: 含 date（或 日期）列的日线数据，标准列或数据源的原始列名均可
+        :return: 写入的新行数
+        """
+        return self.append_many({stock_code: df})[stock_code.split('.')[0]]
+
+    def append_many(self, frames: Dict[str, pd.DataFrame]) -> Dict[str, int]:
+        """
+        追加多只股票的日线，规则同 append，所有文件写完后目录记录在一个事务中更新；
+        中途中断时已写入的文件与目录不符，下次访问时由目录重新扫描
+        :param frames: {股票代码: 日线数据}
+        :return: {股票代码（6位）: 写入的新行数}
+        """
+        added = {}
+        entries = {}
+        touched = []
+        for stock_code, df in frames.items():
+            stock_code = stock_code.split('.')[0]
+            added[stock_code], entry = self._write(stock_code, df)
+            if entry is not None:
+                entries[stock_code] = entry
+            elif self.tail(stock_code) is not None:
+                touched.append(stock_code)
+        self._save_entries(entries, touched)
+        return added
+
+    def append_bars(self, bars: pd.DataFrame) -> Dict[str, int]:
+        """
+        批量追加多只股票的标准格式日线（如收盘快照生成的全市场当日K线）：
+        所有行一次格式化为CSV文本，再按股票把晚于文件最后日期的行追加到文件末尾，不逐只构造和标准化 DataFrame；
+        新文件和旧格式文件回退到 append_many。目录记录在一个事务中更新
+        :param bars: code 列加 bar_schema 标准列（date 为 datetime）
+        :return: {股票代码（6位）: 写入的新行数}
+        """
+        if bars.empty:
+            return {}
+        self.catalog.refresh()
+        infos = self.catalog.entries()
+        bars = bars.drop_duplicates(subset=['code', 'date'], keep='last').sort_values(['code', 'date'])
+        codes = bars['code'].to_numpy()
+        out = bars[CANONICAL_COLUMNS].copy()
+        out['date'] = out['date'].dt.strftime('%Y-%m-%d')
+        out['volume'] = out['volume'].astype('int64')
+        dates = out['date'].to_numpy()
+        lines = out.to_csv(index=False, header=False, lineterminator='\n').splitlines()
+
+        added = {}
+        entries = {}
+        touched = []
+        fallback = {}
+        bounds = list(np.flatnonzero(codes[1:] != codes[:-1]) + 1)
+        for start, stop in zip([0] + bounds, bounds + [len(codes)]):
+            stock_code = codes[start]
+            info = infos.get(stock_code)
+            if info is None or info['schema_version'] != SCHEMA_VERSION:
+                fallback[stock_code] = bars.iloc[start:stop][CANONICAL_COLUMNS]
+                continue
+            keep = [i for i in range(start, stop) if info['last_date'] is None or dates[i] > info['last_date']]
+            added[stock_code] = len(keep)
+            if not keep:
+                touched.append(stock_code)
+                continue
+            data = ''.join(lines[i] + '\n' for i in keep).encode('utf-8')
+            entries[stock_code] = self._append_bytes(stock_code, info, data, dates[keep[0]], dates[keep[-1]], len(keep))
+            self._mark_written(stock_code, dates[keep[0]])
+        self._save_entries(entries, touched)
+
+        if fallback:
+            added.update(self.append_many(fallback))
+        return added
+
+    def replace(self, stock_code: str, df: pd.DataFrame) -> int:
+        """
+        用重新下载的完整日线替换文件（除权除息后前复权价格整体变化时修正历史），按标准格式写入
+        :return: 写入的行数
+        """
+        stock_code = stock_code.split('.')[0]
+        path = self.csv_path(stock_code)
+        write_bars(path, df)
+        entry = scan_csv(path)
+        self._save_entries({stock_code: entry}, [])
+        # 整只股票的历史都被改写
+        self._mark_written(stock_code, entry['first_date'])
+        return entry['rows']
+
+    def _save_entries(self, entries: Dict[str, Dict], touched: List[str]):
+        """在一个事务中写入新的目录记录，并为没有新数据的股票记录抓取时间"""
+        if not entries and not touched:
+            return
+        conn = self.catalog.connect()
+        try:
+            last_fetch = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            for stock_code, entry in entries.items():
+                self.catalog.save(conn, stock_code, entry, last_fetch=last_fetch)
+            for stock_code in touched:
+                self.catalog.touch(stock_code, conn)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _append_bytes(self, stock_code: str, info: Dict, data: bytes, first_date: str, last_date: str,
+                      rows: int) -> Dict:
+        """把已格式化的行追加到文件末尾，返回按增量更新后的目录记录"""
+        path = self.csv_path(stock_code)
+        with open(path, 'rb+') as f:
+            # 上次写入若没有以换行结尾，先补上
+            f.seek(0, os.SEEK_END)
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    data = b'\n' + data
+            f.write(data)
+        entry = dict(info)
+        entry.update({
+            'first_date': info['first_date'] or first_date, 'last_date': last_date, 'rows': info['rows'] + rows,
+            'bytes': info['bytes'] + len(data), 'checksum': zlib.crc32(data, info['checksum']),
+            'mtime': os.stat(path).st_mtime,
+        })
+        return entry
+
+    def _write(self, stock_code: str, df: pd.DataFrame) -> Tuple[int, Optional[Dict]]:
+        """写入一只股票的新行，返回 (新行数, 新的目录记录)；没有新行时目录记录为None"""
+        path = self.csv_path(stock_code)
+        info = self.tail(stock_code)
+        df = to_canonical(df)[CANONICAL_COLUMNS]
+        df['volume'] = df['volume'].astype('int64')
+
+        if info is not None and info['schema_version'] != SCHEMA_VERSION:
+            # 旧格式文件（列名混杂、可能未按日期排序）：与原有数据合并后整文件按标准格式重写一次，同一日期保留原有行
+            existing = to_canonical(pd.read_csv(path))
+            df = df[~df['date'].isin(existing['date'])]
+            if df.empty:
+                return 0, None
+            write_bars(path, pd.concat([existing, df], ignore_index=True))
+            self._mark_written(stock_code, df['date'].min().strftime('%Y-%m-%d'))
+            return len(df), scan_csv(path)
+
+        if info is not None and info['last_date'] is not None:
+            df = df[df['date'] > pd.to_datetime(info['last_date'])]
+        if df.empty:
+            return 0, None
+        df['date'] = df['date'].dt.strftime('%Y-%m-%d')
+        self._mark_written(stock_code, df['date'].iloc[0])
+
+        if info is None:
+            data = df.to_csv(index=False).encode('utf-8')
+            with open(path, 'wb') as f:
+                f.write(data)
+            entry = {
+                'first_date': df['date'].iloc[0], 'last_date': df['date'].iloc[-1], 'rows': len(df),
+                'bytes': len(data), 'checksum': zlib.crc32(data), 'schema_version': SCHEMA_VERSION,
+                'columns': list(df.columns), 'mtime': os.stat(path).st_mtime,
+            }
+        else:
+            data = df.to_csv(index=False, header=False).encode('utf-8')
+            entry = self._append_bytes(stock_code, info, data, df['date'].iloc[0], df['date'].iloc[-1], len(df))
+        return len(df), entry
@@ -0,0 +1,387 @@
+"""
+日线数据目录
+stock_data.db 中的 bar_catalog 表为 daily_data 下每只股票的CSV记录一行：
+首末日期、行数、字节数、CRC32 校验和、表头及其格式版本、最近一次抓取时间，以及写入时的文件修改时间。
+写入方（DailyCsvWriter）每次追加后在同一事务中更新该行（校验和按追加的字节增量计算），
+数据状态、新鲜度、缺失股票等查询直接由该表回答，不读取日线文件；
+文件被其他程序改动（大小或修改时间与记录不符）时只重新扫描该文件
+"""
+
+import csv
+import os
+import sqlite3
+import zlib
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from bar_store import _default_data_dir
+from bar_schema import LEGACY_SCHEMA_VERSION, SCHEMA_VERSION, is_canonical, read_bars, write_bars
+
+# 读取文件末尾的字节数（足够包含最后一行）
+TAIL_BYTES = 4096
+
+# 日期列的可能列名
+DATE_COLUMNS = ('date', '日期')
+
+# 目录表的字段
+CATALOG_FIELDS = ['code', 'first_date', 'last_date', 'rows', 'bytes', 'checksum', 'schema_version',
+                  'last_fetch', 'columns', 'mtime']
+
+
+def _parse_line(line: str) -> List[str]:
+    return next(csv.reader([line]), [])
+
+
+def _parse_date(value: str) -> Optional[str]:
+    try:
+        return pd.to_datetime(value).strftime('%Y-%m-%d')
+    except (ValueError, TypeError):
+        return None
+
+
+def scan_csv(path: str) -> Optional[Dict]:
+    """
+    扫描一个日线CSV：表头、首末日期来自文件头尾，行数和校验和按块顺序读取一遍得到；
+    旧格式文件可能未按日期排序（历史数据追加在末尾），首末日期取所有日期列的最小、最大值
+    :return: 目录表的一行（不含 code/last_fetch），不是日线文件返回None
+    """
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        header = f.readline().rstrip('\r\n')
+        first_line = f.readline().rstrip('\r\n')
+    columns = _parse_line(header)
+    positions = [columns.index(col) for col in DATE_COLUMNS if col in columns]
+    if not positions:
+        return None
+
+    def date_of(line):
+        # 旧格式文件中英文日期列可能混用，取第一个非空的
+        values = _parse_line(line)
+        for position in positions:
+            if position < len(values) and values[position] != '':
+                return _parse_date(values[position])
+        return None
+
+    stat = os.stat(path)
+    with open(path, 'rb') as f:
+        f.seek(max(stat.st_size - TAIL_BYTES, 0))
+        tail = f.read().decode('utf-8', errors='ignore')
+    lines = [line for line in tail.splitlines() if line.strip()]
+
+    checksum = 0
+    newlines = 0
+    last_byte = b''
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            checksum = zlib.crc32(block, checksum)
+            newlines += block.count(b'\n')
+            last_byte = block[-1:]
+    if last_byte and last_byte != b'\n':
+        newlines += 1
+
+    canonical = is_canonical(columns)
+    if canonical:
+        first_date = date_of(first_line) if first_line.strip() else None
+        last_date = date_of(lines[-1]) if lines and lines[-1] != header else None
+    else:
+        dates = pd.read_csv(path, usecols=lambda col: col in DATE_COLUMNS, dtype=str)
+        dates = pd.to_datetime(dates.bfill(axis=1).iloc[:, 0], errors='coerce').dropna()
+        first_date = dates.min().strftime('%Y-%m-%d') if len(dates) else None
+        last_date = dates.max().strftime('%Y-%m-%d') if len(dates) else None
+
+    return {
+        'first_date': first_date,
+        'last_date': last_date,
+        'rows': max(newlines - 1, 0),
+        'bytes': stat.st_size,
+        'checksum': checksum,
+        'schema_version': SCHEMA_VERSION if canonical else LEGACY_SCHEMA_VERSION,
+        'columns': columns,
+        'mtime': stat.st_mtime,
+    }
+
+
+class DataCatalog:
+    """
+    日线数据目录（bar_catalog 表）
+    :param data_dir: 数据目录，CSV在 <data_dir>/daily_data/，目录表在 <data_dir>/stock_data.db
+    """
+
+    def __init__(self, data_dir=None):
+        if data_dir is None:
+            data_dir = _default_data_dir()
+        self.data_dir = data_dir
+        self.daily_data_dir = os.path.join(data_dir, "daily_data")
+        self.db_path = os.path.join(data_dir, "stock_data.db")
+        os.makedirs(data_dir, exist_ok=True)
+        self.init_database()
+
+    def connect(self):
+        # 下载时多个线程同时写不同股票的记录，等待锁而不是立即报错
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def init_database(self):
+        conn = self.connect()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS bar_catalog (
+                code TEXT PRIMARY KEY,
+                first_date TEXT,
+                last_date TEXT,
+                rows INTEGER,
+                bytes INTEGER,
+                checksum INTEGER,
+                schema_version INTEGER,
+                last_fetch TEXT,
+                columns TEXT,
+                mtime REAL
+            )
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_bar_catalog_last_date ON bar_catalog (last_date)")
+        # 目录取代了之前只记录表头和最后日期的尾部索引
+        conn.execute("DROP TABLE IF EXISTS daily_tail_index")
+        conn.commit()
+        conn.close()
+
+    def csv_path(self, stock_code: str) -> str:
+        return os.path.join(self.daily_data_dir, f"{stock_code.split('.')[0]}.csv")
+
+    @staticmethod
+    def _to_entry(row) -> Dict:
+        entry = dict(zip(CATALOG_FIELDS, row))
+        entry['columns'] = entry['columns'].split(',') if entry['columns'] else []
+        return entry
+
+    # ------------------------------------------------------------------ 写入
+
+    def save(self, conn, stock_code: str, entry: Dict, last_fetch: str = None):
+        """
+        写入一只股票的记录（使用调用方的连接，由调用方提交，便于与其他写入放在同一事务）
+        :param last_fetch: 抓取时间，None 时保留原有值
+        """
+        conn.execute('''
+            INSERT INTO bar_catalog (code, first_date, last_date, rows, bytes, checksum, schema_version,
+                                     last_fetch, columns, mtime)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (code) DO UPDATE SET
+                first_date = excluded.first_date, last_date = excluded.last_date, rows = excluded.rows,
+                bytes = excluded.bytes, checksum = excluded.checksum, schema_version = excluded.schema_version,
+                last_fetch = COALESCE(excluded.last_fetch, bar_catalog.last_fetch),
+                columns = excluded.columns, mtime = excluded.mtime
+        ''', (stock_code, entry['first_date'], entry['last_date'], entry['rows'], entry['bytes'],
+              entry['checksum'], entry['schema_version'], last_fetch, ','.join(entry['columns']), entry['mtime']))
+
+    def touch(self, stock_code: str, conn=None):
+        """记录一次没有新数据的抓取（传入连接时由调用方提交）"""
+        own = conn is None
+        conn = conn or self.connect()
+        conn.execute("UPDATE bar_catalog SET last_fetch = ? WHERE code = ?",
+                     (datetime.now().strftime('%Y-%m-%d %H:%M:%S'), stock_code.split('.')[0]))
+        if own:
+            conn.commit()
+            conn.close()
+
+    def entry(self, stock_code: str) -> Optional[Dict]:
+        """
+        一只股票的记录，与文件不一致（大小或修改时间不同）或缺失时重新扫描该文件
+        文件不存在返回None
+        """
+        stock_code = stock_code.split('.')[0]
+        path = self.csv_path(stock_code)
+        if not os.path.exists(path):
+            return None
+        stat = os.stat(path)
+        conn = self.connect()
+        try:
+            row = conn.execute(f"SELECT {', '.join(CATALOG_FIELDS)} FROM bar_catalog WHERE code = ?",
+                               (stock_code,)).fetchone()
+            if row is not None:
+                entry = self._to_entry(row)
+                if entry['bytes'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+                    return entry
+            scanned = scan_csv(path)
+            if scanned is None:
+                return None
+            self.save(conn, stock_code, scanned)
+            conn.commit()
+            return self.get(stock_code)
+        finally:
+            conn.close()
+
+    def refresh(self) -> Dict[str, int]:
+        """
+        与 daily_data 目录同步：只重新扫描新增或改动过的文件（其余只比较文件大小和修改时间），删除已不存在的文件的记录
+        :return: {'scanned': 重新扫描数, 'removed': 删除数, 'total': 记录数}
+        """
+        files = {}
+        if os.path.exists(self.daily_data_dir):
+            with os.scandir(self.daily_data_dir) as it:
+                for item in it:
+                    if item.name.endswith('.csv'):
+                        stat = item.stat()
+                        files[item.name[:-4]] = (stat.st_size, stat.st_mtime)
+        conn = self.connect()
+        known = {code: (size, mtime) for code, size, mtime in conn.execute("SELECT code, bytes, mtime FROM bar_catalog")}
+        removed = [code for code in known if code not in files]
+        conn.executemany("DELETE FROM bar_catalog WHERE code = ?", [(code,) for code in removed])
+        scanned = 0
+        for code, signature in sorted(files.items()):
+            if known.get(code) == signature:
+                continue
+            try:
+                entry = scan_csv(self.csv_path(code))
+            except (OSError, UnicodeDecodeError) as e:
+                print(f"扫描 {code} 失败: {e}")
+                continue
+            if entry is not None:
+                self.save(conn, code, entry)
+                scanned += 1
+        conn.commit()
+        total = conn.execute("SELECT COUNT(*) FROM bar_catalog").fetchone()[0]
+        conn.close()
+        return {'scanned': scanned, 'removed': len(removed), 'total': total}
+
+    def migrate(self) -> int:
+        """
+        把旧格式的CSV一次性改写为标准格式（bar_schema），已是标准格式的文件不读取
+        :return: 改写的文件数
+        """
+        self.refresh()
+        conn = self.connect()
+        codes = [row[0] for row in conn.execute(
+            "SELECT code FROM bar_catalog WHERE schema_version < ? ORDER BY code", (SCHEMA_VERSION,))]
+        print(f"需要迁移为标准格式的文件: {len(codes)} 个")
+        migrated = 0
+        for i, code in enumerate(codes, 1):
+            path = self.csv_path(code)
+            try:
+                write_bars(path, read_bars(path))
+            except (OSError, ValueError) as e:
+                print(f"迁移 {code} 失败: {e}")
+                continue
+            # 每个文件改写后立即更新记录，中断后重新运行只处理剩余的文件
+            self.save(conn, code, scan_csv(path))
+            conn.commit()
+            migrated += 1
+            if i % 500 == 0:
+                print(f"迁移进度: {i}/{len(codes)}")
+        conn.close()
+        return migrated
+
+    def verify(self, stock_code: str) -> bool:
+        """重新计算文件的校验和，与目录记录比较"""
+        entry = self.get(stock_code)
+        path = self.csv_path(stock_code)
+        if entry is None or not os.path.exists(path):
+            return False
+        scanned = scan_csv(path)
+        return scanned is not None and scanned['checksum'] == entry['checksum'] and scanned['rows'] == entry['rows']
+
+    # ------------------------------------------------------------------ 查询（不读取日线文件）
+
+    def get(self, stock_code: str) -> Optional[Dict]:
+        """目录中的记录（不检查文件）"""
+        conn = self.connect()
+        row = conn.execute(f"SELECT {', '.join(CATALOG_FIELDS)} FROM bar_catalog WHERE code = ?",
+                           (stock_code.split('.')[0],)).fetchone()
+        conn.close()
+        return self._to_entry(row) if row is not None else None
+
+    def entries(self) -> Dict[str, Dict]:
+        """所有股票的记录 {code: 记录}（不检查文件，需要与文件一致时先 refresh）"""
+        conn = self.connect()
+        rows = conn.execute(f"SELECT {', '.join(CATALOG_FIELDS)} FROM bar_catalog").fetchall()
+        conn.close()
+        return {row[0]: self._to_entry(row) for row in rows}
+
+    def is_empty(self) -> bool:
+        conn = self.connect()
+        row = conn.execute("SELECT 1 FROM bar_catalog LIMIT 1").fetchone()
+        conn.close()
+        return row is None
+
+    def codes(self) -> List[str]:
+        """有日线数据的股票代码（6位）"""
+        conn = self.connect()
+        codes = [row[0] for row in conn.execute("SELECT code FROM bar_catalog ORDER BY code")]
+        conn.close()
+        return codes
+
+    def frame(self) -> pd.DataFrame:
+        """整个目录表"""
+        conn = self.connect()
+        df = pd.read_sql_query(f"SELECT {', '.join(CATALOG_FIELDS)} FROM bar_catalog ORDER BY code", conn)
+        conn.close()
+        return df
+
+    def signature(self) -> str:
+        """
+        整个目录的签名（股票数、总行数、总字节数、最新日期、校验和之和），任何一次写入都会改变它；
+        派生存储生成时记录该签名，读取时据此判断是否过期
+        """
+        conn = self.connect()
+        row = conn.execute("SELECT COUNT(*), SUM(rows), SUM(bytes), MAX(last_date), SUM(checksum) "
+                           "FROM bar_catalog").fetchone()
+        conn.close()
+        return '|'.join('' if value is None else str(value) for value in row)
+
+    def latest_date(self) -> Optional[str]:
+        """所有股票中最新的数据日期"""
+        conn = self.connect()
+        row = conn.execute("SELECT MAX(last_date) FROM bar_catalog").fetchone()
+        conn.close()
+        return row[0]
+
+    def summary(self) -> Dict:
+        """数据状态：股票数、首末日期、总行数、总字节数、最新日期的股票数、最近抓取时间"""
+        conn = self.connect()
+        row = conn.execute('''
+            SELECT COUNT(*), MIN(first_date), MAX(last_date), SUM(rows), SUM(bytes), MAX(last_fetch)
+            FROM bar_catalog
+        ''').fetchone()
+        up_to_date = conn.execute("SELECT COUNT(*) FROM bar_catalog WHERE last_date = ?", (row[2],)).fetchone()[0]
+        conn.close()
+        return {
+            'total_stocks': row[0],
+            'first_date': row[1],
+            'latest_date': row[2],
+            'total_rows': row[3] or 0,
+            'total_bytes': row[4] or 0,
+            'last_fetch': row[5],
+            'up_to_date_stocks': up_to_date,
+        }
+
+    def stale(self, as_of_date: str) -> List[str]:
+        """最后日期早于 as_of_date（YYYY-MM-DD）的股票"""
+        conn = self.connect()
+        codes = [row[0] for row in conn.execute(
+            "SELECT code FROM bar_catalog WHERE last_date < ? OR last_date IS NULL ORDER BY code", (as_of_date,))]
+        conn.close()
+        return codes
+
+    def missing(self, stock_codes: List[str]) -> List[str]:
+        """给定股票中目录里没有数据的（代码可带 .XSHG/.XSHE 后缀，原样返回）"""
+        known = set(self.codes())
+        return [code for code in stock_codes if code.split('.')[0] not in known]
+
+
+def main():
+    """命令行：python data_catalog.py [数据目录] [migrate]，同步目录表并输出数据状态，migrate 时先把旧格式CSV改写为标准格式"""
+    import sys
+    import time
+    args = [arg for arg in sys.argv[1:] if arg != 'migrate']
+    data_dir = args[0] if args else None
+    catalog = DataCatalog(data_dir)
+    start_time = time.time()
+    if 'migrate' in sys.argv[1:]:
+        migrated = catalog.migrate()
+        print(f"迁移完成，改写 {migrated} 个文件，耗时: {time.time() - start_time:.2f}秒")
+    result = catalog.refresh()
+    print(f"目录同步完成，重新扫描 {result['scanned']} 个文件，删除 {result['removed']} 条记录，"
+          f"共 {result['total']} 只股票，耗时: {time.time() - start_time:.2f}秒")
+    for name, value in catalog.summary().items():
+        print(f"  {name}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+派生存储刷新
+日线CSV写入后（增量下载、收盘快照、智能更新），按依赖顺序刷新由其生成的存储：
+列式存储 -> 行情面板 -> 因子库（只计算新增的K线）-> 涨跌停状态表（追加新日期，重写写入过的股票）。
+只刷新已经生成过的存储；所有读者（股票池、选股、回测、Web应用）只读这些存储，写入CSV后必须调用
+"""
+
+from typing import Dict, Iterable
+
+from bar_store import BarStore, _default_data_dir
+from factor_store import FactorStore
+from limit_status import LimitStatusTable
+from market_panel import MarketPanel
+
+
+def refresh_derived_stores(data_dir=None, recompute: Iterable[str] = (), written_since: Dict[str, str] = None) -> bool:
+    """
+    刷新 data_dir 下已生成的派生存储
+    :param recompute: 历史被整体替换过（如除权除息后重写前复权价格）的股票，因子整只重新计算
+    :param written_since: 写入器报告的 {股票代码: 写入或改写的最早日期}（DailyCsvWriter.written_since），
+                          涨跌停状态表重写这些股票从该日期起的行（如快照之后补齐的缺口、复权修正）
+    :return: 列式存储是否存在并已刷新
+    """
+    if data_dir is None:
+        data_dir = _default_data_dir()
+    bar_store = BarStore(data_dir)
+    if not bar_store.exists():
+        return False
+    bar_store.build_from_csv()
+    market_panel = MarketPanel(data_dir)
+    if market_panel.exists():
+        market_panel.build()
+    # 因子库只计算新增的K线（复权修正过的股票整只重新计算）
+    factor_store = FactorStore(data_dir)
+    if factor_store.exists():
+        factor_store.update(recompute=recompute)
+    # 涨跌停状态表追加新日期，并重写已有日期上写入或改写过的股票
+    limit_table = LimitStatusTable(data_dir)
+    if limit_table.get_latest_date() is not None:
+        limit_table.update(written_since=written_since)
+    return True
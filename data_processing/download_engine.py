@@ -0,0 +1,234 @@
+"""
+异步批量下载引擎
+用 asyncio 控制并发：同步的数据接口（akshare）在线程中执行，同时进行的请求数受信号量限制，
+请求速率由令牌桶控制（允许短时突发，长期不超过设定速率）；失败的请求按带随机抖动的指数退避重试，
+连续失败时令牌桶自动降速、恢复成功后逐步回到设定速率，避免触发数据源封禁。
+每只股票完成后写入 download_records 表作为断点，中断后以相同的批次号重新运行只处理未完成的股票
+"""
+
+import asyncio
+import random
+import sqlite3
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+# 默认请求速率（次/秒）、突发容量和并发数
+REQUESTS_PER_SECOND = 5.0
+BURST = 10
+CONCURRENCY = 10
+
+# 重试次数和退避参数（秒）
+MAX_RETRIES = 4
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 30.0
+
+# 降速的下限（设定速率的比例）和每次成功后的恢复幅度
+MIN_RATE_RATIO = 0.1
+RATE_RECOVERY = 1.05
+
+# 断点状态
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+STATUS_PENDING = 'pending'  # 请求成功但数据尚未到位（如收盘前没有当日K线），相同批次号再次运行时重新处理
+
+
+class TokenBucket:
+    """
+    令牌桶限速器（协程内使用）
+    :param rate: 每秒补充的令牌数，即长期请求速率
+    :param capacity: 桶容量，即允许的突发请求数
+    """
+
+    def __init__(self, rate: float = REQUESTS_PER_SECOND, capacity: int = BURST):
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        """取一个令牌，没有时等待到补充出一个"""
+        async with self._lock:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+    def slow_down(self):
+        """请求失败（疑似被限流）：速率减半，并清空突发额度"""
+        self._refill()
+        self.rate = max(self.rate / 2, self.max_rate * MIN_RATE_RATIO)
+        self.tokens = min(self.tokens, 0.0)
+
+    def speed_up(self):
+        """请求成功：速率逐步恢复到设定值"""
+        if self.rate < self.max_rate:
+            self._refill()
+            self.rate = min(self.rate * RATE_RECOVERY, self.max_rate)
+
+
+def backoff_delay(attempt: int, base: float = BACKOFF_BASE, cap: float = BACKOFF_CAP) -> float:
+    """第 attempt 次重试前的等待时间：指数退避 + 全随机抖动（避免各请求同时重试）"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class DownloadCheckpoint:
+    """
+    下载断点：download_records 表中 (批次号, 股票代码) 一行，记录状态、尝试次数和结果说明
+    旧版本写入的记录没有批次号，不参与断点判断
+    """
+
+    COLUMNS = {'run_id': 'TEXT', 'status': 'TEXT', 'attempts': 'INTEGER', 'message': 'TEXT'}
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self._migrate()
+
+    def _migrate(self):
+        """为 download_records 补充断点字段和 (批次号, 股票代码) 唯一索引"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS download_records (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                code TEXT,
+                start_date TEXT,
+                end_date TEXT,
+                download_time TEXT
+            )
+        ''')
+        existing = {row[1] for row in cursor.execute("PRAGMA table_info(download_records)")}
+        for name, column_type in self.COLUMNS.items():
+            if name not in existing:
+                cursor.execute(f"ALTER TABLE download_records ADD COLUMN {name} {column_type}")
+        cursor.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_download_records_run
+            ON download_records (run_id, code)
+        ''')
+        self.conn.commit()
+
+    def finished(self, run_id: str) -> set:
+        """该批次已完成的股票"""
+        rows = self.conn.execute(
+            "SELECT code FROM download_records WHERE run_id = ? AND status = ?", (run_id, STATUS_DONE))
+        return {row[0] for row in rows}
+
+    def record(self, run_id: str, code: str, status: str, attempts: int, message: str = '',
+               start_date: str = None, end_date: str = None):
+        """写入（或覆盖）一只股票在该批次的状态，立即提交"""
+        self.conn.execute('''
+            INSERT INTO download_records (code, start_date, end_date, download_time, run_id, status, attempts, message)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (run_id, code) DO UPDATE SET
+                start_date = excluded.start_date, end_date = excluded.end_date,
+                download_time = excluded.download_time, status = excluded.status,
+                attempts = download_records.attempts + excluded.attempts, message = excluded.message
+        ''', (code, start_date, end_date, datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+              run_id, status, attempts, message))
+        self.conn.commit()
+
+    def summary(self, run_id: str) -> Dict[str, int]:
+        """该批次各状态的股票数"""
+        rows = self.conn.execute(
+            "SELECT status, COUNT(*) FROM download_records WHERE run_id = ? GROUP BY status", (run_id,))
+        return dict(rows.fetchall())
+
+    def close(self):
+        self.conn.close()
+
+
+class AsyncDownloadEngine:
+    """
+    批量下载：并发、限速、重试和断点
+    :param fetch: 同步的下载函数 fetch(task) -> (start_date, end_date, message)，出错时抛出异常（会被重试）
+    :param checkpoint: 可选的 DownloadCheckpoint，提供时跳过该批次已完成的任务并记录每个任务的结果
+    :param is_complete: 可选的 is_complete(task, result) -> bool，成功的任务返回False时断点记为 pending 而非完成
+    """
+
+    def __init__(self, fetch: Callable, checkpoint: Optional[DownloadCheckpoint] = None,
+                 concurrency: int = CONCURRENCY, rate: float = REQUESTS_PER_SECOND, burst: int = BURST,
+                 max_retries: int = MAX_RETRIES, is_complete: Optional[Callable] = None):
+        self.fetch = fetch
+        self.checkpoint = checkpoint
+        self.is_complete = is_complete
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+
+    async def _run_task(self, task: Dict, bucket: TokenBucket, semaphore: asyncio.Semaphore):
+        """下载一个任务，返回 (任务, 是否成功, 尝试次数, 下载函数的结果或错误信息)"""
+        async with semaphore:
+            for attempt in range(self.max_retries + 1):
+                await bucket.acquire()
+                try:
+                    result = await asyncio.to_thread(self.fetch, task)
+                    bucket.speed_up()
+                    return task, True, attempt + 1, result
+                except Exception as e:
+                    bucket.slow_down()
+                    if attempt == self.max_retries:
+                        return task, False, attempt + 1, str(e)
+                    delay = backoff_delay(attempt)
+                    print(f"  {task['code']} 第 {attempt + 1} 次请求失败: {e}，{delay:.1f}秒后重试"
+                          f"（当前限速 {bucket.rate:.2f} 次/秒）")
+                    await asyncio.sleep(delay)
+
+    async def run_async(self, tasks: List[Dict], run_id: str = None) -> Dict:
+        """
+        下载全部任务
+        :param tasks: 任务列表，每个任务至少包含 'code'
+        :param run_id: 批次号，配合断点使用；相同批次号再次运行时跳过已完成的任务
+        :return: {'success': 成功数, 'failed': 失败数, 'skipped': 断点跳过数, 'results': {code: 结果}}
+        """
+        skipped = 0
+        if self.checkpoint is not None and run_id is not None:
+            finished = self.checkpoint.finished(run_id)
+            skipped = sum(task['code'] in finished for task in tasks)
+            tasks = [task for task in tasks if task['code'] not in finished]
+            if skipped:
+                print(f"从断点恢复：批次 {run_id} 已完成 {skipped} 只，剩余 {len(tasks)} 只")
+
+        bucket = TokenBucket(self.rate, self.burst)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        futures = [self._run_task(task, bucket, semaphore) for task in tasks]
+        summary = {'success': 0, 'failed': 0, 'skipped': skipped, 'results': {}}
+        start_time = time.time()
+        # 每完成一个任务立即写断点（数据库只在事件循环线程中访问）
+        for n, future in enumerate(asyncio.as_completed(futures), 1):
+            task, ok, attempts, result = await future
+            code = task['code']
+            summary['results'][code] = result
+            if ok:
+                summary['success'] += 1
+                start_date, end_date, message = result
+                print(f"✓ {code}: {message}")
+            else:
+                summary['failed'] += 1
+                start_date = end_date = None
+                message = result
+                print(f"✗ {code} 重试 {attempts} 次后仍失败: {message}")
+            if self.checkpoint is not None and run_id is not None:
+                if not ok:
+                    status = STATUS_FAILED
+                elif self.is_complete is not None and not self.is_complete(task, result):
+                    status = STATUS_PENDING
+                else:
+                    status = STATUS_DONE
+                self.checkpoint.record(run_id, code, status, attempts, message, start_date, end_date)
+            if n % 500 == 0:
+                elapsed = time.time() - start_time
+                print(f"进度: {n}/{len(tasks)}，{n / elapsed:.2f} 只/秒，当前限速 {bucket.rate:.2f} 次/秒")
+        return summary
+
+    def run(self, tasks: List[Dict], run_id: str = None) -> Dict:
+        """同步入口"""
+        return asyncio.run(self.run_async(tasks, run_id))
@@ -0,0 +1,185 @@
+"""
+收盘快照入库
+收盘后调用一次 ak.stock_zh_a_spot_em 得到全市场每只股票当日的开高低收、成交量、成交额、振幅、涨跌幅、换手率，
+转换为标准格式的当日K线后批量追加到各股票的日线CSV（DailyCsvWriter.append_bars，目录在一个事务中更新），
+每日更新由逐只股票请求历史接口（数千次请求）降为一次请求。
+快照只能接在上一交易日之后，以下股票列出后仍由历史接口逐只补齐或修正：
+- 本地没有数据（新股需要完整历史）
+- 本地最后日期早于上一交易日（中间有缺口）
+- 快照的昨收与本地最后收盘价不一致（当日除权除息，前复权的历史价格需要整体重取）
+"""
+
+import sys
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+import akshare as ak
+import pandas as pd
+
+from bar_schema import CANONICAL_COLUMNS
+from bar_store import _default_data_dir
+from daily_csv_writer import DailyCsvWriter
+from data_catalog import DataCatalog
+from derived_stores import refresh_derived_stores
+from trading_calendar import get_calendar
+
+# 快照列 -> 标准列（成交量单位为手、成交额为元、换手率为百分数，与历史接口一致）
+SPOT_COLUMNS = {
+    '代码': 'code',
+    '今开': 'open',
+    '最高': 'high',
+    '最低': 'low',
+    '最新价': 'close',
+    '成交量': 'volume',
+    '成交额': 'amount',
+    '振幅': 'amplitude',
+    '涨跌幅': 'pct_change',
+    '涨跌额': 'change',
+    '换手率': 'turnover',
+    '昨收': 'prev_close',
+}
+
+# 收盘后（含收盘集合竞价）快照才是当日的最终行情
+MARKET_CLOSE_TIME = "15:05"
+
+# 昨收与本地收盘价的允许误差（价格保留两位小数）
+PRICE_TOLERANCE = 0.005
+
+# 需要由历史接口处理的原因
+REASON_NEW = 'new'
+REASON_GAP = 'gap'
+REASON_ADJUST = 'adjust'
+
+
+def fetch_spot() -> pd.DataFrame:
+    """全市场实时行情（一次请求）"""
+    return ak.stock_zh_a_spot_em()
+
+
+def snapshot_to_bars(spot: pd.DataFrame, trade_date: str) -> pd.DataFrame:
+    """
+    快照 -> 当日K线：code、prev_close 加标准列，剔除B股和当日停牌（无成交价或成交量为0）的股票
+    """
+    bars = spot[[col for col in SPOT_COLUMNS if col in spot.columns]].rename(columns=SPOT_COLUMNS)
+    bars['code'] = bars['code'].astype(str).str.zfill(6)
+    # 与股票列表相同，剔除以9开头的上海B股和以2开头的深圳B股
+    bars = bars[~bars['code'].str[0].isin(['9', '2'])]
+    for field in SPOT_COLUMNS.values():
+        if field != 'code':
+            bars[field] = pd.to_numeric(bars.get(field), errors='coerce')
+    bars = bars[bars['close'].notna() & (bars['volume'] > 0)].copy()
+    bars['date'] = pd.Timestamp(trade_date)
+    bars['volume'] = bars['volume'].astype('int64')
+    return bars[['code', 'prev_close'] + CANONICAL_COLUMNS].drop_duplicates('code').reset_index(drop=True)
+
+
+class EodSnapshotIngestor:
+    """
+    收盘快照入库
+    :param data_dir: 数据目录，CSV在 <data_dir>/daily_data/
+    :param catalog: 共用的数据目录（默认按 data_dir 新建）
+    :param writer: 共用的日线写入器（默认按 data_dir 新建），调用方由其 written_since 得到写入过的日期
+    """
+
+    def __init__(self, data_dir=None, catalog: DataCatalog = None, writer: DailyCsvWriter = None):
+        if data_dir is None:
+            data_dir = _default_data_dir()
+        self.data_dir = data_dir
+        self.catalog = catalog or (writer.catalog if writer is not None else DataCatalog(data_dir))
+        self.writer = writer or DailyCsvWriter(data_dir, self.catalog)
+        self.calendar = get_calendar(self.data_dir)
+
+    def current_trade_date(self, now: datetime = None) -> Optional[str]:
+        """当前快照对应的交易日：今天是交易日且已收盘时返回今天，否则返回None"""
+        now = now or datetime.now()
+        if not self.calendar.is_trading_day(now):
+            print(f"{now.strftime('%Y-%m-%d')} 不是交易日，没有收盘快照")
+            return None
+        if now.strftime('%H:%M') < MARKET_CLOSE_TIME:
+            print(f"尚未收盘（{MARKET_CLOSE_TIME} 后快照才是当日最终行情）")
+            return None
+        return now.strftime('%Y-%m-%d')
+
+    def classify(self, bars: pd.DataFrame, trade_date: str):
+        """
+        按本地数据的最后日期和收盘价，把快照中的股票分为可直接追加、已是最新、需要历史接口处理三类
+        （目录先与文件同步一次，之后只读取可追加股票的文件末尾）
+        :return: (可追加的当日K线, 已是最新的股票数, 需要处理的 {code: 原因})
+        """
+        prev_day = self.calendar.prev_trading_day(trade_date)
+        self.catalog.refresh()
+        infos = self.catalog.entries()
+        appendable = []
+        up_to_date = 0
+        backfill = {}
+        for row in bars.itertuples(index=False):
+            info = infos.get(row.code)
+            if info is None or info['last_date'] is None:
+                backfill[row.code] = REASON_NEW
+            elif info['last_date'] >= trade_date:
+                up_to_date += 1
+            elif info['last_date'] != prev_day:
+                backfill[row.code] = REASON_GAP
+            else:
+                last_close = pd.to_numeric((self.writer.last_row(row.code, info) or {}).get('close'), errors='coerce')
+                if pd.isna(last_close) or pd.isna(row.prev_close) or \
+                        abs(last_close - row.prev_close) > PRICE_TOLERANCE:
+                    backfill[row.code] = REASON_ADJUST
+                else:
+                    appendable.append(row.code)
+        return bars[bars['code'].isin(appendable)], up_to_date, backfill
+
+    def ingest(self, spot: pd.DataFrame = None, trade_date: str = None) -> Optional[Dict]:
+        """
+        把一次收盘快照写入本地日线
+        :param spot: 已获取的快照（默认调用接口获取）
+        :param trade_date: 快照对应的交易日（默认今天，非交易日或未收盘时不入库）
+        :return: {'trade_date', 'snapshot': 有成交的股票数, 'appended': 追加的股票数, 'up_to_date': 已是最新的股票数,
+                  'backfill': {code: 'new'/'gap'/'adjust'}}；不能入库时返回None
+        """
+        trade_date = trade_date or self.current_trade_date()
+        if trade_date is None:
+            return None
+
+        start_time = time.time()
+        if spot is None:
+            print("正在获取全市场收盘快照...")
+            spot = fetch_spot()
+        bars = snapshot_to_bars(spot, trade_date)
+        appendable, up_to_date, backfill = self.classify(bars, trade_date)
+        added = self.writer.append_bars(appendable[['code'] + CANONICAL_COLUMNS])
+        appended = sum(1 for count in added.values() if count > 0)
+
+        print(f"{trade_date} 收盘快照入库完成，耗时: {time.time() - start_time:.2f}秒")
+        print(f"快照中有成交的股票: {len(bars)} 只，追加当日K线: {appended} 只，已是最新: {up_to_date} 只")
+        reasons = pd.Series(backfill, dtype=object).value_counts().to_dict()
+        if backfill:
+            print(f"需要历史接口处理: {len(backfill)} 只（新股 {reasons.get(REASON_NEW, 0)}，"
+                  f"缺口 {reasons.get(REASON_GAP, 0)}，除权除息 {reasons.get(REASON_ADJUST, 0)}）")
+        return {
+            'trade_date': trade_date,
+            'snapshot': len(bars),
+            'appended': appended,
+            'up_to_date': up_to_date,
+            'backfill': backfill,
+        }
+
+
+def main():
+    """
+    命令行：python eod_snapshot.py [数据目录]，收盘后把全市场快照追加到本地日线并刷新派生存储
+    （需要历史接口处理的股票只列出）
+    """
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else None
+    ingestor = EodSnapshotIngestor(data_dir)
+    result = ingestor.ingest()
+    if result and result['appended']:
+        refresh_derived_stores(data_dir, written_since=ingestor.writer.written_since)
+    if result and result['backfill']:
+        print("请运行 incremental_download.py 的收盘快照模式补齐: " +
+              ", ".join(sorted(result['backfill'])[:20]) + (" ..." if len(result['backfill']) > 20 else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,513 @@
+"""
+因子库
+在列式日线存储的每一根K线上预先计算常用因子（均线、相对位置、均价获利、量比、左压周期、ATR、换手率Z值等），
+因子列与日线行一一对应，保存在 full_stock_data/factor_store/，读取时内存映射。
+每根K线的因子只依赖该股票截至这根K线的最近 FACTOR_WINDOW 根日线，
+因此列式存储重建后只需为新增的K线计算（每行 O(窗口) 的工作量），已有K线的因子直接沿用
+"""
+
+import os
+import json
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set
+
+import numpy as np
+import pandas as pd
+
+from bar_store import BarStore, _dates_to_days, _days_to_dates, _default_data_dir, _new_tmp_dir, _store_lock, _swap_dir
+
+
+# 存储格式版本，因子定义或布局变化时递增
+FACTOR_VERSION = 1
+
+# 每根K线回看的日线数量（左压周期最多回看100天）
+FACTOR_WINDOW = 101
+
+# 计算因子用到的日线字段
+WINDOW_FIELDS = ['open', 'high', 'low', 'close', 'volume', 'amount', 'turnover']
+
+# 均线周期
+MA_WINDOWS = (5, 10, 20)
+
+# 相对位置的回看天数
+RP_WINDOW = 60
+
+# 找不到左压高点时的左压周期
+ZYTS_DEFAULT = 100
+
+# ATR 周期
+ATR_WINDOW = 14
+
+# 量比的基准天数（前N日平均成交量）
+VOLUME_RATIO_WINDOW = 5
+
+# 换手率Z值的回看天数
+TURNOVER_Z_WINDOW = 20
+
+# 因子名称
+FACTORS = [
+    'history_length',     # 可用的历史K线数（最多 FACTOR_WINDOW）
+    'volume_adj',         # 单位修正后的成交量（股）
+    'avg_price_profit',   # 均价获利：均价/收盘价*1.1-1
+    'avg_price_change',   # 均价涨幅：均价/收盘价-1
+    'zyts_0',             # 左压周期
+    'max_prev_vol',       # 左压周期+5根K线内（不含当根）的最大成交量
+    'left_pressure',      # 当根成交量是否放大到上述最大成交量的0.9倍以上
+    'rp_60',              # 60日相对位置
+    'increase_3d',        # 前3日涨幅（最近4根收盘价）
+    'open_close',         # 当根开收比例
+    'return_1d',          # 收盘价涨跌幅
+    'ma5',
+    'ma10',
+    'ma20',
+    'volume_ratio_5',     # 成交量 / 前5根平均成交量
+    'atr_14',
+    'turnover_z_20',      # 换手率相对最近20根的Z值
+]
+
+# 全量计算时每批处理的K线数，控制窗口矩阵的内存占用
+CHUNK_ROWS = 20000
+
+# 左压相关的因子（由单调栈按股票一次扫描得到，不走窗口矩阵）
+LEFT_PRESSURE_FACTORS = ['zyts_0', 'max_prev_vol', 'left_pressure']
+
+
+def row_fingerprints(columns: Dict[str, np.ndarray]) -> np.ndarray:
+    """
+    每一行日线的指纹：WINDOW_FIELDS 各字段按位组合成一个 uint64
+    增量更新时用来判断旧因子能否沿用，任一输入字段（如成交量、成交额的修正）变化都会改变指纹
+    """
+    fingerprints = None
+    for k, field in enumerate(WINDOW_FIELDS):
+        values = np.asarray(columns[field], dtype=np.float64)
+        bits = np.where(np.isnan(values), np.nan, values).view(np.uint64)
+        # 每个字段乘以不同的奇数再循环左移，避免不同字段的变化相互抵消
+        mixed = bits * np.uint64(0x9E3779B97F4A7C15 + 2 * k)
+        shift = np.uint64(7 * k + 1)
+        mixed = (mixed << shift) | (mixed >> (np.uint64(64) - shift))
+        fingerprints = mixed if fingerprints is None else fingerprints ^ mixed
+    return fingerprints
+
+
+def gather_windows(columns: Dict[str, np.ndarray], starts: np.ndarray, rows: np.ndarray,
+                   bars: int = FACTOR_WINDOW, fields: List[str] = None) -> Dict[str, np.ndarray]:
+    """
+    取每个目标行（含）之前同一只股票的最近 bars 根日线
+    :param starts: 每个目标行所属股票的起始行
+    :param rows: 目标行
+    :return: {字段: (目标行数, bars) 的矩阵，右对齐，股票起始之前的部分为NaN, 'length': 可用根数}
+    """
+    fields = fields or WINDOW_FIELDS
+    idx = rows[:, None] - bars + 1 + np.arange(bars)[None, :]
+    valid = idx >= starts[:, None]
+    safe_idx = np.where(valid, idx, 0)
+    window = {}
+    for field in fields:
+        values = np.asarray(columns[field])[safe_idx].astype(np.float64)
+        window[field] = np.where(valid, values, np.nan)
+    window['length'] = valid.sum(axis=1)
+    return window
+
+
+def left_pressure_kernel(high: np.ndarray, volume: np.ndarray, first: int = 0):
+    """
+    单只股票的左压周期和左压成交量，单调栈一次扫描 O(n)
+    左压周期：往前（跳过前一根）找最近一根高点 >= 当根高点的K线，距离为其到前一根的根数，
+    只在最近 FACTOR_WINDOW 根K线内找，找不到为 ZYTS_DEFAULT；
+    左压成交量：左压周期+5 根K线（不含当根，同样限制在最近 FACTOR_WINDOW 根内）的最大成交量，没有为 -inf
+    :param high: 该股票按日期排列的最高价
+    :param volume: 该股票按日期排列的成交量
+    :param first: 从第几根开始输出（之前的K线只用于建栈）
+    :return: (左压周期, 左压成交量)，均为 high[first:] 对应的数组
+    """
+    n = len(high)
+    lookback = FACTOR_WINDOW - 1
+    # 缺失的高点不会被当作左压高点；当根高点缺失时按0处理
+    stack_high = np.where(np.isnan(high), -np.inf, high).tolist()
+    query_high = np.nan_to_num(high).tolist()
+
+    # 栈中保存下标，对应的高点自底向上不增：被后来更高（更近）的K线压住的高点不可能再是答案
+    stack = []
+    zyts = np.full(n - first, ZYTS_DEFAULT, dtype=np.int64)
+    for i in range(max(first - lookback, 0), n):
+        # 当根之前的第2根入栈（前一根不参与比较）
+        if i >= 2:
+            pushed = stack_high[i - 2]
+            while stack and stack_high[stack[-1]] < pushed:
+                stack.pop()
+            stack.append(i - 2)
+        if i < first:
+            continue
+        # 自栈顶往下找第一根高点 >= 当根高点的K线，不出栈
+        # 被跳过的下标在当根入栈时会被弹出，因此每个下标最多被跳过两次，总体仍为 O(n)
+        target = query_high[i]
+        k = len(stack) - 1
+        while k >= 0 and stack_high[stack[k]] < target:
+            k -= 1
+        if k >= 0 and stack[k] >= i - lookback:
+            zyts[i - first] = i - 1 - stack[k]
+
+    # 变长区间 [i-4-左压周期, i-1] 的最大成交量：稀疏表 O(1) 查询
+    rows = np.arange(first, n)
+    lo = np.maximum(rows - 4 - zyts, np.maximum(rows - lookback, 0))
+    hi = rows - 1
+    volumes = np.where(np.isnan(volume), -np.inf, volume.astype(np.float64))
+    max_prev_vol = np.full(len(rows), -np.inf)
+    valid = lo <= hi
+    if valid.any():
+        lo, hi = lo[valid], hi[valid]
+        k = np.floor(np.log2(hi - lo + 1)).astype(np.int64)
+        levels = [volumes]
+        while len(levels) <= int(k.max()):
+            step = 1 << (len(levels) - 1)
+            levels.append(np.maximum(levels[-1][:-step], levels[-1][step:]))
+        result = np.empty(len(lo))
+        for level in np.unique(k):
+            sel = k == level
+            table = levels[level]
+            result[sel] = np.maximum(table[lo[sel]], table[hi[sel] - (1 << level) + 1])
+        max_prev_vol[valid] = result
+    return zyts, max_prev_vol
+
+
+def left_pressure_factors(columns: Dict[str, np.ndarray], offsets: np.ndarray,
+                          rows: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    按股票逐只运行 left_pressure_kernel，得到目标行的左压因子
+    每只股票只从其第一根目标行往前 FACTOR_WINDOW 根开始扫描
+    :param rows: 目标行（升序）
+    """
+    high = np.asarray(columns['high'])
+    volume = np.asarray(columns['volume'])
+    stock_ids = np.searchsorted(offsets, rows, side='right') - 1
+
+    factors = {name: np.empty(len(rows)) for name in LEFT_PRESSURE_FACTORS}
+    for group in np.split(np.arange(len(rows)), np.flatnonzero(np.diff(stock_ids)) + 1):
+        if not len(group):
+            continue
+        i = stock_ids[group[0]]
+        start, end = int(offsets[i]), int(offsets[i + 1])
+        first = int(rows[group[0]])
+        seg_start = max(start, first - FACTOR_WINDOW + 1)
+        zyts, max_vol = left_pressure_kernel(np.asarray(high[seg_start:end], dtype=np.float64),
+                                             np.asarray(volume[seg_start:end]), first - seg_start)
+        pos = rows[group] - first
+        max_vol = max_vol[pos]
+        last_volume = np.nan_to_num(np.asarray(volume[rows[group]], dtype=np.float64))
+        length = rows[group] - start + 1
+        factors['zyts_0'][group] = zyts[pos]
+        factors['max_prev_vol'][group] = max_vol
+        factors['left_pressure'][group] = (length >= 2) & np.where(max_vol > 0, last_volume > max_vol * 0.9, True)
+    return factors
+
+
+def compute_window_factors(window: Dict[str, np.ndarray], left_pressure: bool = True) -> Dict[str, np.ndarray]:
+    """
+    由窗口矩阵计算每一行最后一根K线的因子（所有运算都是矩阵运算）
+    :param window: gather_windows 的结果
+    :param left_pressure: 为False时不计算左压因子（因子库改由 left_pressure_factors 计算）
+    """
+    length = window['length']
+    high = window['high']
+    volume = window['volume']
+    bars = high.shape[1]
+
+    close = np.nan_to_num(window['close'][:, -1])
+    open_ = np.nan_to_num(window['open'][:, -1])
+    amount = np.nan_to_num(window['amount'][:, -1])
+    volume_raw = np.where(np.isnan(volume[:, -1]), 1.0, volume[:, -1])
+    last_volume = np.nan_to_num(volume[:, -1])
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # 成交量单位修正：按原始成交量算出的均价远大于收盘价时，成交量单位为手
+        raw_avg_price = np.where(volume_raw != 0, amount / volume_raw, 0.0)
+        volume_adj = np.where(volume_raw == 0, 1.0,
+                              np.where(raw_avg_price > close * 5, volume_raw * 100, volume_raw))
+        avg_price = amount / volume_adj
+        avg_price_profit = np.where(close != 0, avg_price / close * 1.1 - 1, np.nan)
+        avg_price_change = np.where(close != 0, avg_price / close - 1, 0.0)
+
+    factors = {}
+    if left_pressure:
+        # 左压周期：从倒数第3根往前找第一根高点 >= 当根高点的K线，距离为其到倒数第2根的根数
+        last_high = np.nan_to_num(high[:, -1])
+        with np.errstate(invalid='ignore'):
+            hits = high[:, :-2] >= last_high[:, None]
+        has_hit = hits.any(axis=1)
+        last_hit = bars - 3 - np.argmax(hits[:, ::-1], axis=1)
+        zyts_0 = np.where(has_hit, bars - 2 - last_hit, ZYTS_DEFAULT)
+
+        # 左压周期+5 根K线（不含当根）内的最大成交量，当根成交量需放大到其 0.9 倍以上
+        col = np.arange(bars)[None, :]
+        in_window = (col >= bars - (zyts_0 + 5)[:, None]) & (col < bars - 1) & ~np.isnan(volume)
+        max_prev_vol = np.where(in_window, volume, -np.inf).max(axis=1)
+        left_pressure = (length >= 2) & np.where(max_prev_vol > 0, last_volume > max_prev_vol * 0.9, True)
+        factors['zyts_0'] = zyts_0.astype(np.float64)
+        factors['max_prev_vol'] = max_prev_vol
+        factors['left_pressure'] = left_pressure.astype(np.float64)
+
+    # 60日相对位置
+    recent_high = high[:, -RP_WINDOW:]
+    recent_low = window['low'][:, -RP_WINDOW:]
+    high_60 = np.where(np.isnan(recent_high), -np.inf, recent_high).max(axis=1)
+    low_60 = np.where(np.isnan(recent_low), np.inf, recent_low).min(axis=1)
+
+    close_4 = np.nan_to_num(window['close'][:, -4:])
+    closes = window['close']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rp_60 = np.where((length >= RP_WINDOW) & (high_60 != low_60),
+                         (close - low_60) / (high_60 - low_60), np.nan)
+        # 前3日涨幅（最近4根收盘价）与当根开收比例
+        increase_3d = np.where((length >= 4) & (close_4 > 0).all(axis=1),
+                               (close_4[:, -1] - close_4[:, 0]) / close_4[:, 0], np.nan)
+        open_close = np.where(open_ != 0, (close - open_) / open_, 0.0)
+        return_1d = closes[:, -1] / closes[:, -2] - 1
+
+        # 均线：不足周期的为NaN（与 rolling(n).mean() 一致）
+        mas = {f"ma{n}": closes[:, -n:].mean(axis=1) for n in MA_WINDOWS}
+
+        # 量比：当根成交量 / 前N根平均成交量
+        volume_ratio = volume[:, -1] / volume[:, -1 - VOLUME_RATIO_WINDOW:-1].mean(axis=1)
+
+        # ATR：最近N根真实波幅的均值
+        prev_closes = closes[:, -ATR_WINDOW - 1:-1]
+        highs = high[:, -ATR_WINDOW:]
+        lows = window['low'][:, -ATR_WINDOW:]
+        true_range = np.maximum(highs - lows, np.maximum(np.abs(highs - prev_closes), np.abs(lows - prev_closes)))
+        atr = true_range.mean(axis=1)
+
+        # 换手率Z值：相对最近N根（含当根）的均值和样本标准差
+        turnover = window['turnover'][:, -TURNOVER_Z_WINDOW:]
+        turnover_z = (turnover[:, -1] - turnover.mean(axis=1)) / turnover.std(axis=1, ddof=1)
+
+    factors.update({
+        'history_length': length.astype(np.float64),
+        'volume_adj': volume_adj,
+        'avg_price_profit': avg_price_profit,
+        'avg_price_change': avg_price_change,
+        'rp_60': rp_60,
+        'increase_3d': increase_3d,
+        'open_close': open_close,
+        'return_1d': return_1d,
+        'volume_ratio_5': volume_ratio,
+        'atr_14': atr,
+        'turnover_z_20': turnover_z,
+    })
+    factors.update(mas)
+    return factors
+
+
+class FactorStore:
+    """
+    因子库
+    目录结构（<data_dir>/factor_store/）:
+        meta.json      版本、因子、行数、对应的列式存储生成时间
+        codes.npy      股票代码（与列式存储一致）
+        offsets.npy    每只股票的起止行
+        dates.npy      每一行的日期（用于增量更新时核对历史是否变化）
+        fingerprints.npy  每一行计算因子所用字段的指纹（同上，复权、成交量或成交额修正后不能沿用）
+        <factor>.npy   各因子的 float64 列，与列式存储的行一一对应
+    """
+
+    def __init__(self, data_dir=None):
+        if data_dir is None:
+            data_dir = _default_data_dir()
+        self.data_dir = data_dir
+        self.store_dir = os.path.join(data_dir, "factor_store")
+        self.meta_path = os.path.join(self.store_dir, "meta.json")
+        self.bar_store = BarStore(data_dir)
+
+        self._meta = None
+        self._factors = {}
+        self._code_index = None
+
+    # ------------------------------------------------------------------ 生成
+
+    def exists(self) -> bool:
+        """因子库是否已生成"""
+        return os.path.exists(self.meta_path)
+
+    def _read_meta(self) -> Optional[Dict]:
+        if not self.exists():
+            return None
+        with open(self.meta_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def is_fresh(self) -> bool:
+        """因子库是否与当前列式存储一致（可以直接按行读取）"""
+        meta = self._read_meta()
+        return (meta is not None and meta.get('version') == FACTOR_VERSION and meta.get('factors') == FACTORS
+                and self.bar_store.exists() and meta.get('bar_store_built_at') == self.bar_store.get_built_at())
+
+    def _reusable_rows(self, codes: np.ndarray, offsets: np.ndarray, days: np.ndarray, fingerprints: np.ndarray,
+                       recompute: Set[str] = frozenset()):
+        """
+        新旧存储之间可以沿用的行：同一股票在旧因子库中的全部K线，且新存储中相同位置的日期和输入字段指纹都一致
+        :param recompute: 必须整只重新计算的股票（如历史被整体替换过）
+        :return: (新存储中的行号, 旧因子库中的行号)
+        """
+        meta = self._read_meta()
+        fingerprints_path = os.path.join(self.store_dir, "fingerprints.npy")
+        if meta is None or meta.get('version') != FACTOR_VERSION or meta.get('factors') != FACTORS \
+                or not os.path.exists(fingerprints_path):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        old_codes = np.load(os.path.join(self.store_dir, "codes.npy")).tolist()
+        old_offsets = np.load(os.path.join(self.store_dir, "offsets.npy"))
+        old_days = np.load(os.path.join(self.store_dir, "dates.npy"), mmap_mode='r')
+        old_fingerprints = np.load(fingerprints_path, mmap_mode='r')
+        old_index = {code: i for i, code in enumerate(old_codes)}
+
+        new_rows = []
+        old_rows = []
+        for i, code in enumerate(codes.tolist()):
+            j = old_index.get(code)
+            if j is None or code in recompute:
+                continue
+            start, end = int(offsets[i]), int(offsets[i + 1])
+            old_start, old_end = int(old_offsets[j]), int(old_offsets[j + 1])
+            n = old_end - old_start
+            # 历史被改写（行数变少、最后一根日期不同，或价格、成交量、成交额等有变化，如除权除息后的前复权）时整只股票重新计算
+            if n == 0 or n > end - start or days[start + n - 1] != old_days[old_end - 1]:
+                continue
+            if not np.array_equal(fingerprints[start:start + n], old_fingerprints[old_start:old_end]):
+                continue
+            new_rows.append(np.arange(start, start + n))
+            old_rows.append(np.arange(old_start, old_end))
+        if not new_rows:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        return np.concatenate(new_rows), np.concatenate(old_rows)
+
+    def update(self, rebuild: bool = False, recompute: Iterable[str] = ()) -> int:
+        """
+        按当前列式存储更新因子库：已有K线的因子沿用，只计算新增的K线
+        :param rebuild: 为True时全部重新计算
+        :param recompute: 需要整只重新计算的股票代码（如除权除息后整体替换了历史的股票）
+        :return: 计算的行数
+        """
+        recompute = {code.split('.')[0] for code in recompute}
+        if not self.bar_store.exists():
+            print("未找到列式存储，无法计算因子（请先运行 python bar_store.py）")
+            return 0
+        if not rebuild and not recompute and self.is_fresh():
+            print("因子库已是最新")
+            return 0
+
+        start_time = time.time()
+        codes, offsets, columns = self.bar_store.get_columns()
+        days = np.asarray(columns['date'])
+        n_rows = int(offsets[-1])
+        row_starts = np.repeat(offsets[:-1], np.diff(offsets))
+
+        fingerprints = row_fingerprints(columns)
+
+        values = {name: np.full(n_rows, np.nan) for name in FACTORS}
+        computed = np.ones(n_rows, dtype=bool)
+        if not rebuild:
+            new_rows, old_rows = self._reusable_rows(codes, offsets, days, fingerprints, recompute)
+            if len(new_rows):
+                for name in FACTORS:
+                    old_values = np.load(os.path.join(self.store_dir, f"{name}.npy"), mmap_mode='r')
+                    values[name][new_rows] = old_values[old_rows]
+                computed[new_rows] = False
+
+        todo = np.flatnonzero(computed)
+        for chunk_start in range(0, len(todo), CHUNK_ROWS):
+            rows = todo[chunk_start:chunk_start + CHUNK_ROWS]
+            factors = compute_window_factors(gather_windows(columns, row_starts[rows], rows), left_pressure=False)
+            for name, factor in factors.items():
+                values[name][rows] = factor
+        # 左压因子按股票用单调栈一次扫描
+        if len(todo):
+            for name, factor in left_pressure_factors(columns, offsets, todo).items():
+                values[name][todo] = factor
+
+        self._write(codes, offsets, days, fingerprints, values)
+        print(f"因子库更新完成，计算 {len(todo)} 行，沿用 {n_rows - len(todo)} 行，"
+              f"耗时: {time.time() - start_time:.2f}秒，保存路径: {self.store_dir}")
+        return len(todo)
+
+    def _write(self, codes: np.ndarray, offsets: np.ndarray, days: np.ndarray, fingerprints: np.ndarray,
+               values: Dict[str, np.ndarray]):
+        """写入因子列：先写临时目录再整体替换"""
+        tmp_dir = _new_tmp_dir(self.store_dir)
+
+        np.save(os.path.join(tmp_dir, "codes.npy"), np.asarray(codes))
+        np.save(os.path.join(tmp_dir, "offsets.npy"), np.asarray(offsets))
+        np.save(os.path.join(tmp_dir, "dates.npy"), days.astype(np.int32))
+        np.save(os.path.join(tmp_dir, "fingerprints.npy"), fingerprints)
+        for name in FACTORS:
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), values[name])
+
+        meta = {
+            'version': FACTOR_VERSION,
+            'factors': FACTORS,
+            'window': FACTOR_WINDOW,
+            'n_rows': int(offsets[-1]),
+            'bar_store_built_at': self.bar_store.get_built_at(),
+            'built_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        with open(os.path.join(tmp_dir, "meta.json"), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+
+        _swap_dir(tmp_dir, self.store_dir)
+
+        self._meta = None
+        self._factors = {}
+
+    # ------------------------------------------------------------------ 读取
+
+    def _load(self):
+        """持有共享锁一次映射全部因子列，保证各列来自同一次生成（写者替换目录时持有独占锁）"""
+        if self._meta is not None:
+            return
+        with _store_lock(self.store_dir, exclusive=False):
+            meta = self._read_meta()
+            self._factors = {name: np.load(os.path.join(self.store_dir, f"{name}.npy"), mmap_mode='r')
+                             for name in FACTORS}
+        self._meta = meta
+
+    def factor(self, name: str) -> np.ndarray:
+        """某个因子的整列（与列式存储的行一一对应，只读内存映射）"""
+        if name not in FACTORS:
+            raise KeyError(f"未知的因子: {name}")
+        self._load()
+        return self._factors[name]
+
+    def get_rows(self, rows: np.ndarray, names: List[str] = None) -> Dict[str, np.ndarray]:
+        """按列式存储的行号取因子"""
+        rows = np.asarray(rows, dtype=np.int64)
+        return {name: np.asarray(self.factor(name)[rows]) for name in (names or FACTORS)}
+
+    def get_stock_factors(self, stock_code: str, names: List[str] = None,
+                          start_date: str = None, end_date: str = None) -> pd.DataFrame:
+        """单只股票的因子序列（date 为 datetime 列，按日期升序）"""
+        codes, offsets, columns = self.bar_store.get_columns()
+        if self._code_index is None:
+            self._code_index = {code: i for i, code in enumerate(codes.tolist())}
+        i = self._code_index.get(stock_code.split('.')[0])
+        names = names or FACTORS
+        if i is None:
+            return pd.DataFrame(columns=['date'] + names)
+        start, end = int(offsets[i]), int(offsets[i + 1])
+        days = columns['date']
+        if start_date is not None:
+            start += int(np.searchsorted(days[start:end], _dates_to_days([start_date])[0], side='left'))
+        if end_date is not None:
+            end = start + int(np.searchsorted(days[start:end], _dates_to_days([end_date])[0], side='right'))
+        data = {'date': _days_to_dates(days[start:end])}
+        for name in names:
+            data[name] = np.asarray(self.factor(name)[start:end])
+        return pd.DataFrame(data)
+
+
+def main():
+    """命令行：生成/增量更新因子库（--rebuild 全部重新计算）"""
+    import sys
+    args = [arg for arg in sys.argv[1:] if arg != '--rebuild']
+    store = FactorStore(args[0] if args else None)
+    store.update(rebuild='--rebuild' in sys.argv)
+
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,7 @@ import json
 import os
 import time
 import warnings
+from bar_store import BarStore
 warnings.filterwarnings('ignore')
 
 
@@ -21,6 +22,7 @@ class StockMarketCapManager:
         self.data_dir = data_dir
         self.market_cap_file = os.path.join(data_dir, 'market_caps.json')
         self.daily_data_dir = os.path.join(data_dir, 'daily_data')  # 本地日线数据目录
+        self.bar_store = BarStore(data_dir)  # 列式日线存储
         self.ensure_directory_exists()
     
     def ensure_directory_exists(self):
@@ -119,50 +121,12 @@ class StockMarketCapManager:
         :return: 收盘价，如果找不到则返回None
         """
         try:
-            # 构建CSV文件路径
-            csv_file = os.path.join(self.daily_data_dir, f'{stock_code}.csv')
-            if not os.path.exists(csv_file):
-                print(f"股票 {stock_code} 的本地历史数据文件不存在: {csv_file}")
-                return None
-            
-            # 读取CSV文件
-            df = pd.read_csv(csv_file)
-            
-            # 重命名列以处理中文列名
-            df.rename(columns={
-                '股\u3000\u3000票\u3000\u3000代\u3000\u3000码\u3000': 'code',
-                '股\u3000票\u3000代\u3000码': 'code',
-                '开\u3000\u3000盘': 'open',
-                '开\u3000盘': 'open',
-                '收\u3000\u3000盘': 'close',
-                '收\u3000盘': 'close',
-                '最\u3000\u3000高': 'high',
-                '最\u3000高': 'high',
-                '最\u3000\u3000低': 'low',
-                '最\u3000低': 'low',
-                '成\u3000\u3000交\u3000量': 'volume',
-                '成\u3000交\u3000量': 'volume',
-                '成\u3000\u3000交\u3000额': 'amount',
-                '成\u3000交\u3000额': 'amount',
-                '振\u3000\u3000幅': 'amplitude',
-                '振\u3000幅': 'amplitude',
-                '涨\u3000\u3000跌\u3000\u3000幅': 'pct_change',
-                '涨\u3000跌\u3000幅': 'pct_change',
-                '涨\u3000\u3000跌\u3000\u3000额': 'change',
-                '涨\u3000跌\u3000额': 'change',
-                '换\u3000\u3000手\u3000\u3000率': 'turnover',
-                '换\u3000手\u3000率': 'turnover'
-            }, inplace=True)
-            
-            df['date'] = pd.to_datetime(df['date'])
-            
-            # 查找指定日期的数据
-            day_data = df[df['date'] == pd.to_datetime(date_str)]
-            if day_data.empty:
+            # 从列式存储直接取当日日线（存储未生成时回退到CSV）
+            day_data = self.bar_store.get_bar(stock_code, date_str)
+            if day_data is None:
                 # 如果找不到指定日期的数据，返回None
                 return None
             
-            day_data = day_data.iloc[0]
             close_price = float(day_data.get('close', 0)) if pd.notna(day_data.get('close', 0)) else 0
             
             if close_price <= 0:  # 无效价格，返回None
@@ -11,16 +11,27 @@ import sqlite3
 from datetime import datetime, timedelta
 import time
 import warnings
-import concurrent.futures
+from data_catalog import DataCatalog
+from daily_csv_writer import DailyCsvWriter
+from derived_stores import refresh_derived_stores
+from download_engine import AsyncDownloadEngine, DownloadCheckpoint, REQUESTS_PER_SECOND, MAX_RETRIES
+from eod_snapshot import EodSnapshotIngestor, MARKET_CLOSE_TIME, REASON_ADJUST, REASON_NEW
+from trading_calendar import get_calendar
 warnings.filterwarnings('ignore')
 
 class IncrementalDataDownloader:
-    def __init__(self, data_dir="full_stock_data", max_workers=10):
+    def __init__(self, data_dir="full_stock_data", max_workers=10,
+                 requests_per_second=REQUESTS_PER_SECOND, max_retries=MAX_RETRIES):
         self.data_dir = data_dir
         self.db_path = os.path.join(data_dir, "stock_data.db")
-        self.max_workers = max_workers  # 多线程并发数
+        self.max_workers = max_workers  # 最大并发请求数
+        self.requests_per_second = requests_per_second  # 请求速率上限（次/秒）
+        self.max_retries = max_retries  # 单只股票失败后的重试次数
         self.ensure_directories()
         self.init_database()
+        self.catalog = DataCatalog(data_dir)
+        self.csv_writer = DailyCsvWriter(data_dir, self.catalog)
+        self.corrected_codes = set()  # 本次运行中整体替换过历史的股票，因子需要整只重新计算
     
     def ensure_directories(self):
         """确保数据目录存在"""
@@ -102,123 +113,98 @@ class IncrementalDataDownloader:
             return []
     
     def get_existing_stock_data_info(self, stock_code):
-        """获取已有股票数据的信息（最早和最晚日期）"""
-        ak_code = stock_code.replace('.XSHG', '').replace('.XSHE', '')
-        csv_path = os.path.join(self.data_dir, "daily_data", f"{ak_code}.csv")
-        
-        if os.path.exists(csv_path):
-            try:
-                df = pd.read_csv(csv_path)
-                if 'date' in df.columns and not df.empty:
-                    df['date'] = pd.to_datetime(df['date'])
-                    earliest_date = df['date'].min()  # 保持为pandas Timestamp类型
-                    latest_date = df['date'].max()    # 保持为pandas Timestamp类型
-                    return earliest_date, latest_date
-            except Exception as e:
-                print(f"读取 {stock_code} 数据失败: {e}")
-        
+        """获取已有股票数据的信息（最早和最晚日期），由数据目录回答，不读取CSV"""
+        entry = self.csv_writer.tail(stock_code)
+        if entry is not None and entry['last_date'] is not None:
+            return pd.Timestamp(entry['first_date']), pd.Timestamp(entry['last_date'])
         return None, None
     
-    def update_single_stock_data(self, stock_info, days=30):
-        """更新单只股票数据 - 用于多线程"""
+    def download_stock(self, stock_info, days=30):
+        """
+        下载单只股票的新数据并合并到CSV，接口出错时抛出异常（由调用方决定是否重试）
+        任务带 end_date（YYYYMMDD）时只下载到该日，避免收盘前写入当日未完成的K线
+        :return: (下载开始日期, 下载结束日期, 结果说明)；没有新数据时说明为"无新数据"
+        """
         code = stock_info['code']
         ak_code = code.replace('.XSHG', '').replace('.XSHE', '')
         
-        # 获取现有数据的日期范围
-        existing_start, existing_end = self.get_existing_stock_data_info(code)
+        # 由尾部索引得到现有数据的最后日期，不读取整个文件
+        tail = self.csv_writer.tail(code)
         
-        if existing_end is not None:
-            # 将现有结束日期转换为字符串格式
-            # 处理不同的日期类型
-            if hasattr(existing_end, 'strftime'):
-                # 如果是pandas Timestamp或datetime对象
-                existing_end_str = existing_end.strftime('%Y-%m-%d')
-            elif isinstance(existing_end, str):
-                existing_end_str = existing_end
-            else:
-                # 其他情况，尝试转换为字符串
-                existing_end_str = str(existing_end)
-            
+        if tail is not None and tail['last_date'] is not None:
             # 从现有数据的最后一天开始下载新数据
-            existing_end_dt = datetime.strptime(existing_end_str, '%Y-%m-%d')
+            existing_end_dt = datetime.strptime(tail['last_date'], '%Y-%m-%d')
             start_date = (existing_end_dt + timedelta(days=1)).strftime('%Y%m%d')
         else:
             # 如果没有现有数据，下载最近的数据
             start_date = (datetime.now() - timedelta(days=days)).strftime('%Y%m%d')
         
+        end_date = stock_info.get('end_date') or datetime.now().strftime('%Y%m%d')
+        if start_date > end_date:
+            return start_date, end_date, "无新数据"
+        
+        # 获取日线数据
+        df = ak.stock_zh_a_hist(
+            symbol=ak_code, 
+            period="daily", 
+            start_date=start_date,
+            end_date=end_date,
+            adjust="qfq"
+        )
+        
+        if df is None or df.empty:
+            self.catalog.touch(code)
+            return start_date, end_date, "无新数据"
+        
+        # 只在文件末尾追加新日期的行（列名由写入方按 bar_schema 统一）
+        added = self.csv_writer.append(code, df)
+        if added == 0:
+            return start_date, end_date, "无新数据"
+        if tail is None:
+            action = f"新增 {added} 条数据"
+        else:
+            action = f"更新 {added} 条新数据，总计 {tail['rows'] + added} 条数据"
+        return start_date, end_date, action
+    
+    def correct_stock(self, stock_info):
+        """
+        重新下载单只股票的完整历史并替换CSV（除权除息后前复权价格整体变化时修正），接口出错时抛出异常
+        :return: (下载开始日期, 下载结束日期, 结果说明)
+        """
+        code = stock_info['code']
+        ak_code = code.replace('.XSHG', '').replace('.XSHE', '')
+        tail = self.csv_writer.tail(code)
+        start_date = tail['first_date'].replace('-', '') if tail is not None and tail['first_date'] else \
+            (datetime.now() - timedelta(days=365)).strftime('%Y%m%d')
         end_date = datetime.now().strftime('%Y%m%d')
         
+        df = ak.stock_zh_a_hist(
+            symbol=ak_code, 
+            period="daily", 
+            start_date=start_date,
+            end_date=end_date,
+            adjust="qfq"
+        )
+        if df is None or df.empty:
+            self.catalog.touch(code)
+            return start_date, end_date, "无新数据"
+        rows = self.csv_writer.replace(code, df)
+        self.corrected_codes.add(ak_code)
+        return start_date, end_date, f"复权修正，重写 {rows} 条数据"
+    
+    def update_single_stock_data(self, stock_info, days=30):
+        """更新单只股票数据（不重试），返回 (是否有新数据, 股票代码, 结果说明, 总数据条数)"""
+        code = stock_info['code']
         try:
-            # 获取日线数据
-            df = ak.stock_zh_a_hist(
-                symbol=ak_code, 
-                period="daily", 
-                start_date=start_date,
-                end_date=end_date,
-                adjust="qfq"
-            )
-            
-            if df is not None and not df.empty:
-                # 重命名列
-                df.rename(columns={
-                    '开盘': 'open', 
-                    '收盘': 'close', 
-                    '最高': 'high', 
-                    '最低': 'low', 
-                    '成交量': 'volume',
-                    '成交额': 'amount',
-                    '日期': 'date'
-                }, inplace=True)
-                
-                # 确保新数据的日期列是datetime类型
-                df['date'] = pd.to_datetime(df['date'])
-                
-                csv_path = os.path.join(self.data_dir, "daily_data", f"{ak_code}.csv")
-                
-                if os.path.exists(csv_path):
-                    # 如果文件存在，读取现有数据并合并
-                    existing_df = pd.read_csv(csv_path)
-                    # 确保现有数据的日期列是datetime类型
-                    if 'date' in existing_df.columns:
-                        existing_df['date'] = pd.to_datetime(existing_df['date'])
-                    
-                    # 确保两个DataFrame具有相同的列顺序和名称
-                    # 获取所有唯一列名并标准化顺序
-                    all_columns = set(df.columns.tolist() + existing_df.columns.tolist())
-                    all_columns = sorted(list(all_columns))  # 排序以确保一致性
-                    
-                    # 为每个DataFrame重新索引以确保有相同列
-                    for col in all_columns:
-                        if col not in df.columns:
-                            df[col] = np.nan
-                        if col not in existing_df.columns:
-                            existing_df[col] = np.nan
-                    
-                    # 重新排列列顺序
-                    df = df.reindex(columns=all_columns)
-                    existing_df = existing_df.reindex(columns=all_columns)
-                    
-                    combined_df = pd.concat([existing_df, df], ignore_index=True)
-                    # 去重并按日期排序 - 确保日期类型一致
-                    combined_df = combined_df.drop_duplicates(subset=['date']).sort_values('date')
-                    combined_df.to_csv(csv_path, index=False)
-                    action = f"更新 {len(df)} 条新数据"
-                else:
-                    # 如果文件不存在，直接保存
-                    df.to_csv(csv_path, index=False)
-                    action = f"新增 {len(df)} 条数据"
-                
-                # 记录下载记录
-                self.log_download_record(code, start_date, end_date)
-                
-                # 返回结果供多线程处理
-                result_df = pd.read_csv(csv_path)
-                print(f"✓ {code} ({ak_code}): {action}, 总计 {len(result_df)} 条数据")
-                return True, code, action, len(result_df)
-            else:
+            start_date, end_date, action = self.download_stock(stock_info, days)
+            if action == "无新数据":
                 print(f"✗ {code}: 无新数据可下载")
-                return False, code, "无新数据", 0
-                
+                return False, code, action, 0
+            # 记录下载记录
+            self.log_download_record(code, start_date, end_date)
+            ak_code = code.replace('.XSHG', '').replace('.XSHE', '')
+            print(f"✓ {code} ({ak_code}): {action}")
+            return True, code, action, self.csv_writer.tail(code)['rows']
         except Exception as e:
             print(f"✗ {code} 更新失败: {e}")
             import traceback
@@ -239,107 +225,131 @@ class IncrementalDataDownloader:
     def get_missing_stocks(self):
         """获取还没有数据的股票"""
         all_stocks = self.get_all_a_stocks()
-        daily_data_dir = os.path.join(self.data_dir, "daily_data")
-        
-        if not os.path.exists(daily_data_dir):
-            return all_stocks
-        
-        existing_files = set(f.replace('.csv', '') for f in os.listdir(daily_data_dir) if f.endswith('.csv'))
-        missing_stocks = []
-        
-        for stock in all_stocks:
-            ak_code = stock['code'].replace('.XSHG', '').replace('.XSHE', '')
-            if ak_code not in existing_files:
-                missing_stocks.append(stock)
-        
-        return missing_stocks
+        self.catalog.refresh()
+        missing = set(self.catalog.missing([stock['code'] for stock in all_stocks]))
+        return [stock for stock in all_stocks if stock['code'] in missing]
+    
+    def target_trade_date(self, now=None):
+        """
+        本次更新应当覆盖到的交易日：今天是交易日且已收盘时为今天，否则为之前最近的交易日
+        交易日历不可用（为空）时返回None
+        """
+        now = now or datetime.now()
+        calendar = get_calendar(self.data_dir)
+        if calendar.is_trading_day(now) and now.strftime('%H:%M') >= MARKET_CLOSE_TIME:
+            return now.strftime('%Y-%m-%d')
+        return calendar.prev_trading_day(now)
     
-    def update_all_stocks_parallel(self, days=30):
-        """使用多线程并行更新所有股票的最新数据"""
+    def update_all_stocks_parallel(self, days=30, run_id=None):
+        """
+        并发更新所有股票的最新数据：异步并发 + 令牌桶限速 + 退避重试，每只股票完成后记录断点，
+        只下载到目标交易日（收盘前不写入当日未完成的K线）
+        :param run_id: 批次号（默认目标交易日，见 target_trade_date），中断后以相同批次号重新运行时跳过已完成的股票；
+                       收盘前的运行与收盘后的运行属于不同批次
+        """
         print("开始并行增量更新所有股票数据...")
+        target_date = self.target_trade_date()
+        run_id = run_id or (target_date or datetime.now().strftime('%Y-%m-%d')).replace('-', '')
         
         # 获取还没有数据的股票（新股票）
-        missing_stocks = self.get_missing_stocks()
-        print(f"发现 {len(missing_stocks)} 只新股票需要下载完整数据")
-        
-        # 获取已有数据的股票，进行增量更新
         all_stocks = self.get_all_a_stocks()
-        daily_data_dir = os.path.join(self.data_dir, "daily_data")
-        
-        existing_files = set(f.replace('.csv', '') for f in os.listdir(daily_data_dir) if f.endswith('.csv'))
-        existing_stocks = []
+        # 同步数据目录（未改动的文件只比较大小和修改时间），已有数据的股票由目录得到
+        self.catalog.refresh()
+        existing_files = set(self.catalog.codes())
         
+        # 新股票下载最近一年的完整数据，已有数据的股票增量更新
+        tasks = []
+        new_count = 0
         for stock in all_stocks:
             ak_code = stock['code'].replace('.XSHG', '').replace('.XSHE', '')
-            if ak_code in existing_files:
-                existing_stocks.append(stock)
+            is_new = ak_code not in existing_files
+            new_count += is_new
+            tasks.append(dict(stock, days=365 if is_new else days,
+                              end_date=target_date.replace('-', '') if target_date else None))
+        print(f"发现 {new_count} 只新股票需要下载完整数据")
+        print(f"发现 {len(tasks) - new_count} 只已有数据的股票需要增量更新")
         
-        print(f"发现 {len(existing_stocks)} 只已有数据的股票需要增量更新")
+        start_time = time.time()
+        total_success, total_fail, skipped = self.run_download_tasks(tasks, run_id, target_date)
+        print(f"\n并行增量更新完成! 耗时: {time.time() - start_time:.2f}秒")
         
-        total_success = 0
-        total_fail = 0
+        # 断点恢复时，中断前已写入的数据同样需要刷新
+        if total_success + skipped > 0:
+            self.refresh_derived_stores()
         
-        # 先处理新股票 - 使用多线程
-        if missing_stocks:
-            print(f"\n正在并行下载 {len(missing_stocks)} 只新股票的完整数据...")
-            start_time = time.time()
-            
-            with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                # 提交任务
-                future_to_stock = {
-                    executor.submit(self.update_single_stock_data, stock, 365): stock 
-                    for stock in missing_stocks
-                }
-                
-                # 处理结果
-                for future in concurrent.futures.as_completed(future_to_stock):
-                    stock = future_to_stock[future]
-                    try:
-                        success, code, action, count = future.result()
-                        if success:
-                            total_success += 1
-                        else:
-                            total_fail += 1
-                    except Exception as e:
-                        print(f"处理股票 {stock['code']} 时出错: {e}")
-                        total_fail += 1
-            
-            elapsed_time = time.time() - start_time
-            print(f"新股票下载完成，耗时: {elapsed_time:.2f}秒")
+        return total_success, total_fail
+    
+    def update_from_snapshot(self, days=30, trade_date=None, run_id=None):
+        """
+        收盘快照模式：一次快照请求为所有可直接追加的股票写入当日K线，
+        新股、有缺口和当日除权除息的股票再由历史接口逐只补齐或修正
+        非交易日或未收盘（没有当日收盘快照）时改为逐只下载，补齐到最近一个已收盘的交易日
+        :param trade_date: 快照对应的交易日（默认今天）
+        :param run_id: 补齐任务的批次号（默认 eod-<交易日>），中断后以相同批次号重新运行时跳过已完成的股票
+        """
+        print("开始收盘快照增量更新...")
+        result = EodSnapshotIngestor(self.data_dir, self.catalog, self.csv_writer).ingest(trade_date=trade_date)
+        if result is None:
+            print("没有可用的收盘快照，改为逐只下载到最近一个已收盘的交易日")
+            return self.update_all_stocks_parallel(days=days, run_id=run_id)
         
-        # 再处理已有数据的股票 - 使用多线程
-        if existing_stocks:
-            print(f"\n正在并行增量更新 {len(existing_stocks)} 只已有数据的股票...")
-            start_time = time.time()
-            
-            with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                # 提交任务
-                future_to_stock = {
-                    executor.submit(self.update_single_stock_data, stock, days): stock 
-                    for stock in existing_stocks
-                }
-                
-                # 处理结果
-                for future in concurrent.futures.as_completed(future_to_stock):
-                    stock = future_to_stock[future]
-                    try:
-                        success, code, action, count = future.result()
-                        if success:
-                            total_success += 1
-                        else:
-                            total_fail += 1
-                    except Exception as e:
-                        print(f"处理股票 {stock['code']} 时出错: {e}")
-                        total_fail += 1
-            
-            elapsed_time = time.time() - start_time
-            print(f"已有股票更新完成，耗时: {elapsed_time:.2f}秒")
+        tasks = []
+        for ak_code, reason in sorted(result['backfill'].items()):
+            code = f"{ak_code}.XSHG" if ak_code.startswith('6') else f"{ak_code}.XSHE"
+            tasks.append({'code': code, 'days': 365 if reason == REASON_NEW else days, 'reason': reason})
+        total_success, total_fail, skipped = result['appended'], 0, 0
+        if tasks:
+            print(f"由历史接口处理 {len(tasks)} 只股票...")
+            success, total_fail, skipped = self.run_download_tasks(
+                tasks, run_id or f"eod-{result['trade_date'].replace('-', '')}", result['trade_date'])
+            total_success += success
         
-        print(f"\n并行增量更新完成!")
-        print(f"成功: {total_success} 只")
-        print(f"失败: {total_fail} 只")
+        if total_success + skipped > 0:
+            self.refresh_derived_stores()
         
         return total_success, total_fail
+    
+    def run_download_tasks(self, tasks, run_id, target_date=None):
+        """
+        通过异步下载引擎逐只下载（令牌桶限速 + 退避重试 + 断点），任务带 reason='adjust' 时重新下载完整历史
+        :param target_date: 目标交易日；请求成功但本地数据仍早于该日的股票（如收盘前尚无当日K线）不记为完成，
+                            相同批次号再次运行时重新请求
+        :return: (有新数据的股票数, 失败数, 断点跳过数)
+        """
+        def fetch(task):
+            if task.get('reason') == REASON_ADJUST:
+                return self.correct_stock(task)
+            return self.download_stock(task, task['days'])
+        
+        def is_complete(task, result):
+            if target_date is None:
+                return True
+            tail = self.csv_writer.tail(task['code'])
+            return tail is not None and tail['last_date'] is not None and tail['last_date'] >= target_date
+        
+        checkpoint = DownloadCheckpoint(self.db_path)
+        engine = AsyncDownloadEngine(fetch, checkpoint, concurrency=self.max_workers,
+                                     rate=self.requests_per_second, max_retries=self.max_retries,
+                                     is_complete=is_complete)
+        try:
+            summary = engine.run(tasks, run_id)
+        finally:
+            checkpoint.close()
+        
+        no_data = sum(1 for result in summary['results'].values()
+                      if isinstance(result, tuple) and result[2] == "无新数据")
+        total_success = summary['success'] - no_data
+        print(f"成功: {total_success} 只")
+        print(f"无新数据: {no_data} 只")
+        print(f"失败: {summary['failed']} 只")
+        if summary['skipped']:
+            print(f"断点跳过（之前已完成）: {summary['skipped']} 只")
+        return total_success, summary['failed'], summary['skipped']
+    
+    def refresh_derived_stores(self):
+        """已生成列式存储/行情面板/因子库/涨跌停状态表时，同步刷新以包含新数据"""
+        refresh_derived_stores(self.data_dir, recompute=self.corrected_codes,
+                               written_since=self.csv_writer.written_since)
 
 def main():
     """主函数"""
@@ -350,24 +360,34 @@ def main():
     print("- 为已有数据的股票增量添加最新数据")
     print("- 避免重复下载已有数据")
     
+    # 询问更新方式
+    mode = input("请选择更新方式 (1=收盘快照，一次请求更新全市场; 2=逐只下载历史数据，默认1): ").strip() or "1"
+    
     # 询问更新天数
     try:
         days = int(input("请输入要更新的天数 (默认30天): ") or "30")
     except ValueError:
         days = 30
     
-    # 询问线程数
+    # 询问并发数和请求速率
     try:
-        max_workers = int(input("请输入并发线程数 (默认10): ") or "10")
+        max_workers = int(input("请输入最大并发请求数 (默认10): ") or "10")
     except ValueError:
         max_workers = 10
+    try:
+        rate = float(input(f"请输入每秒最多请求次数 (默认{REQUESTS_PER_SECOND:g}): ") or REQUESTS_PER_SECOND)
+    except ValueError:
+        rate = REQUESTS_PER_SECOND
     
     print(f"\n开始增量更新，更新最近 {days} 天的数据...")
-    print(f"使用 {max_workers} 个并发线程进行并行处理...")
+    print(f"最多 {max_workers} 个并发请求，限速 {rate:g} 次/秒，中断后重新运行会从断点继续...")
     
-    downloader = IncrementalDataDownloader(max_workers=max_workers)
+    downloader = IncrementalDataDownloader(max_workers=max_workers, requests_per_second=rate)
     
-    success_count, fail_count = downloader.update_all_stocks_parallel(days=days)
+    if mode == "2":
+        success_count, fail_count = downloader.update_all_stocks_parallel(days=days)
+    else:
+        success_count, fail_count = downloader.update_from_snapshot(days=days)
     
     print(f"\n任务完成！")
     print(f"成功更新: {success_count} 只股票")
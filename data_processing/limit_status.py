@@ -0,0 +1,426 @@
+"""
+涨跌停状态计算
+在 日期 × 股票 对齐的收盘价/最高价矩阵上一次性算出所有日期的涨停价、跌停价，
+以及涨停封板、曾涨停未封板（炸板）、跌停三类掩码，替代逐只股票逐日的循环判断。
+计算结果按 (日期, 股票代码) 持久化到 stock_data.db 的 limit_status 表，
+数据更新后追加新日期，并重写写入器报告的、已有日期上新增或改写过的股票行
+"""
+
+import os
+import time
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Set
+
+import numpy as np
+import pandas as pd
+
+from market_panel import MarketPanel
+
+
+# 各板块涨跌幅限制
+MAIN_BOARD_RATIO = 0.10   # 沪深主板
+GROWTH_BOARD_RATIO = 0.20  # 创业板、科创板
+ST_RATIO = 0.05           # 主板 ST / *ST
+BSE_RATIO = 0.30          # 北交所
+
+# 日线为前复权价格，复权后的收盘价与按规则计算的涨停价可能相差一两分钱，
+# 因此与原逻辑一致：涨跌幅达到限制的 97.5% 或价格与涨跌停价相差不超过 0.02 元即视为达到
+PCT_THRESHOLD_FACTOR = 0.975
+PRICE_TOLERANCE = 0.02
+
+# 连板高度索引中统计近期涨停次数的窗口（交易日）
+RECENT_LIMIT_UP_WINDOW = 10
+
+
+def get_limit_ratio(stock_code: str, is_st: bool = False) -> float:
+    """根据股票代码（及是否ST）返回涨跌幅限制比例"""
+    stock_code = stock_code.split('.')[0]
+    if stock_code.startswith(('30', '68')):
+        return GROWTH_BOARD_RATIO
+    if stock_code.startswith(('8', '4', '92')):
+        return BSE_RATIO
+    if is_st:
+        return ST_RATIO
+    return MAIN_BOARD_RATIO
+
+
+def get_limit_ratios(codes: Iterable[str], st_codes: Set[str] = None) -> np.ndarray:
+    """批量获取涨跌幅限制比例，顺序与 codes 一致"""
+    st_codes = st_codes or set()
+    return np.array([get_limit_ratio(code, code in st_codes) for code in codes], dtype=np.float64)
+
+
+def load_st_codes(db_path: str) -> Set[str]:
+    """
+    从数据库的股票列表中读取名称含 ST 的股票代码（按当前名称判断）
+    股票列表可能由不同的下载工具写入（000001 或 000001.XSHE），统一为6位代码以与面板对齐
+    """
+    if not os.path.exists(db_path):
+        return set()
+    try:
+        conn = sqlite3.connect(db_path)
+        rows = conn.execute("SELECT code FROM stock_list WHERE name LIKE '%ST%'").fetchall()
+        conn.close()
+    except sqlite3.Error as e:
+        print(f"读取ST股票列表失败: {e}")
+        return set()
+    return {str(row[0]).split('.')[0] for row in rows}
+
+
+def round_price(prices: np.ndarray) -> np.ndarray:
+    """按交易所规则四舍五入到分（加微小偏移避免 x.xx5 因浮点误差被舍去）"""
+    return np.floor(np.asarray(prices, dtype=np.float64) * 100 + 0.5 + 1e-6) / 100
+
+
+def previous_close(close: np.ndarray) -> np.ndarray:
+    """
+    每个 (日期, 股票) 的前收盘价：取该股票此前最近一个有数据的交易日收盘价
+    停牌日不会打断前收盘价的传递
+    """
+    filled = pd.DataFrame(np.asarray(close, dtype=np.float64)).ffill().to_numpy()
+    prev = np.full_like(filled, np.nan)
+    prev[1:] = filled[:-1]
+    return prev
+
+
+def compute_limit_masks(close: np.ndarray, high: np.ndarray, pct_change: np.ndarray,
+                        ratios: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    计算全部日期的涨跌停状态
+    :param close: (交易日数, 股票数) 收盘价矩阵，无数据为 NaN
+    :param high: 与 close 对齐的最高价矩阵
+    :param pct_change: 与 close 对齐的涨跌幅（%），缺失或为0时按前收盘价计算
+    :param ratios: 每只股票的涨跌幅限制比例
+    :return: {
+        'prev_close': 前收盘价,
+        'limit_up_price': 涨停价,
+        'limit_down_price': 跌停价,
+        'sealed': 收盘封住涨停,
+        'touched': 盘中触及涨停（含封板）,
+        'broken': 触及涨停但收盘未封住（炸板）,
+        'limit_down': 收盘跌停,
+        'board_count': 连板数,
+        'has_data': 当日有行情且有前收盘价,
+    }
+    """
+    close = np.asarray(close, dtype=np.float64)
+    high = np.asarray(high, dtype=np.float64)
+    pct_change = np.asarray(pct_change, dtype=np.float64)
+    prev_close = previous_close(close)
+
+    limit_up_price = round_price(prev_close * (1 + ratios))
+    limit_down_price = round_price(prev_close * (1 - ratios))
+    threshold = ratios * 100 * PCT_THRESHOLD_FACTOR
+
+    valid = (prev_close > 0) & ~np.isnan(close)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        computed_pct = (close - prev_close) / prev_close * 100
+        pct = np.where(np.isnan(pct_change) | (pct_change == 0), computed_pct, pct_change)
+
+        sealed = valid & ((pct >= threshold) | (np.abs(close - limit_up_price) <= PRICE_TOLERANCE))
+        touched = sealed | (valid & (high >= limit_up_price - PRICE_TOLERANCE))
+        limit_down = valid & ((pct <= -threshold) | (np.abs(close - limit_down_price) <= PRICE_TOLERANCE))
+    broken = touched & ~sealed
+    board_count = consecutive_counts(sealed, valid)
+
+    return {
+        'prev_close': prev_close,
+        'limit_up_price': limit_up_price,
+        'limit_down_price': limit_down_price,
+        'sealed': sealed,
+        'touched': touched,
+        'broken': broken,
+        'limit_down': limit_down,
+        'board_count': board_count,
+        'has_data': valid,
+    }
+
+
+def consecutive_counts(mask: np.ndarray, has_data: np.ndarray) -> np.ndarray:
+    """
+    沿日期方向统计连续为真的天数（如连板数），一次向量化的游程计算
+    无数据的日期（停牌）不打断也不增加计数
+    """
+    hits = np.cumsum(mask & has_data, axis=0, dtype=np.int32)
+    rows = np.arange(mask.shape[0])[:, None]
+    # 每个位置之前（含）最近一次“有数据但不满足”的行号，计数从该行之后重新开始
+    reset_idx = np.maximum.accumulate(np.where(has_data & ~mask, rows, -1), axis=0)
+    base = np.where(reset_idx >= 0, np.take_along_axis(hits, np.maximum(reset_idx, 0), axis=0), 0)
+    return hits - base
+
+
+def compute_board_heights(sealed: np.ndarray, has_data: np.ndarray, window: int = RECENT_LIMIT_UP_WINDOW) -> Dict[str, np.ndarray]:
+    """
+    连板高度索引（所有日期、所有股票一次算出）
+    :return: {
+        'streak': 当前连板数,
+        'last_break_idx': 最近一次断板（前一交易日封板、当日未封板）所在行号，没有为 -1,
+        'recent_limit_ups': 最近 window 个交易日（含当日）的涨停次数,
+    }
+    """
+    streak = consecutive_counts(sealed, has_data)
+    prev_streak = np.zeros_like(streak)
+    prev_streak[1:] = streak[:-1]
+    rows = np.arange(sealed.shape[0])[:, None]
+    breaks = has_data & ~sealed & (prev_streak > 0)
+    last_break_idx = np.maximum.accumulate(np.where(breaks, rows, -1), axis=0)
+
+    hits = np.cumsum(sealed & has_data, axis=0, dtype=np.int32)
+    recent = hits.copy()
+    recent[window:] -= hits[:-window]
+
+    return {
+        'streak': streak,
+        'last_break_idx': last_break_idx,
+        'recent_limit_ups': recent,
+    }
+
+
+# limit_status 表中保存的状态列
+STATUS_COLUMNS = ['sealed', 'touched', 'broken', 'limit_down']
+
+
+class LimitStatusTable:
+    """
+    涨跌停状态表（stock_data.db 中的 limit_status）
+    每行对应一个 (交易日, 股票代码)，保存前收盘价、涨跌停价、封板/触板/炸板/跌停标记及连板数
+    """
+
+    def __init__(self, data_dir=None):
+        if data_dir is None:
+            project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            data_dir = os.path.join(project_root, "full_stock_data")
+        self.data_dir = data_dir
+        self.db_path = os.path.join(data_dir, "stock_data.db")
+        self._latest_date = None
+        self.init_table()
+
+    def init_table(self):
+        """初始化数据表"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS limit_status (
+                date TEXT,
+                code TEXT,
+                prev_close REAL,
+                limit_up_price REAL,
+                limit_down_price REAL,
+                sealed INTEGER,
+                touched INTEGER,
+                broken INTEGER,
+                limit_down INTEGER,
+                board_count INTEGER,
+                PRIMARY KEY (date, code)
+            ) WITHOUT ROWID
+        ''')
+        # 按股票查询历史（最近断板日期、重写写入过的股票）时使用
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_limit_status_code_date ON limit_status (code, date)")
+        conn.commit()
+        conn.close()
+
+    def get_latest_date(self) -> Optional[str]:
+        """表中已保存的最新交易日"""
+        if self._latest_date is None:
+            conn = sqlite3.connect(self.db_path)
+            row = conn.execute("SELECT MAX(date) FROM limit_status").fetchone()
+            conn.close()
+            self._latest_date = row[0] if row else None
+        return self._latest_date
+
+    def covers(self, date_str: str) -> bool:
+        """指定日期是否已在表中（早于等于最新日期）"""
+        latest = self.get_latest_date()
+        return latest is not None and date_str is not None and date_str <= latest
+
+    def update(self, rebuild: bool = False, written_since: Dict[str, str] = None) -> int:
+        """
+        由行情面板计算涨跌停状态，并把表中尚未保存的日期追加进去
+        连板数需要完整历史，因此整段矩阵一并计算（向量化，耗时很短），只写入新日期和 written_since 中的股票
+        :param rebuild: 为True时清空后全部重写
+        :param written_since: {股票代码: 日期}，这些股票从该日期起的行整体重写（收盘快照之后补齐的缺口、新股、
+                              复权修正等写在表中已有日期上的数据），见 DailyCsvWriter.written_since
+        :return: 写入的行数
+        """
+        panel = MarketPanel(self.data_dir)
+        if not panel.ensure_built():
+            print("行情面板不可用，无法更新涨跌停状态表")
+            return 0
+
+        start_time = time.time()
+        dates = panel.get_date_strs()
+        codes = panel.get_codes()
+        latest = None if rebuild else self.get_latest_date()
+        first = 0 if latest is None else int(np.searchsorted(dates, latest, side='right'))
+        # 已有日期上需要重写的股票：{面板列号: 起始行号}
+        code_pos = {code: j for j, code in enumerate(codes)}
+        rewrite = {}
+        for code, since in ({} if latest is None else written_since or {}).items():
+            j = code_pos.get(code.split('.')[0])
+            start = int(np.searchsorted(dates, since, side='left'))
+            if j is not None and start < first:
+                rewrite[j] = start
+        if first >= len(dates) and not rewrite:
+            print(f"涨跌停状态表已是最新（{latest}）")
+            return 0
+
+        ratios = get_limit_ratios(codes, load_st_codes(self.db_path))
+        masks = compute_limit_masks(panel.field('close'), panel.field('high'), panel.field('pct_change'), ratios)
+
+        selected = np.zeros(masks['prev_close'].shape, dtype=bool)
+        selected[first:] = True
+        for j, start in rewrite.items():
+            selected[start:first, j] = True
+        rows_idx, cols_idx = np.nonzero(selected & ~np.isnan(masks['prev_close']) &
+                                        ~np.isnan(np.asarray(panel.field('close'))))
+        code_arr = np.array(codes)
+        records = zip(
+            np.array(dates)[rows_idx].tolist(),
+            code_arr[cols_idx].tolist(),
+            masks['prev_close'][rows_idx, cols_idx].round(4).tolist(),
+            masks['limit_up_price'][rows_idx, cols_idx].tolist(),
+            masks['limit_down_price'][rows_idx, cols_idx].tolist(),
+            *[masks[name][rows_idx, cols_idx].astype(int).tolist() for name in STATUS_COLUMNS],
+            masks['board_count'][rows_idx, cols_idx].tolist(),
+        )
+
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        if rebuild:
+            cursor.execute("DELETE FROM limit_status")
+        # 重写的股票先删除原有行（改写后可能不再有行情的日期也随之去掉）
+        cursor.executemany("DELETE FROM limit_status WHERE code = ? AND date >= ?",
+                           [(codes[j], dates[start]) for j, start in rewrite.items()])
+        cursor.executemany('''
+            INSERT OR REPLACE INTO limit_status
+            (date, code, prev_close, limit_up_price, limit_down_price, sealed, touched, broken, limit_down, board_count)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', records)
+        conn.commit()
+        conn.close()
+        self._latest_date = None
+
+        new_dates = f"{dates[first]} ~ {dates[-1]}" if first < len(dates) else "无新日期"
+        print(f"涨跌停状态表更新完成，写入 {len(rows_idx)} 行（{new_dates}，重写已有日期上的股票 {len(rewrite)} 只），"
+              f"耗时: {time.time() - start_time:.2f}秒")
+        return len(rows_idx)
+
+    def get_status(self, stock_code: str, date_str: str) -> Optional[Dict]:
+        """获取单只股票某一交易日的涨跌停状态，不存在则返回None"""
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        row = conn.execute("SELECT * FROM limit_status WHERE date = ? AND code = ?",
+                           (date_str, stock_code.split('.')[0])).fetchone()
+        conn.close()
+        return dict(row) if row else None
+
+    def get_board_counts(self, date_str: str) -> Dict[str, int]:
+        """某交易日所有封板股票的连板数（一次查询）"""
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute("SELECT code, board_count FROM limit_status WHERE date = ? AND board_count > 0",
+                            (date_str,)).fetchall()
+        conn.close()
+        return dict(rows)
+
+    def get_board_heights(self, date_str: str, window: int = RECENT_LIMIT_UP_WINDOW) -> Dict[str, Dict]:
+        """
+        某交易日的连板高度索引，只按主键范围查询最近 window+1 个交易日的行（不扫描全表）
+        与 compute_board_heights 的口径一致：停牌不打断连板数，最近 window 个交易日都没有行情的股票不列入；
+        窗口内没有断板的股票再按 (code, date) 索引到完整历史中查找最近断板日期
+        :return: {股票代码: {'streak': 当前连板数, 'last_break_date': 最近断板日期,
+                             'recent_limit_ups': 最近N个交易日涨停次数}}
+        """
+        conn = sqlite3.connect(self.db_path)
+        dates = [row[0] for row in conn.execute(
+            "SELECT DISTINCT date FROM limit_status WHERE date <= ? ORDER BY date DESC LIMIT ?",
+            (date_str, window + 1))][::-1]
+        if not dates or dates[-1] != date_str:
+            conn.close()
+            return {}
+        rows = pd.read_sql_query(
+            "SELECT date, code, sealed, board_count FROM limit_status WHERE date >= ? AND date <= ?",
+            conn, params=(dates[0], date_str))
+        conn.close()
+
+        sealed = rows.pivot(index='date', columns='code', values='sealed').reindex(dates)
+        board_count = rows.pivot(index='date', columns='code', values='board_count').reindex(dates)
+        # 第一行只用于判断窗口内第一天是否断板
+        if len(dates) > window:
+            in_window = slice(1, None)
+        else:
+            in_window = slice(0, None)
+        has_data = sealed.notna().to_numpy()[in_window]
+        is_sealed = (sealed.to_numpy() == 1)[in_window]
+        filled_count = board_count.ffill().to_numpy()
+        prev_count = np.vstack([np.full((1, filled_count.shape[1]), np.nan), filled_count[:-1]])[in_window]
+        breaks = has_data & ~is_sealed & (prev_count > 0)
+
+        streak = np.nan_to_num(filled_count[-1]).astype(int)
+        recent = is_sealed.sum(axis=0)
+        window_dates = dates[in_window]
+        codes = sealed.columns.tolist()
+        board_heights = {}
+        for j in np.flatnonzero(has_data.any(axis=0) & ((streak > 0) | (recent > 0))):
+            break_rows = np.flatnonzero(breaks[:, j])
+            board_heights[codes[j]] = {
+                'streak': int(streak[j]),
+                'last_break_date': window_dates[break_rows[-1]] if len(break_rows) else None,
+                'recent_limit_ups': int(recent[j]),
+            }
+
+        earlier = [code for code, info in board_heights.items() if info['last_break_date'] is None]
+        for code, last_break_date in self._last_break_dates(earlier, window_dates[0]).items():
+            board_heights[code]['last_break_date'] = last_break_date
+        return board_heights
+
+    def _last_break_dates(self, codes: List[str], before: str) -> Dict[str, str]:
+        """
+        指定股票在 before 之前（不含）的最近断板日期：当日未封板且该股票上一条记录的连板数大于0
+        :return: {股票代码: 最近断板日期}，从未断板的股票不列入
+        """
+        if not codes:
+            return {}
+        conn = sqlite3.connect(self.db_path)
+        result = {}
+        # 分批绑定参数，避免超过 SQLite 的变量个数上限
+        for i in range(0, len(codes), 500):
+            batch = codes[i:i + 500]
+            placeholders = ','.join('?' * len(batch))
+            rows = conn.execute(f'''
+                SELECT code, MAX(date) FROM (
+                    SELECT code, date, sealed,
+                           LAG(board_count) OVER (PARTITION BY code ORDER BY date) AS prev_count
+                    FROM limit_status WHERE code IN ({placeholders}) AND date < ?
+                ) WHERE sealed = 0 AND prev_count > 0
+                GROUP BY code
+            ''', (*batch, before)).fetchall()
+            result.update(rows)
+        conn.close()
+        return result
+
+    def get_stocks(self, date_str: str, status: str = 'sealed') -> List[str]:
+        """
+        获取某交易日满足指定状态的股票代码
+        :param status: sealed / touched / broken / limit_down
+        """
+        if status not in STATUS_COLUMNS:
+            raise ValueError(f"未知的涨跌停状态: {status}")
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute(f"SELECT code FROM limit_status WHERE date = ? AND {status} = 1 ORDER BY code",
+                            (date_str,)).fetchall()
+        conn.close()
+        return [row[0] for row in rows]
+
+
+def main():
+    """命令行：生成/增量更新涨跌停状态表"""
+    import sys
+    rebuild = '--rebuild' in sys.argv
+    args = [arg for arg in sys.argv[1:] if arg != '--rebuild']
+    table = LimitStatusTable(args[0] if args else None)
+    table.update(rebuild=rebuild)
+    print(f"涨跌停状态表最新日期: {table.get_latest_date()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,8 @@ import sqlite3
 from datetime import datetime, timedelta
 import time
 from typing import Optional, List, Dict
+from bar_schema import read_bars, to_canonical
+from daily_csv_writer import DailyCsvWriter
 
 class LocalDataManager:
     def __init__(self, data_dir="stock_data"):
@@ -19,6 +21,7 @@ class LocalDataManager:
         self.daily_data_dir = os.path.join(data_dir, "daily_data")
         self.ensure_directories()
         self.init_database()
+        self.csv_writer = DailyCsvWriter(data_dir)
 
     def ensure_directories(self):
         if not os.path.exists(self.data_dir):
@@ -115,11 +118,9 @@ class LocalDataManager:
         code = security.split('.')[0]
         csv_path = os.path.join(self.daily_data_dir, f"{code}.csv")
         
-        # Load existing data
+        # Load existing data (canonical columns, exact prices for order matching, see bar_schema)
         if os.path.exists(csv_path):
-            df = pd.read_csv(csv_path)
-            df['date'] = pd.to_datetime(df['date'])
-            df.set_index('date', inplace=True)
+            df = read_bars(csv_path).set_index('date')
         else:
             df = pd.DataFrame()
 
@@ -142,26 +143,23 @@ class LocalDataManager:
                 # print(f"Fetching data for {security} from {start_date_fetch}...")
                 new_df = ak.stock_zh_a_hist(symbol=code, period="daily", start_date=start_date_fetch, adjust="qfq")
                 if not new_df.empty:
-                    new_df.rename(columns={
-                        '日期': 'date', '开盘': 'open', '收盘': 'close', 
-                        '最高': 'high', '最低': 'low', '成交量': 'volume', 
-                        '成交额': 'money', '换手率': 'turnover'
-                    }, inplace=True)
-                    new_df['date'] = pd.to_datetime(new_df['date'])
-                    new_df.set_index('date', inplace=True)
+                    # Append only the new dates to the CSV instead of rewriting the whole file
+                    self.csv_writer.append(code, new_df)
+                    new_df = to_canonical(new_df).set_index('date')
                     
-                    # Combine and save
                     if not df.empty:
                         df = pd.concat([df, new_df])
-                        df = df[~df.index.duplicated(keep='last')]
+                        df = df[~df.index.duplicated(keep='first')]
                     else:
                         df = new_df
-                    
                     df.sort_index(inplace=True)
-                    df.to_csv(csv_path)
             except Exception as e:
                 print(f"Error fetching daily data for {security}: {e}")
 
+        # JoinQuant-style alias for the traded amount
+        if 'amount' in df.columns:
+            df['money'] = df['amount']
+
         # Filter by end_date and count
         if end_date:
             df = df[df.index <= end_date]
@@ -0,0 +1,226 @@
+"""
+全市场行情面板
+把列式日线存储展开成 日期 × 股票 的稠密 float32 矩阵，每个字段一个 np.memmap 文件。
+各进程（Web应用、选股、回测、QuantEngine）直接以只读方式映射同一份文件，
+内存由操作系统页缓存共享，截面查询（如某日全部收盘价）只是一次切片
+"""
+
+import os
+import json
+import time
+from datetime import datetime
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from bar_store import BarStore, _dates_to_days, _days_to_dates, _default_data_dir, _new_tmp_dir, _store_lock, _swap_dir
+
+
+# 面板格式版本，布局变化时递增
+PANEL_VERSION = 1
+
+# 面板包含的字段（缺失值为 NaN）
+PANEL_FIELDS = ['open', 'high', 'low', 'close', 'volume', 'amount', 'pct_change', 'turnover']
+
+
+class MarketPanel:
+    """
+    行情面板
+    目录结构（<data_dir>/market_panel/）:
+        meta.json      版本、形状、字段、对应的列式存储生成时间
+        dates.npy      交易日（1970-01-01 起的天数），升序
+        codes.npy      股票代码，升序
+        <field>.f32    各字段的 float32 矩阵，形状为 (交易日数, 股票数)，按行连续存放
+    """
+
+    def __init__(self, data_dir=None):
+        if data_dir is None:
+            data_dir = _default_data_dir()
+        self.data_dir = data_dir
+        self.panel_dir = os.path.join(data_dir, "market_panel")
+        self.meta_path = os.path.join(self.panel_dir, "meta.json")
+        self.bar_store = BarStore(data_dir)
+
+        self._meta = None
+        self._days = None
+        self._codes = None
+        self._fields = {}
+        self._date_index = None
+        self._code_index = None
+
+    # ------------------------------------------------------------------ 生成
+
+    def exists(self) -> bool:
+        """面板是否已生成"""
+        return os.path.exists(self.meta_path)
+
+    def is_stale(self) -> bool:
+        """面板是否落后于列式存储（列式存储重建后需重新生成面板；日线CSV的更新由写者刷新列式存储后传递到这里）"""
+        if not self.exists():
+            return True
+        with open(self.meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        return (meta.get('version') != PANEL_VERSION or meta.get('fields') != PANEL_FIELDS
+                or meta.get('bar_store_built_at') != self.bar_store.get_built_at())
+
+    def build(self) -> bool:
+        """
+        从列式存储生成面板
+        :return: 是否生成成功
+        """
+        if not self.bar_store.exists():
+            print("未找到列式存储，无法生成行情面板（请先运行 python bar_store.py）")
+            return False
+
+        print("正在从列式存储生成行情面板...")
+        start_time = time.time()
+
+        codes, offsets, columns = self.bar_store.get_columns()
+        row_days = np.asarray(columns['date'])
+        days = np.unique(row_days)
+
+        # 每一行日线在面板中的位置：行号由日期二分得到，列号由所属股票得到
+        row_idx = np.searchsorted(days, row_days)
+        col_idx = np.repeat(np.arange(len(codes)), np.diff(offsets))
+        shape = (len(days), len(codes))
+
+        tmp_dir = _new_tmp_dir(self.panel_dir)
+
+        np.save(os.path.join(tmp_dir, "dates.npy"), days.astype(np.int32))
+        np.save(os.path.join(tmp_dir, "codes.npy"), np.asarray(codes))
+        for field in PANEL_FIELDS:
+            matrix = np.memmap(os.path.join(tmp_dir, f"{field}.f32"), dtype=np.float32, mode='w+', shape=shape)
+            matrix[:] = np.nan
+            matrix[row_idx, col_idx] = np.asarray(columns[field], dtype=np.float32)
+            matrix.flush()
+            del matrix
+
+        meta = {
+            'version': PANEL_VERSION,
+            'fields': PANEL_FIELDS,
+            'n_dates': int(shape[0]),
+            'n_codes': int(shape[1]),
+            'bar_store_built_at': self.bar_store.get_built_at(),
+            'built_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        with open(os.path.join(tmp_dir, "meta.json"), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+
+        _swap_dir(tmp_dir, self.panel_dir)
+
+        self._meta = None
+        self._fields = {}
+
+        print(f"行情面板生成完成，耗时: {time.time() - start_time:.2f}秒，"
+              f"{shape[0]} 个交易日 × {shape[1]} 只股票，保存路径: {self.panel_dir}")
+        return True
+
+    def ensure_built(self) -> bool:
+        """面板不存在或已过期时重新生成，返回面板是否可用"""
+        if self.exists() and not self.is_stale():
+            return True
+        return self.build()
+
+    # ------------------------------------------------------------------ 读取
+
+    def attach(self):
+        """
+        以只读内存映射方式打开面板（只在首次访问时执行，不复制数据）
+        持有共享锁一次映射全部字段，保证各文件来自同一次生成（写者替换目录时持有独占锁）
+        """
+        if self._meta is not None:
+            return
+        with _store_lock(self.panel_dir, exclusive=False):
+            with open(self.meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            self._days = np.load(os.path.join(self.panel_dir, "dates.npy"))
+            self._codes = np.load(os.path.join(self.panel_dir, "codes.npy"))
+            shape = (meta['n_dates'], meta['n_codes'])
+            self._fields = {
+                name: np.memmap(os.path.join(self.panel_dir, f"{name}.f32"), dtype=np.float32, mode='r', shape=shape)
+                for name in PANEL_FIELDS
+            }
+        self._date_index = {int(day): i for i, day in enumerate(self._days.tolist())}
+        self._code_index = {code: i for i, code in enumerate(self._codes.tolist())}
+        self._meta = meta
+
+    @property
+    def shape(self):
+        self.attach()
+        return self._meta['n_dates'], self._meta['n_codes']
+
+    def field(self, name: str) -> np.ndarray:
+        """获取某字段的 (交易日数, 股票数) 只读矩阵"""
+        self.attach()
+        if name not in self._fields:
+            raise KeyError(f"行情面板不包含字段: {name}")
+        return self._fields[name]
+
+    def get_dates(self) -> pd.DatetimeIndex:
+        """面板中的全部交易日（升序）"""
+        self.attach()
+        return _days_to_dates(self._days)
+
+    def get_date_strs(self) -> List[str]:
+        """面板中的全部交易日（升序，YYYY-MM-DD）"""
+        return self.get_dates().strftime('%Y-%m-%d').tolist()
+
+    def get_codes(self) -> List[str]:
+        """面板中的全部股票代码（升序）"""
+        self.attach()
+        return self._codes.tolist()
+
+    def date_index(self, date_str: str) -> Optional[int]:
+        """交易日在面板中的行号，非交易日返回None"""
+        self.attach()
+        return self._date_index.get(int(_dates_to_days([date_str])[0]))
+
+    def code_index(self, stock_code: str) -> Optional[int]:
+        """股票在面板中的列号，不存在返回None"""
+        self.attach()
+        return self._code_index.get(stock_code.split('.')[0])
+
+    def cross_section(self, date_str: str, fields: List[str] = None) -> pd.DataFrame:
+        """
+        获取某个交易日全市场的截面数据
+        :return: 以股票代码为索引的DataFrame，非交易日返回空表
+        """
+        fields = fields or PANEL_FIELDS
+        i = self.date_index(date_str)
+        if i is None:
+            return pd.DataFrame(columns=fields)
+        return pd.DataFrame({name: self.field(name)[i] for name in fields}, index=self.get_codes())
+
+    def get_series(self, stock_code: str, fields: List[str] = None) -> pd.DataFrame:
+        """获取单只股票在全部交易日上的数据（停牌或未上市的日期为 NaN）"""
+        fields = fields or PANEL_FIELDS
+        j = self.code_index(stock_code)
+        if j is None:
+            return pd.DataFrame(columns=fields)
+        return pd.DataFrame({name: self.field(name)[:, j] for name in fields}, index=self.get_dates())
+
+    def get_frame(self, name: str) -> pd.DataFrame:
+        """把某字段矩阵包装为 日期 × 股票代码 的DataFrame"""
+        return pd.DataFrame(self.field(name), index=self.get_dates(), columns=self.get_codes(), copy=False)
+
+
+def main():
+    """命令行：从列式存储生成行情面板"""
+    import sys
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else None
+    panel = MarketPanel(data_dir)
+    if not panel.build():
+        return
+
+    start_time = time.time()
+    panel.attach()
+    close = panel.field('close')
+    latest = panel.get_date_strs()[-1]
+    valid = int(np.count_nonzero(~np.isnan(close[-1])))
+    print(f"验证加载：{panel.shape[0]} 个交易日 × {panel.shape[1]} 只股票，"
+          f"{latest} 有收盘价 {valid} 只，耗时 {time.time() - start_time:.4f}秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+"""
+股票池存储
+所有日期的股票池保存在 stock_data.db 的三张表中，按 (日期, 类别, 股票代码) 建索引：
+    stock_pool_meta   每个日期一行：前一交易日、前前交易日、生成时间等
+    stock_pool        (date, category, code)，category 为 limit_up_stocks / first_board_stocks 等
+    stock_pool_board  (date, code) 的连板高度索引
+支持单日读取、日期区间查询和跨日期的并集/交集，写入在一个事务中完成。
+尚未导入的日期回退读取 pool_data 下的旧版JSON文件
+"""
+
+import os
+import json
+import glob
+import sqlite3
+from typing import Dict, List
+
+# 以代码列表形式保存的股票池类别
+POOL_CATEGORIES = [
+    'limit_up_stocks',
+    'limit_up_2_days_ago',
+    'first_board_stocks',
+    'limit_up_not_closed_stocks',
+]
+
+
+def _default_data_dir():
+    """项目根目录下的 full_stock_data"""
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(project_root, "full_stock_data")
+
+
+class PoolStore:
+    def __init__(self, data_dir=None):
+        if data_dir is None:
+            data_dir = _default_data_dir()
+        self.data_dir = data_dir
+        self.db_path = os.path.join(data_dir, "stock_data.db")
+        self.pool_data_dir = os.path.join(data_dir, "pool_data")
+        self.init_tables()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path)
+
+    def init_tables(self):
+        """初始化数据表"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS stock_pool_meta (
+                date TEXT PRIMARY KEY,
+                prev_trading_date TEXT,
+                prev_2_trading_date TEXT,
+                recent_limit_up_window INTEGER,
+                generated_at TEXT
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS stock_pool (
+                date TEXT,
+                category TEXT,
+                code TEXT,
+                PRIMARY KEY (date, category, code)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_stock_pool_category ON stock_pool (category, date)')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS stock_pool_board (
+                date TEXT,
+                code TEXT,
+                streak INTEGER,
+                last_break_date TEXT,
+                recent_limit_ups INTEGER,
+                PRIMARY KEY (date, code)
+            ) WITHOUT ROWID
+        ''')
+        conn.commit()
+        conn.close()
+
+    # ------------------------------------------------------------------ 写入
+
+    def save_pools(self, pools: List[Dict]) -> int:
+        """
+        批量保存股票池（格式同 StockPoolGenerator 生成的字典），同一日期已存在时整体替换
+        所有日期在一个事务中写入，失败时全部回滚
+        :return: 保存的日期数量
+        """
+        if not pools:
+            return 0
+        dates = [(pool['target_date'],) for pool in pools]
+        meta_rows = []
+        code_rows = []
+        board_rows = []
+        for pool in pools:
+            date_str = pool['target_date']
+            meta_rows.append((date_str, pool.get('prev_trading_date'), pool.get('prev_2_trading_date'),
+                              pool.get('recent_limit_up_window'), pool.get('generated_at')))
+            for category in POOL_CATEGORIES:
+                code_rows.extend((date_str, category, code) for code in set(pool.get(category, [])))
+            for code, info in pool.get('board_heights', {}).items():
+                board_rows.append((date_str, code, info.get('streak'), info.get('last_break_date'),
+                                   info.get('recent_limit_ups')))
+
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany("DELETE FROM stock_pool_meta WHERE date = ?", dates)
+                conn.executemany("DELETE FROM stock_pool WHERE date = ?", dates)
+                conn.executemany("DELETE FROM stock_pool_board WHERE date = ?", dates)
+                conn.executemany("INSERT INTO stock_pool_meta VALUES (?, ?, ?, ?, ?)", meta_rows)
+                conn.executemany("INSERT INTO stock_pool VALUES (?, ?, ?)", code_rows)
+                conn.executemany("INSERT INTO stock_pool_board VALUES (?, ?, ?, ?, ?)", board_rows)
+        finally:
+            conn.close()
+        return len(pools)
+
+    def import_json_files(self, overwrite: bool = False) -> int:
+        """
+        把 pool_data 下的旧版JSON股票池导入数据库
+        :param overwrite: 为False时跳过数据库中已有的日期
+        :return: 导入的日期数量
+        """
+        existing = set() if overwrite else set(self.get_dates())
+        pools = []
+        for pool_file in sorted(glob.glob(os.path.join(self.pool_data_dir, "pool_*.json"))):
+            date_str = os.path.basename(pool_file)[len("pool_"):-len(".json")]
+            if date_str in existing:
+                continue
+            try:
+                with open(pool_file, 'r', encoding='utf-8') as f:
+                    pool = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"读取股票池文件 {pool_file} 失败: {e}")
+                continue
+            pool.setdefault('target_date', date_str)
+            pools.append(pool)
+        return self.save_pools(pools)
+
+    # ------------------------------------------------------------------ 读取
+
+    def get_dates(self, start_date: str = None, end_date: str = None) -> List[str]:
+        """已保存股票池的日期（升序）"""
+        conn = self._connect()
+        rows = conn.execute(
+            "SELECT date FROM stock_pool_meta WHERE date >= ? AND date <= ? ORDER BY date",
+            (start_date or '0000-00-00', end_date or '9999-99-99')).fetchall()
+        conn.close()
+        return [row[0] for row in rows]
+
+    def has_pool(self, date_str: str) -> bool:
+        """指定日期的股票池是否存在（数据库或旧版JSON文件）"""
+        conn = self._connect()
+        row = conn.execute("SELECT 1 FROM stock_pool_meta WHERE date = ?", (date_str,)).fetchone()
+        conn.close()
+        return row is not None or os.path.exists(self._json_path(date_str))
+
+    def _json_path(self, date_str: str) -> str:
+        return os.path.join(self.pool_data_dir, f"pool_{date_str}.json")
+
+    def load_pools(self, start_date: str, end_date: str) -> Dict[str, Dict]:
+        """
+        读取日期区间内的全部股票池（一次查询）
+        :return: {日期: 股票池字典}，字典格式与生成器输出的JSON一致
+        """
+        conn = self._connect()
+        meta_rows = conn.execute(
+            "SELECT date, prev_trading_date, prev_2_trading_date, recent_limit_up_window, generated_at "
+            "FROM stock_pool_meta WHERE date >= ? AND date <= ? ORDER BY date",
+            (start_date, end_date)).fetchall()
+        code_rows = conn.execute(
+            "SELECT date, category, code FROM stock_pool WHERE date >= ? AND date <= ? ORDER BY date, category, code",
+            (start_date, end_date)).fetchall()
+        board_rows = conn.execute(
+            "SELECT date, code, streak, last_break_date, recent_limit_ups FROM stock_pool_board "
+            "WHERE date >= ? AND date <= ? ORDER BY date, code",
+            (start_date, end_date)).fetchall()
+        conn.close()
+
+        pools = {}
+        for date_str, prev_date, prev_2_date, window, generated_at in meta_rows:
+            pool = {
+                'target_date': date_str,
+                'prev_trading_date': prev_date,
+                'prev_2_trading_date': prev_2_date,
+            }
+            for category in POOL_CATEGORIES:
+                pool[category] = []
+            pool['board_heights'] = {}
+            pool['stocks_by_board_height'] = {}
+            pool['recent_limit_up_window'] = window
+            pool['generated_at'] = generated_at
+            pools[date_str] = pool
+        for date_str, category, code in code_rows:
+            if date_str in pools:
+                pools[date_str].setdefault(category, []).append(code)
+        for date_str, code, streak, last_break_date, recent in board_rows:
+            if date_str not in pools:
+                continue
+            pool = pools[date_str]
+            pool['board_heights'][code] = {
+                'streak': streak,
+                'last_break_date': last_break_date,
+                'recent_limit_ups': recent,
+            }
+        # 按连板数分组（只取当日封板的股票，与生成器一致）
+        for pool in pools.values():
+            limit_up_set = set(pool['limit_up_stocks'])
+            for code, info in pool['board_heights'].items():
+                if info['streak'] and code in limit_up_set:
+                    pool['stocks_by_board_height'].setdefault(str(info['streak']), []).append(code)
+        return pools
+
+    def load_pool(self, date_str: str) -> Dict:
+        """读取单日股票池，数据库中没有时回退读取旧版JSON文件，都不存在返回空字典"""
+        pool = self.load_pools(date_str, date_str).get(date_str)
+        if pool is not None:
+            return pool
+        pool_file = self._json_path(date_str)
+        if os.path.exists(pool_file):
+            with open(pool_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return {}
+
+    def get_category(self, category: str, start_date: str, end_date: str) -> Dict[str, List[str]]:
+        """
+        日期区间内某个类别的股票，例如 2025-01 至 2025-06 的全部首板股票
+        :return: {日期: [股票代码]}
+        """
+        conn = self._connect()
+        rows = conn.execute(
+            "SELECT date, code FROM stock_pool WHERE category = ? AND date >= ? AND date <= ? ORDER BY date, code",
+            (category, start_date, end_date)).fetchall()
+        conn.close()
+        result = {}
+        for date_str, code in rows:
+            result.setdefault(date_str, []).append(code)
+        return result
+
+    def combine(self, category: str, dates: List[str], mode: str = 'union') -> List[str]:
+        """
+        跨日期的集合运算
+        :param mode: union（任一日期出现）/ intersection（每个日期都出现）
+        """
+        if not dates:
+            return []
+        placeholders = ','.join('?' * len(dates))
+        sql = f"SELECT code FROM stock_pool WHERE category = ? AND date IN ({placeholders}) GROUP BY code"
+        params = [category] + list(dates)
+        if mode == 'intersection':
+            sql += " HAVING COUNT(DISTINCT date) = ?"
+            params.append(len(set(dates)))
+        elif mode != 'union':
+            raise ValueError(f"未知的集合运算: {mode}")
+        conn = self._connect()
+        rows = conn.execute(sql + " ORDER BY code", params).fetchall()
+        conn.close()
+        return [row[0] for row in rows]
+
+    def count_occurrences(self, category: str, start_date: str, end_date: str) -> Dict[str, int]:
+        """日期区间内每只股票出现在某类别中的天数"""
+        conn = self._connect()
+        rows = conn.execute(
+            "SELECT code, COUNT(*) FROM stock_pool WHERE category = ? AND date >= ? AND date <= ? GROUP BY code",
+            (category, start_date, end_date)).fetchall()
+        conn.close()
+        return dict(rows)
+
+
+def main():
+    """命令行：把 pool_data 下的JSON股票池导入数据库"""
+    import sys
+    args = [arg for arg in sys.argv[1:] if arg != '--overwrite']
+    store = PoolStore(args[0] if args else None)
+    count = store.import_json_files(overwrite='--overwrite' in sys.argv)
+    dates = store.get_dates()
+    print(f"导入 {count} 个日期的股票池，数据库中共有 {len(dates)} 个日期"
+          + (f"（{dates[0]} ~ {dates[-1]}）" if dates else ""))
+
+
+if __name__ == "__main__":
+    main()
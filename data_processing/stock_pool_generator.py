@@ -7,17 +7,34 @@ import akshare as ak
 import pandas as pd
 import numpy as np
 import os
-import sqlite3
-from datetime import datetime, timedelta
+from datetime import datetime
 import time
 import warnings
-import glob
 from typing import List, Dict
-import concurrent.futures
-from concurrent.futures import ThreadPoolExecutor
+from bar_store import BarStore
+from market_panel import MarketPanel
+from trading_calendar import get_calendar
+from pool_store import PoolStore
+from data_catalog import DataCatalog
+from limit_status import (LimitStatusTable, RECENT_LIMIT_UP_WINDOW, compute_board_heights,
+                          compute_limit_masks, get_limit_ratios, load_st_codes)
 
 warnings.filterwarnings('ignore')
 
+def _write_pool_files(pool_data_dir: str, pools: List[Dict]) -> List[str]:
+    """把股票池写成JSON文件（先写临时文件再替换），返回文件路径"""
+    import json
+    paths = []
+    for pool_data in pools:
+        pool_file = os.path.join(pool_data_dir, f"pool_{pool_data['target_date']}.json")
+        tmp_file = pool_file + ".tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(pool_data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_file, pool_file)
+        paths.append(pool_file)
+    return paths
+
+
 class StockPoolGenerator:
     def __init__(self, data_dir=None):
         # 如果没有指定data_dir，则使用项目根目录下的full_stock_data
@@ -31,6 +48,11 @@ class StockPoolGenerator:
         self.daily_data_dir = os.path.join(self.data_dir, "daily_data")
         self.db_path = os.path.join(self.data_dir, "stock_data.db")
         self.pool_data_dir = os.path.join(self.data_dir, "pool_data")  # 新增：股票池数据目录
+        self.bar_store = BarStore(self.data_dir)  # 列式日线存储
+        self.market_panel = MarketPanel(self.data_dir)  # 日期×股票行情面板
+        self.limit_table = LimitStatusTable(self.data_dir)  # 持久化的涨跌停状态表
+        self.calendar = get_calendar(self.data_dir)  # 交易日历
+        self.pool_store = PoolStore(self.data_dir)  # 股票池存储
         
         # 确保目录存在
         if not os.path.exists(self.daily_data_dir):
@@ -41,7 +63,7 @@ class StockPoolGenerator:
         # 缓存数据，避免重复读取
         self._cached_data = {}
         self._all_stocks_data = None
-        self._trading_dates_cache = None
+        self._limit_state = None
     
     def _load_all_stocks_data(self):
         """一次性加载所有股票数据到内存"""
@@ -51,281 +73,115 @@ class StockPoolGenerator:
         print("正在一次性加载所有股票数据到内存...")
         start_time = time.time()
         
-        csv_files = glob.glob(os.path.join(self.daily_data_dir, "*.csv"))
-        all_data = {}
-        
-        # 预先定义列映射
-        column_mappings = {
-            '涨\u3000跌\u3000幅': 'pct_change',
-            '涨\u3000跌\u3000额': 'change',
-            '股\u3000票\u3000代\u3000码': 'code',
-            '开\u3000盘': 'open',
-            '收\u3000盘': 'close',
-            '最\u3000高': 'high',
-            '最\u3000低': 'low',
-            '成\u3000交\u3000量': 'volume',
-            '成\u3000交\u3000额': 'amount',
-            '振\u3000幅': 'amplitude',
-            '换\u3000手\u3000率': 'turnover'
-        }
-        
-        for file_path in csv_files:
-            try:
-                df = pd.read_csv(file_path)
-                
-                # 重命名列
-                original_columns = df.columns.tolist()
-                rename_dict = {}
-                for orig_col in original_columns:
-                    for key, val in column_mappings.items():
-                        if key in orig_col or orig_col == key:
-                            rename_dict[orig_col] = val
-                            break
-                
-                df.rename(columns=rename_dict, inplace=True)
-                
-                # 转换日期并创建日期索引
-                df['date'] = pd.to_datetime(df['date'])
-                df.set_index(['date'], inplace=True)
-                
-                # 获取股票代码
-                stock_code = os.path.basename(file_path).replace('.csv', '')
-                
-                # 存储处理后的数据
-                all_data[stock_code] = df
-                
-            except Exception as e:
-                print(f"加载文件 {file_path} 时出错: {e}")
-                continue
+        # 从列式存储读取，列名已统一为英文；存储未生成时BarStore会回退到逐个读取CSV
+        if not self.bar_store.exists():
+            print("未找到列式存储，回退到逐个读取CSV（可运行 python bar_store.py 生成）")
+        all_data = self.bar_store.load_all()
         
         self._all_stocks_data = all_data
         end_time = time.time()
         print(f"所有股票数据加载完成，耗时: {end_time - start_time:.2f}秒，共加载 {len(all_data)} 只股票")
         return all_data
     
-    def _get_trading_dates(self):
-        """获取所有交易日期"""
-        if self._trading_dates_cache is not None:
-            return self._trading_dates_cache
-        
-        print("正在获取所有交易日期...")
-        all_data = self._load_all_stocks_data()
-        
-        all_dates = set()
-        for df in all_data.values():
-            # 获取所有日期
-            dates = pd.Series(df.index.date).unique()
-            all_dates.update(dates)
-        
-        # 过滤掉NaT值
-        all_dates = {d for d in all_dates if pd.notna(d)}
-        trading_dates = sorted(list(all_dates), reverse=True)
-        self._trading_dates_cache = trading_dates
-        return trading_dates
-    
     def get_last_trading_date(self, target_date: str) -> str:
         """获取指定日期的前一个交易日"""
-        target_dt = datetime.strptime(target_date, '%Y-%m-%d').date()
-        trading_dates = self._get_trading_dates()
-        
-        for date in trading_dates:
-            if date < target_dt:
-                return date.strftime('%Y-%m-%d')
-        return None
+        return self.calendar.prev_trading_day(target_date)
     
-    def get_limit_up_stocks_from_daily_data(self, date_str: str) -> List[str]:
-        """从内存中的数据获取指定日期的涨停股票"""
-        date_obj = pd.to_datetime(date_str).date()
-        all_data = self._load_all_stocks_data()
-        
-        limit_up_stocks = []
-        
-        # 直接访问日期索引，提高查询效率
-        target_date = pd.to_datetime(date_str)
-        prev_date = None
-        
-        # 找到前一个交易日
-        trading_dates = self._get_trading_dates()
-        for i, dt in enumerate(trading_dates):
-            if dt == date_obj:
-                if i + 1 < len(trading_dates):
-                    prev_date = pd.to_datetime(trading_dates[i + 1])
-                break
-        
-        if prev_date is None:
-            # 如果没找到，就手动查找前一个日期
-            for dt in trading_dates:
-                if dt < date_obj:
-                    prev_date = pd.to_datetime(dt)
-                    break
-        
+    def _get_limit_state(self) -> Dict:
+        """
+        一次性计算所有日期、所有股票的涨跌停状态（结果缓存）
+        优先使用行情面板的 日期×股票 矩阵，面板不可用时由内存中的股票数据对齐得到
+        """
+        if self._limit_state is not None:
+            return self._limit_state
+        
+        print("正在计算全市场涨跌停状态...")
         start_time = time.time()
-        processed_count = 0
-        
-        for stock_code, df in all_data.items():
-            try:
-                processed_count += 1
-                
-                # 直接通过索引获取数据
-                if target_date not in df.index:
-                    continue
-                
-                day_data = df.loc[target_date]
-                
-                # 检查是否有前一个交易日数据
-                if prev_date is not None and prev_date not in df.index:
-                    # 寻找最接近的前一个交易日
-                    prev_rows = df[df.index < target_date]
-                    if prev_rows.empty:
-                        continue
-                    prev_row = prev_rows.iloc[-1]  # 最后一行就是最近的前一个交易日
-                else:
-                    prev_row = df.loc[prev_date]
-                
-                prev_close = float(prev_row['close'])
-                if prev_close == 0:
-                    continue
-                
-                # 获取当日的最高价和收盘价
-                current_high = float(day_data['high'])
-                current_close = float(day_data['close'])
-                
-                # 判断是否真正涨停（当日涨幅大于等于9.75%）
-                current_pct_change = day_data['pct_change'] if 'pct_change' in day_data else None
-                if pd.isna(current_pct_change) or current_pct_change == 0:
-                    # 如果pct_change是NaN或0，使用计算公式
-                    calculated_change = ((current_close - prev_close) / prev_close) * 100
-                    current_pct_change = calculated_change
-                else:
-                    current_pct_change = float(current_pct_change)
-                
-                # 根据股票代码判断涨停板比例
-                if stock_code.startswith('30'):  # 创业板股票
-                    limit_threshold = 19.5
-                else:
-                    limit_threshold = 9.75
-                
-                if current_pct_change >= limit_threshold:  # 当日涨幅大于等于阈值
-                    limit_up_stocks.append(stock_code)
-                else:
-                    # 备用判断：收盘价接近涨停价
-                    is_st = 'ST' in stock_code or 'st' in stock_code
-                    if stock_code.startswith('30'):  # 创业板股票
-                        limit_ratio = 0.2
-                    elif is_st:  # ST股票
-                        limit_ratio = 0.05
-                    else:
-                        limit_ratio = 0.1
-                        
-                    limit_price = round(prev_close * (1 + limit_ratio), 2)
-                    
-                    # 检查收盘价是否接近涨停价（允许0.02元的误差）
-                    if abs(current_close - limit_price) <= 0.02:
-                        limit_up_stocks.append(stock_code)
-                        
-            except Exception:
-                continue  # 如果处理出错，跳过这只股票
         
-        end_time = time.time()
-        print(f"涨停股票识别完成，处理了 {processed_count} 只股票，耗时: {end_time - start_time:.2f}秒")
-        
-        return limit_up_stocks
+        if self.market_panel.ensure_built():
+            dates = self.market_panel.get_dates()
+            codes = self.market_panel.get_codes()
+            close = self.market_panel.field('close')
+            high = self.market_panel.field('high')
+            pct_change = self.market_panel.field('pct_change')
+        else:
+            all_data = self._load_all_stocks_data()
+            close_frame = pd.DataFrame({code: df['close'] for code, df in all_data.items()}).sort_index()
+            dates = close_frame.index
+            codes = close_frame.columns.tolist()
+            close = close_frame.to_numpy()
+            high = pd.DataFrame({code: df['high'] for code, df in all_data.items()}).reindex(dates).to_numpy()
+            pct_change = pd.DataFrame({code: df['pct_change'] for code, df in all_data.items()}).reindex(dates).to_numpy()
+        
+        ratios = get_limit_ratios(codes, load_st_codes(self.db_path))
+        masks = compute_limit_masks(close, high, pct_change, ratios)
+        
+        self._limit_state = {
+            'dates': pd.DatetimeIndex(dates).strftime('%Y-%m-%d').tolist(),
+            'date_pos': {dt: i for i, dt in enumerate(pd.DatetimeIndex(dates).date)},
+            'codes': np.array(codes),
+            'masks': masks,
+            'heights': compute_board_heights(masks['sealed'], masks['has_data'], RECENT_LIMIT_UP_WINDOW),
+        }
+        print(f"涨跌停状态计算完成，耗时: {time.time() - start_time:.2f}秒，"
+              f"{len(dates)} 个交易日 × {len(codes)} 只股票")
+        return self._limit_state
+    
+    def _get_stocks_by_mask(self, date_str: str, mask_name: str) -> List[str]:
+        """返回指定日期某个涨跌停掩码为真的股票代码"""
+        if date_str is None:
+            return []
+        # 已在内存中算好时直接取；否则涨跌停状态表包含该日期时直接查询，无需计算
+        if self._limit_state is None and self.limit_table.covers(date_str):
+            return self.limit_table.get_stocks(date_str, mask_name)
+        state = self._get_limit_state()
+        i = state['date_pos'].get(pd.to_datetime(date_str).date())
+        if i is None:
+            return []
+        return state['codes'][state['masks'][mask_name][i]].tolist()
+    
+    def get_board_heights(self, date_str: str) -> Dict[str, Dict]:
+        """
+        获取指定日期的连板高度索引（只包含最近N个交易日有行情、且当前连板或近期有涨停的股票）
+        :return: {股票代码: {'streak': 当前连板数, 'last_break_date': 最近断板日期（完整历史中）,
+                             'recent_limit_ups': 最近N个交易日涨停次数}}
+        """
+        if date_str is None:
+            return {}
+        # 已在内存中算好时直接取；否则涨跌停状态表包含该日期时只查询最近N个交易日，无需计算全市场矩阵
+        if self._limit_state is None and self.limit_table.covers(date_str):
+            return self.limit_table.get_board_heights(date_str, RECENT_LIMIT_UP_WINDOW)
+        state = self._get_limit_state()
+        i = state['date_pos'].get(pd.to_datetime(date_str).date())
+        if i is None:
+            return {}
+        streak = state['heights']['streak'][i]
+        recent = state['heights']['recent_limit_ups'][i]
+        last_break = state['heights']['last_break_idx'][i]
+        dates = state['dates']
+        first = max(0, i - RECENT_LIMIT_UP_WINDOW + 1)
+        active = state['masks']['has_data'][first:i + 1].any(axis=0)
+        
+        board_heights = {}
+        for j in np.flatnonzero(active & ((streak > 0) | (recent > 0))):
+            board_heights[str(state['codes'][j])] = {
+                'streak': int(streak[j]),
+                'last_break_date': dates[last_break[j]] if last_break[j] >= 0 else None,
+                'recent_limit_ups': int(recent[j]),
+            }
+        return board_heights
+    
+    def get_limit_up_stocks_from_daily_data(self, date_str: str) -> List[str]:
+        """获取指定日期的涨停封板股票（收盘价达到涨停价）"""
+        return self._get_stocks_by_mask(date_str, 'sealed')
     
     def get_ever_limit_up_not_closed_stocks_from_daily_data(self, date_str: str) -> List[str]:
-        """从内存中的数据获取指定日期的曾涨停未封板股票"""
-        date_obj = pd.to_datetime(date_str).date()
-        all_data = self._load_all_stocks_data()
-        
-        limit_up_not_closed_stocks = []
-        
-        # 直接访问日期索引，提高查询效率
-        target_date = pd.to_datetime(date_str)
-        prev_date = None
-        
-        # 找到前一个交易日
-        trading_dates = self._get_trading_dates()
-        for i, dt in enumerate(trading_dates):
-            if dt == date_obj:
-                if i + 1 < len(trading_dates):
-                    prev_date = pd.to_datetime(trading_dates[i + 1])
-                break
-        
-        if prev_date is None:
-            # 如果没找到，就手动查找前一个日期
-            for dt in trading_dates:
-                if dt < date_obj:
-                    prev_date = pd.to_datetime(dt)
-                    break
-        
-        start_time = time.time()
-        processed_count = 0
-        
-        for stock_code, df in all_data.items():
-            try:
-                processed_count += 1
-                
-                # 直接通过索引获取数据
-                if target_date not in df.index:
-                    continue
-                
-                day_data = df.loc[target_date]
-                
-                # 检查是否有前一个交易日数据
-                if prev_date is not None and prev_date not in df.index:
-                    # 寻找最接近的前一个交易日
-                    prev_rows = df[df.index < target_date]
-                    if prev_rows.empty:
-                        continue
-                    prev_row = prev_rows.iloc[-1]  # 最后一行就是最近的前一个交易日
-                else:
-                    prev_row = df.loc[prev_date]
-                
-                prev_close = float(prev_row['close'])
-                if prev_close == 0:
-                    continue
-                
-                # 获取当日的最高价和收盘价
-                current_high = float(day_data['high'])
-                current_close = float(day_data['close'])
-                
-                # 判断是否触及涨停价但收盘未封住（曾涨停未封板）
-                current_pct_change = day_data['pct_change'] if 'pct_change' in day_data else None
-                if pd.isna(current_pct_change) or current_pct_change == 0:
-                    # 如果pct_change是NaN或0，使用计算公式
-                    calculated_change = ((current_close - prev_close) / prev_close) * 100
-                    current_pct_change = calculated_change
-                else:
-                    current_pct_change = float(current_pct_change)
-                
-                # 根据股票代码判断涨停板比例
-                if stock_code.startswith('30'):  # 创业板股票
-                    limit_threshold = 19.5
-                else:
-                    limit_threshold = 9.75
-                
-                # 计算涨停价
-                is_st = 'ST' in stock_code or 'st' in stock_code
-                if stock_code.startswith('30'):  # 创业板股票
-                    limit_ratio = 0.2
-                elif is_st:  # ST股票
-                    limit_ratio = 0.05
-                else:
-                    limit_ratio = 0.1
-                    
-                limit_price = round(prev_close * (1 + limit_ratio), 2)
-                
-                # 判断是否曾涨停未封板
-                if (current_pct_change >= limit_threshold and current_close < limit_price) or \
-                   (abs(current_high - limit_price) <= 0.02 and current_close < limit_price):
-                    limit_up_not_closed_stocks.append(stock_code)
-                        
-            except Exception:
-                continue  # 如果处理出错，跳过这只股票
-        
-        end_time = time.time()
-        print(f"曾涨停未封板股票识别完成，处理了 {processed_count} 只股票，耗时: {end_time - start_time:.2f}秒")
-        
-        return limit_up_not_closed_stocks
+        """获取指定日期的曾涨停未封板股票（最高价触及涨停价但收盘未封住）"""
+        return self._get_stocks_by_mask(date_str, 'broken')
+    
+    def get_limit_down_stocks_from_daily_data(self, date_str: str) -> List[str]:
+        """获取指定日期的跌停股票"""
+        return self._get_stocks_by_mask(date_str, 'limit_down')
     
     def get_limit_up_stocks_from_api(self, date_str: str) -> List[str]:
         """从API获取涨停股票（备用方法）"""
@@ -346,36 +202,46 @@ class StockPoolGenerator:
             print(f"从API获取涨停股票数据失败 {date_str}: {e}")
             return []
     
-    def generate_stock_pool(self, target_date: str) -> Dict:
-        """生成指定日期的股票池"""
-        print(f"开始生成 {target_date} 的股票池...")
-        
-        # 获取前一个交易日
+    def _build_pool_data(self, target_date: str, list_cache: Dict = None) -> Dict:
+        """
+        计算指定日期的股票池（不写文件）
+        :param list_cache: 批量生成时跨日期共享的 {(日期, 状态): 股票列表} 缓存，
+                           相邻日期的“前一日”和“前前一日”可以直接复用
+        """
+        if list_cache is None:
+            list_cache = {}
+        
+        def stocks_by_mask(date_str, mask_name):
+            key = (date_str, mask_name)
+            if key not in list_cache:
+                list_cache[key] = self._get_stocks_by_mask(date_str, mask_name)
+            return list_cache[key]
+        
+        # 获取前一个交易日和前前一个交易日（用于判断是否为首板）
         prev_trading_date = self.get_last_trading_date(target_date)
-        print(f"前一个交易日: {prev_trading_date}")
-        
-        # 从前一个交易日的数据中获取涨停封板股票
-        print("正在从内存数据获取前一日涨停封板股票...")
-        limit_up_stocks = self.get_limit_up_stocks_from_daily_data(prev_trading_date)
-        
-        # 获取前前一个交易日（用于判断是否为首板）
-        prev_2_trading_date = self.get_last_trading_date(prev_trading_date)
-        print(f"前前一个交易日: {prev_2_trading_date}")
+        prev_2_trading_date = self.get_last_trading_date(prev_trading_date) if prev_trading_date else None
         
-        limit_up_2_days_ago = self.get_limit_up_stocks_from_daily_data(prev_2_trading_date)
+        # 前一日涨停封板股票、前前日涨停封板股票
+        limit_up_stocks = stocks_by_mask(prev_trading_date, 'sealed')
+        limit_up_2_days_ago = stocks_by_mask(prev_2_trading_date, 'sealed')
         
         # 计算首板涨停封板股票（昨日涨停封板但前日未涨停）
-        first_board_stocks = [stock for stock in limit_up_stocks if stock not in limit_up_2_days_ago]
-                
-        # 获取曾涨停未封板股票（炸板票）
-        limit_up_not_closed_stocks = self.get_ever_limit_up_not_closed_stocks_from_daily_data(prev_trading_date)
-        
-        # 确保首板股票和炸板股票是互斥的
-        # 首板股票是涨停封板的股票，炸板股票是曾触及涨停但未封板的股票
-        # 因此它们本质上是不同的，无需额外处理
-        
-        # 保存股票池数据
-        pool_data = {
+        limit_up_2_days_ago_set = set(limit_up_2_days_ago)
+        first_board_stocks = [stock for stock in limit_up_stocks if stock not in limit_up_2_days_ago_set]
+        
+        # 连板高度索引：各股票当前连板数、最近断板日期、近期涨停次数，并按连板数分组
+        board_heights = self.get_board_heights(prev_trading_date)
+        # 停牌股票的连板数会延续，分组时只取当日确实封板的股票
+        limit_up_set = set(limit_up_stocks)
+        stocks_by_board_height = {}
+        for stock_code, info in board_heights.items():
+            if info['streak'] > 0 and stock_code in limit_up_set:
+                stocks_by_board_height.setdefault(str(info['streak']), []).append(stock_code)
+        
+        # 获取曾涨停未封板股票（炸板票），与涨停封板股票互斥
+        limit_up_not_closed_stocks = stocks_by_mask(prev_trading_date, 'broken')
+        
+        return {
             'target_date': target_date,
             'prev_trading_date': prev_trading_date,
             'prev_2_trading_date': prev_2_trading_date,
@@ -383,108 +249,92 @@ class StockPoolGenerator:
             'limit_up_2_days_ago': limit_up_2_days_ago,
             'first_board_stocks': first_board_stocks,
             'limit_up_not_closed_stocks': limit_up_not_closed_stocks,
+            'board_heights': board_heights,
+            'stocks_by_board_height': stocks_by_board_height,
+            'recent_limit_up_window': RECENT_LIMIT_UP_WINDOW,
             'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         }
+    
+    def generate_stock_pool(self, target_date: str, export_json: bool = False) -> Dict:
+        """
+        生成指定日期的股票池并保存到股票池存储
+        :param export_json: 是否同时导出 pool_data 下的JSON文件
+        """
+        print(f"开始生成 {target_date} 的股票池...")
         
-        # 保存到JSON文件
-        pool_file = os.path.join(self.pool_data_dir, f"pool_{target_date}.json")
-        import json
-        with open(pool_file, 'w', encoding='utf-8') as f:
-            json.dump(pool_data, f, ensure_ascii=False, indent=2)
+        pool_data = self._build_pool_data(target_date)
+        print(f"前一个交易日: {pool_data['prev_trading_date']}")
+        print(f"前前一个交易日: {pool_data['prev_2_trading_date']}")
+        
+        self.pool_store.save_pools([pool_data])
+        if export_json:
+            _write_pool_files(self.pool_data_dir, [pool_data])
         
+        stocks_by_board_height = pool_data['stocks_by_board_height']
         print(f"股票池生成完成！")
-        print(f"- 前一日涨停封板股票数量: {len(limit_up_stocks)}")
-        print(f"- 前前日涨停封板股票数量: {len(limit_up_2_days_ago)}")
-        print(f"- 首板涨停封板股票数量: {len(first_board_stocks)}")
-        print(f"- 前一日炸板股票数量: {len(limit_up_not_closed_stocks)}")
-        print(f"保存路径: {pool_file}")
+        print(f"- 前一日涨停封板股票数量: {len(pool_data['limit_up_stocks'])}")
+        print(f"- 前前日涨停封板股票数量: {len(pool_data['limit_up_2_days_ago'])}")
+        print(f"- 首板涨停封板股票数量: {len(pool_data['first_board_stocks'])}")
+        print(f"- 前一日炸板股票数量: {len(pool_data['limit_up_not_closed_stocks'])}")
+        print(f"- 连板高度分布: {', '.join(f'{h}板{len(c)}只' for h, c in sorted(stocks_by_board_height.items(), key=lambda x: int(x[0])))}")
+        print(f"保存路径: {self.pool_store.db_path}")
         
         return pool_data
     
     def load_stock_pool(self, date_str: str) -> Dict:
         """加载指定日期的股票池"""
-        pool_file = os.path.join(self.pool_data_dir, f"pool_{date_str}.json")
-        if os.path.exists(pool_file):
-            import json
-            with open(pool_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return {}
+        return self.pool_store.load_pool(date_str)
     
-    def batch_generate_stock_pool(self, start_date: str, end_date: str, max_workers: int = 5):
-        """批量生成指定时间段的股票池数据"""
-        from datetime import datetime, timedelta
-        
-        start_dt = datetime.strptime(start_date, '%Y-%m-%d')
-        end_dt = datetime.strptime(end_date, '%Y-%m-%d')
-        
-        # 生成所有需要处理的日期
-        all_dates = []
-        current_date = start_dt
-        while current_date <= end_dt:
-            date_str = current_date.strftime('%Y-%m-%d')
-            # 检查该日期是否有对应的交易日数据
-            trading_dates = self._get_trading_dates()
-            trading_date_obj = current_date.date()
-            if trading_date_obj in [dt for dt in trading_dates]:
-                all_dates.append(date_str)
-            else:
-                print(f"  - 跳过 {date_str} (非交易日)")
-            
-            current_date += timedelta(days=1)
-        
-        processed_dates = []
+    def batch_generate_stock_pool(self, start_date: str, end_date: str, export_json: bool = False):
+        """
+        批量生成指定时间段的股票池数据
+        1. 全部历史的涨跌停状态和连板高度只做一次向量化计算，取代原来按日期分进程的计算
+        2. 相邻日期共享涨停列表（D 日的“前一日”即 D+1 日的“前前一日”），逐日组装只是查表
+        3. 组装好的股票池在一个事务中写入股票池存储；导出JSON时在当前进程顺序写文件
+        """
+        # 按交易日历取出区间内的交易日
+        all_dates = self.calendar.get_range(start_date, end_date)
         
         print(f"开始批量生成 {start_date} 到 {end_date} 的股票池数据...")
         print(f"需要处理 {len(all_dates)} 个交易日")
+        if not all_dates:
+            print("批量生成完成！共处理了 0 个交易日")
+            return []
         
-        def process_single_date(date_str):
+        start_time = time.time()
+        self._get_limit_state()
+        
+        pools = []
+        list_cache = {}
+        for date_str in all_dates:
             try:
-                print(f"正在生成 {date_str} 的股票池...")
-                pool_data = self.generate_stock_pool(date_str)
-                return date_str, True
+                pools.append(self._build_pool_data(date_str, list_cache))
             except Exception as e:
                 print(f"  - 生成 {date_str} 时出错: {e}")
-                return date_str, False
+        print(f"股票池计算完成，耗时: {time.time() - start_time:.2f}秒")
         
-        if all_dates:
-            print(f"正在并行处理 {len(all_dates)} 个交易日...")
-            start_time = time.time()
-            
-            # 使用线程池并行处理多个日期
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                results = list(executor.map(process_single_date, all_dates))
-            
-            # 统计成功处理的日期
-            for date_str, success in results:
-                if success:
-                    processed_dates.append(date_str)
-            
-            end_time = time.time()
-            print(f"并行处理完成，耗时: {end_time - start_time:.2f}秒")
+        # 批量写入：一个事务写入股票池存储
+        write_start = time.time()
+        self.pool_store.save_pools(pools)
+        print(f"股票池写入存储完成，耗时: {time.time() - write_start:.2f}秒")
+        
+        # 导出JSON（可选，股票池存储才是读者使用的数据）
+        if export_json:
+            write_start = time.time()
+            _write_pool_files(self.pool_data_dir, pools)
+            print(f"股票池JSON导出完成，耗时: {time.time() - write_start:.2f}秒")
         
-        print(f"批量生成完成！共处理了 {len(processed_dates)} 个交易日")
+        processed_dates = [pool['target_date'] for pool in pools]
+        print(f"批量生成完成！共处理了 {len(processed_dates)} 个交易日，总耗时: {time.time() - start_time:.2f}秒")
         print(f"处理的日期: {processed_dates}")
         return processed_dates
 
     def get_latest_data_date(self) -> str:
-        """获取本地数据的最新日期"""
-        latest_date = None
-        for file in os.listdir(self.daily_data_dir):
-            if file.endswith('.csv'):
-                csv_path = os.path.join(self.daily_data_dir, file)
-                try:
-                    df = pd.read_csv(csv_path)
-                    if 'date' in df.columns:
-                        df['date'] = pd.to_datetime(df['date'])
-                        file_latest = df['date'].max()
-                        if latest_date is None or file_latest > latest_date:
-                            latest_date = file_latest
-                except:
-                    continue
-        
-        if latest_date:
-            return latest_date.strftime('%Y-%m-%d')
-        return "无数据"
+        """获取本地数据的最新日期（由数据目录回答，目录为空时先扫描一次）"""
+        catalog = DataCatalog(self.data_dir)
+        if catalog.is_empty():
+            catalog.refresh()
+        return catalog.latest_date() or "无数据"
 
 def main():
     """主函数 - 演示股票池生成"""
@@ -0,0 +1,264 @@
+"""
+交易日历
+以交易所交易日历（akshare 新浪接口）为准，本地缓存为 full_stock_data/trade_calendar.json 并增量刷新，
+内存中保存为有序日期数组，前后交易日、偏移、区间查询通过二分完成，是否交易日通过集合判断。
+构造时只读缓存，首次查询时才按需访问接口；接口不可用时用本地数据中出现过的日期推断历史交易日
+"""
+
+import os
+import json
+import glob
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+
+import numpy as np
+
+# 缓存超过该天数后尝试从接口刷新
+REFRESH_INTERVAL_DAYS = 7
+
+_calendars = {}
+
+
+def _default_data_dir():
+    """项目根目录下的 full_stock_data"""
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(project_root, "full_stock_data")
+
+
+def _to_date_str(value) -> str:
+    """date / datetime / 'YYYY-MM-DD' / 'YYYYMMDD' -> 'YYYY-MM-DD'"""
+    if isinstance(value, (datetime, date)):
+        return value.strftime('%Y-%m-%d')
+    value = str(value)[:10]
+    if len(value) == 8 and value.isdigit():
+        return f"{value[:4]}-{value[4:6]}-{value[6:]}"
+    return value
+
+
+def get_calendar(data_dir=None) -> 'TradingCalendar':
+    """获取进程内共享的交易日历（同一数据目录只加载一次，相对路径与绝对路径视为同一目录）"""
+    data_dir = os.path.abspath(data_dir or _default_data_dir())
+    if data_dir not in _calendars:
+        _calendars[data_dir] = TradingCalendar(data_dir)
+    return _calendars[data_dir]
+
+
+class TradingCalendar:
+    def __init__(self, data_dir=None, auto_refresh=True):
+        if data_dir is None:
+            data_dir = _default_data_dir()
+        self.data_dir = data_dir
+        self.cache_path = os.path.join(data_dir, "trade_calendar.json")
+
+        self._dates = []      # 升序的 'YYYY-MM-DD'
+        self._date_set = set()
+        self._updated_at = None
+        self._source = None
+
+        # 构造时不访问网络（模块导入时即创建日历），首次查询时再按需刷新
+        self._auto_refresh = auto_refresh
+        self._checked = False
+        self._load_cache()
+
+    # ------------------------------------------------------------------ 缓存与刷新
+
+    def _set_dates(self, dates):
+        self._dates = sorted(set(dates))
+        self._date_set = set(self._dates)
+
+    def _load_cache(self):
+        """读取本地缓存"""
+        if not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+            self._set_dates(cache.get('dates', []))
+            self._updated_at = cache.get('updated_at')
+            self._source = cache.get('source')
+        except (OSError, ValueError) as e:
+            print(f"读取交易日历缓存失败: {e}")
+
+    def _save_cache(self):
+        """保存本地缓存"""
+        cache = {
+            'source': self._source,
+            'updated_at': self._updated_at,
+            'dates': self._dates,
+        }
+        tmp_path = self.cache_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, ensure_ascii=False)
+        os.replace(tmp_path, self.cache_path)
+
+    def _needs_refresh(self) -> bool:
+        """
+        缓存为空或超过刷新间隔时需要刷新；交易所日历已不覆盖今天时也需要刷新
+        （本地数据推断的日历不含未来日期，只按间隔重试接口）
+        """
+        if not self._dates:
+            return True
+        if self._source == 'exchange' and self._dates[-1] < datetime.now().strftime('%Y-%m-%d'):
+            return True
+        try:
+            updated_at = datetime.strptime(self._updated_at, '%Y-%m-%d %H:%M:%S')
+        except (TypeError, ValueError):
+            return True
+        return datetime.now() - updated_at > timedelta(days=REFRESH_INTERVAL_DAYS)
+
+    def _fetch_exchange_dates(self) -> List[str]:
+        """从接口获取交易所交易日历（包含当年剩余的已公布交易日）"""
+        import akshare as ak
+        df = ak.tool_trade_date_hist_sina()
+        return [_to_date_str(d) for d in df['trade_date'].tolist()]
+
+    def _local_data_dates(self) -> List[str]:
+        """接口不可用时，用本地数据中出现过的日期作为历史交易日（依次尝试行情面板、列式存储、日线CSV）"""
+        # 延迟导入：这些模块较重，且只在接口不可用时需要
+        from bar_schema import read_bars
+        from bar_store import BarStore, _days_to_dates
+        from market_panel import MarketPanel
+        try:
+            panel = MarketPanel(self.data_dir)
+            if panel.exists():
+                return panel.get_date_strs()
+            bar_store = BarStore(self.data_dir)
+            if bar_store.exists():
+                _, _, columns = bar_store.get_columns()
+                days = np.unique(columns['date'])
+            else:
+                csv_files = glob.glob(os.path.join(self.data_dir, "daily_data", "*.csv"))
+                if not csv_files:
+                    return []
+                days = np.unique(np.concatenate([
+                    read_bars(path, columns=['date'], dates='days')['date'].to_numpy() for path in csv_files
+                ]))
+            return _days_to_dates(days).strftime('%Y-%m-%d').tolist()
+        except Exception as e:
+            print(f"读取本地数据日期失败: {e}")
+        return []
+
+    def refresh(self) -> int:
+        """
+        增量刷新：只把缓存中最新日期之后的交易日并入
+        :return: 新增的交易日数量
+        """
+        try:
+            fetched = self._fetch_exchange_dates()
+            source = 'exchange'
+        except Exception as e:
+            print(f"获取交易所交易日历失败，使用本地数据日期: {e}")
+            fetched = self._local_data_dates()
+            source = self._source or 'local_data'
+        return self._merge(fetched, source, touch=True)
+
+    def _merge(self, fetched: List[str], source: str, touch: bool = False) -> int:
+        """
+        把获取到的交易日并入日历并保存缓存
+        :param touch: 是否记为一次接口刷新（更新刷新时间）；只并入本地日期时不更新，到期后仍会重试接口
+        :return: 新增的交易日数量
+        """
+        if not fetched:
+            return 0
+
+        if source == 'exchange' and self._source != 'exchange':
+            # 首次获得交易所日历时整体替换本地推断的日期
+            new_dates = fetched
+            added = len(set(fetched) - self._date_set)
+        else:
+            last = self._dates[-1] if self._dates else ''
+            new_dates = self._dates + [d for d in fetched if d > last]
+            added = len(new_dates) - len(self._dates)
+
+        if not added and not touch:
+            return 0
+        self._set_dates(new_dates)
+        self._source = source
+        if touch or self._updated_at is None:
+            self._updated_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        try:
+            self._save_cache()
+        except OSError as e:
+            print(f"保存交易日历缓存失败: {e}")
+
+        if added:
+            print(f"交易日历已刷新，新增 {added} 个交易日，覆盖 {self._dates[0]} ~ {self._dates[-1]}")
+        return added
+
+    def _ensure_loaded(self):
+        """
+        首次查询时按需刷新：到期时访问接口；本地数据推断的日历未到期时只并入本地新出现的日期（不访问网络）
+        日历仍为空时只提示一次，查询返回None/空列表/False，由调用方回退（如按自然日取前一天）
+        """
+        if self._checked:
+            return
+        self._checked = True
+        if self._auto_refresh:
+            if self._needs_refresh():
+                self.refresh()
+            elif self._source != 'exchange':
+                self._merge(self._local_data_dates(), self._source)
+        if not self._dates:
+            print(f"警告: 交易日历为空（交易所日历接口不可用，且 {self.data_dir} 下没有可推断交易日的本地数据），"
+                  f"交易日查询将返回空结果")
+
+    # ------------------------------------------------------------------ 查询
+
+    def get_dates(self) -> List[str]:
+        """全部交易日（升序）"""
+        self._ensure_loaded()
+        return list(self._dates)
+
+    def is_trading_day(self, day) -> bool:
+        """是否为交易日"""
+        self._ensure_loaded()
+        return _to_date_str(day) in self._date_set
+
+    def prev_trading_day(self, day, n: int = 1) -> Optional[str]:
+        """指定日期之前（不含当日）的第 n 个交易日，超出范围返回None"""
+        self._ensure_loaded()
+        i = bisect_left(self._dates, _to_date_str(day)) - n
+        return self._dates[i] if 0 <= i < len(self._dates) else None
+
+    def next_trading_day(self, day, n: int = 1) -> Optional[str]:
+        """指定日期之后（不含当日）的第 n 个交易日，超出范围返回None"""
+        self._ensure_loaded()
+        i = bisect_right(self._dates, _to_date_str(day)) + n - 1
+        return self._dates[i] if 0 <= i < len(self._dates) else None
+
+    def offset(self, day, n: int) -> Optional[str]:
+        """
+        从指定日期偏移 n 个交易日
+        n=0 时返回当日（非交易日则为之前最近的交易日），n<0 向前，n>0 向后
+        """
+        self._ensure_loaded()
+        i = bisect_right(self._dates, _to_date_str(day)) - 1 + n
+        return self._dates[i] if 0 <= i < len(self._dates) else None
+
+    def get_range(self, start, end) -> List[str]:
+        """[start, end] 之间的交易日（升序，含两端）"""
+        self._ensure_loaded()
+        return self._dates[bisect_left(self._dates, _to_date_str(start)):
+                           bisect_right(self._dates, _to_date_str(end))]
+
+    def get_trade_days(self, end_date, count: int) -> List[str]:
+        """截至 end_date（含）的最近 count 个交易日（升序）"""
+        self._ensure_loaded()
+        end = bisect_right(self._dates, _to_date_str(end_date))
+        return self._dates[max(0, end - count):end]
+
+
+def main():
+    """命令行：刷新交易日历并显示最近交易日"""
+    import sys
+    calendar = TradingCalendar(sys.argv[1] if len(sys.argv) > 1 else None, auto_refresh=False)
+    calendar.refresh()
+    today = datetime.now().strftime('%Y-%m-%d')
+    print(f"交易日历: {len(calendar.get_dates())} 个交易日，来源: {calendar._source}")
+    print(f"今天 {today} 是否交易日: {calendar.is_trading_day(today)}")
+    print(f"上一个交易日: {calendar.prev_trading_day(today)}，下一个交易日: {calendar.next_trading_day(today)}")
+
+
+if __name__ == "__main__":
+    main()
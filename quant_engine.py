@@ -7,20 +7,20 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta, date
 from local_data_manager import LocalDataManager
+from trading_calendar import get_calendar
 import akshare as ak
 
 class QuantEngine:
     def __init__(self):
         self.dm = LocalDataManager()
+        self.calendar = get_calendar()
         self.current_dt = datetime.now()
         self.previous_date = self._get_previous_trading_date(self.current_dt.date())
 
     def _get_previous_trading_date(self, date_obj):
-        # Simple approximation: previous weekday
-        prev = date_obj - timedelta(days=1)
-        while prev.weekday() > 4:
-            prev -= timedelta(days=1)
-        return prev
+        # 按交易日历取前一个交易日
+        prev = self.calendar.prev_trading_day(date_obj)
+        return datetime.strptime(prev, '%Y-%m-%d').date() if prev else date_obj - timedelta(days=1)
 
     def set_current_dt(self, dt):
         self.current_dt = dt
@@ -83,13 +83,7 @@ class QuantEngine:
 
     def get_trade_days(self, end_date, count):
         # Return list of dates (datetime.date objects)
-        days = []
-        curr = end_date
-        while len(days) < count:
-            if curr.weekday() <= 4:
-                days.append(curr)
-            curr -= timedelta(days=1)
-        return sorted(days)
+        return [datetime.strptime(d, '%Y-%m-%d').date() for d in self.calendar.get_trade_days(end_date, count)]
 
     def get_price(self, security, end_date, frequency, fields, count, panel=False, fill_paused=False, skip_paused=False):
         # Used for get_hl_stock (Limit Up detection)
@@ -0,0 +1,181 @@
+"""
+候选股票向量化评估
+选股指标直接取自因子库中前一交易日那根K线的因子（因子库与列式存储一致时），
+否则一次性取出所有候选股票截至前一交易日的最近 101 根日线，按矩阵运算现场计算同一组因子。
+得到的指标表交给 strategy_rules 中编译好的策略条件做向量化筛选，不再逐只股票读取和判断
+"""
+
+import os
+import sys
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data_processing'))
+from bar_store import BarStore, _dates_to_days
+from factor_store import FactorStore, WINDOW_FIELDS, compute_window_factors, gather_windows
+
+# 指标名 -> 因子名（均为前一交易日那根K线的因子）
+FACTOR_COLUMNS = {
+    'history_length': 'history_length',
+    'prev_volume': 'volume_adj',
+    'avg_price_profit': 'avg_price_profit',
+    'avg_price_change': 'avg_price_change',
+    'zyts_0': 'zyts_0',
+    'max_prev_vol': 'max_prev_vol',
+    'left_pressure': 'left_pressure',
+    'rp': 'rp_60',
+    'increase_3d': 'increase_3d',
+    'prev_open_close': 'open_close',
+}
+
+
+class CandidateEvaluator:
+    def __init__(self, bar_store: BarStore = None, factor_store: FactorStore = None):
+        self.bar_store = bar_store or BarStore()
+        self.factor_store = factor_store or FactorStore(self.bar_store.data_dir)
+
+    # ------------------------------------------------------------------ 取数
+
+    def _get_columns(self, stock_codes: List[str], target_date_str: str):
+        """
+        列式存储的底层列；存储未生成时把候选股票的CSV拼成同样的列
+        :return: (股票代码, 行偏移, {字段: 列数组}, 是否为列式存储)
+        """
+        if self.bar_store.exists():
+            codes, offsets, columns = self.bar_store.get_columns()
+            return codes, offsets, columns, True
+
+        frames = [self.bar_store.get_stock_data(code, end_date=target_date_str) for code in stock_codes]
+        offsets = np.zeros(len(frames) + 1, dtype=np.int64)
+        np.cumsum([len(df) for df in frames], out=offsets[1:])
+        combined = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['date'] + WINDOW_FIELDS)
+        columns = {field: pd.to_numeric(combined[field], errors='coerce').to_numpy(dtype=np.float64)
+                   for field in WINDOW_FIELDS}
+        columns['date'] = _dates_to_days(combined['date']) if len(combined) else np.empty(0, dtype=np.int32)
+        codes = np.array([code.split('.')[0] for code in stock_codes])
+        return codes, offsets, columns, False
+
+    def locate(self, stock_codes: List[str], target_date_str: str):
+        """
+        定位每只候选股票前一交易日和目标日的K线
+        :return: (列数组, 起始行, 前一交易日所在行(无则-1), 目标日所在行(无则-1), 是否为列式存储)
+        """
+        codes, offsets, columns, from_store = self._get_columns(stock_codes, target_date_str)
+        code_index = {code: i for i, code in enumerate(codes.tolist())}
+        target_day = _dates_to_days([target_date_str])[0]
+        days = columns['date']
+
+        n = len(stock_codes)
+        starts = np.zeros(n, dtype=np.int64)
+        prev_rows = np.full(n, -1, dtype=np.int64)
+        today_rows = np.full(n, -1, dtype=np.int64)
+        for row, stock_code in enumerate(stock_codes):
+            i = code_index.get(stock_code.split('.')[0])
+            if i is None:
+                continue
+            start, end = int(offsets[i]), int(offsets[i + 1])
+            pos = start + int(np.searchsorted(days[start:end], target_day, side='left'))
+            starts[row] = start
+            if pos > start:
+                prev_rows[row] = pos - 1
+            if pos < end and days[pos] == target_day:
+                today_rows[row] = pos
+        return columns, starts, prev_rows, today_rows, from_store
+
+    # ------------------------------------------------------------------ 指标
+
+    def compute_features(self, stock_codes: List[str], target_date_str: str) -> pd.DataFrame:
+        """
+        计算候选股票的全部选股指标（以股票代码为索引）
+        前一交易日(prev_*)指 target_date 之前最近的一根日线
+        """
+        columns, starts, prev_rows, today_rows, from_store = self.locate(stock_codes, target_date_str)
+        return self.features_at_rows([code.split('.')[0] for code in stock_codes], columns, starts,
+                                     prev_rows, today_rows, from_store)
+
+    def features_at_rows(self, codes: List[str], columns: Dict[str, np.ndarray], starts: np.ndarray,
+                         prev_rows: np.ndarray, today_rows: np.ndarray, from_store: bool) -> pd.DataFrame:
+        """
+        按已定位的K线行计算选股指标（回测时一次传入所有日期的候选股票，代码可以重复）
+        :param codes: 每一项的股票代码
+        :param starts: 每一项所属股票的起始行
+        :param prev_rows: 前一交易日所在行，无则-1
+        :param today_rows: 目标日所在行，无则-1
+        :param from_store: columns 是否为列式存储（决定能否按行读取因子库）
+        """
+        n = len(codes)
+        has_bar = prev_rows >= 0
+        rows = prev_rows[has_bar]
+
+        if from_store and self.factor_store.is_fresh():
+            factors = self.factor_store.get_rows(rows, list(FACTOR_COLUMNS.values()))
+        else:
+            factors = compute_window_factors(gather_windows(columns, starts[has_bar], rows))
+
+        def at_rows(values, fill=np.nan):
+            result = np.full(n, fill, dtype=np.float64)
+            result[has_bar] = values
+            return result
+
+        def bar_value(field, target_rows):
+            result = np.full(n, np.nan)
+            found = target_rows >= 0
+            result[found] = np.asarray(columns[field])[target_rows[found]]
+            return result
+
+        features = pd.DataFrame({
+            'prev_close': np.nan_to_num(bar_value('close', prev_rows)),
+            'prev_open': np.nan_to_num(bar_value('open', prev_rows)),
+            'prev_high': np.nan_to_num(bar_value('high', prev_rows)),
+            'prev_amount': np.nan_to_num(bar_value('amount', prev_rows)),
+            'today_open': bar_value('open', today_rows),
+        }, index=pd.Index(codes, name='code'))
+        for column, name in FACTOR_COLUMNS.items():
+            features[column] = at_rows(factors[name])
+        features['history_length'] = features['history_length'].fillna(0).astype(np.int64)
+        features['zyts_0'] = features['zyts_0'].fillna(0).astype(np.int64)
+        features['left_pressure'] = features['left_pressure'].fillna(0).astype(bool)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            features['open_ratio'] = np.where(features['prev_close'] != 0,
+                                              np.nan_to_num(features['today_open']) / features['prev_close'], 0.0)
+        features['has_prev'] = (features['history_length'] > 0) & (features['prev_close'] != 0)
+        return features
+
+    @staticmethod
+    def add_auction(features: pd.DataFrame, auctions: Dict[str, Optional[Dict]]) -> pd.DataFrame:
+        """
+        合并竞价数据：有接口数据时用接口的价格和成交量，
+        否则用当日开盘价近似竞价价（成交量记为0），两者都没有时 has_auction 为False
+        """
+        features = features.copy()
+        price = pd.Series({code: a['price'] for code, a in auctions.items() if a is not None}, dtype=float)
+        volume = pd.Series({code: a['volume'] for code, a in auctions.items() if a is not None}, dtype=float)
+        today_open = features['today_open'].where(features['today_open'] > 0)
+        features['auction_price'] = price.reindex(features.index).fillna(today_open)
+        features['auction_volume'] = volume.reindex(features.index).fillna(0.0)
+        features.loc[features['auction_price'].isna(), 'auction_volume'] = np.nan
+        features['has_auction'] = features['auction_price'].notna()
+
+        prev_close = features['prev_close'].replace(0, np.nan)
+        features['auction_ratio'] = features['auction_price'] / prev_close
+        features['auction_volume_ratio'] = features['auction_volume'] / features['prev_volume']
+        # 弱转强的竞价比例：竞价价相对于 涨停价/1.1（创业板20%，其余10%）
+        limit_ratio = np.where(features.index.str.startswith('30'), 0.2, 0.1)
+        limit_price = np.round(features['prev_close'] * (1 + limit_ratio), 2)
+        features['auction_to_limit'] = features['auction_price'] / (limit_price / 1.1).replace(0, np.nan)
+        return features
+
+    @staticmethod
+    def add_market_caps(features: pd.DataFrame, market_caps: Dict[str, Optional[tuple]]) -> pd.DataFrame:
+        """合并市值数据（亿元），没有市值的股票为NaN"""
+        features = features.copy()
+        features['market_cap'] = pd.Series(
+            {code: caps[0] for code, caps in market_caps.items() if caps is not None}, dtype=float
+        ).reindex(features.index)
+        features['circulating_market_cap'] = pd.Series(
+            {code: caps[1] for code, caps in market_caps.items() if caps is not None}, dtype=float
+        ).reindex(features.index)
+        return features
+
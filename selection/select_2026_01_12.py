@@ -8,11 +8,21 @@
 import pandas as pd
 import os
 from datetime import datetime, timedelta
-import requests
 import json
 import akshare as ak
+import sys
 from functools import lru_cache
 
+# 添加data_processing目录到Python路径，以便导入列式日线存储
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data_processing'))
+from bar_store import BarStore
+from limit_status import LimitStatusTable
+from pool_store import PoolStore
+from auction_fetcher import AuctionFetcher
+from auction_cache import AuctionCache
+from candidate_evaluator import CandidateEvaluator
+from strategy_rules import compile_strategies, explain
+
 
 class TodayStockSelector:
     def __init__(self, data_path=None):
@@ -25,6 +35,18 @@ class TodayStockSelector:
             self.data_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'full_stock_data', 'daily_data')
         else:
             self.data_path = data_path
+        # 列式日线存储（数据目录为daily_data的上一级）
+        self.bar_store = BarStore(os.path.dirname(os.path.abspath(self.data_path)))
+        # 候选股票的向量化评估
+        self.evaluator = CandidateEvaluator(self.bar_store)
+        # 编译好的策略条件（首板高开 / 首板低开 / 弱转强）
+        self.strategies = compile_strategies()
+        # 持久化的涨跌停状态表，用于首板判断
+        self.limit_table = LimitStatusTable(os.path.dirname(os.path.abspath(self.data_path)))
+        # 竞价数据：连接池复用的并发获取器（带持久化缓存，历史日期重复运行不再请求接口），以及批量预取的结果
+        self.auction_fetcher = AuctionFetcher(cache=AuctionCache(os.path.dirname(os.path.abspath(self.data_path))))
+        self._prefetched_auctions = {}
+        self._auction_attempted = set()
         # 添加市值缓存
         self.market_cap_cache = {}
         self.last_market_data_fetch_time = None
@@ -85,41 +107,12 @@ class TodayStockSelector:
         由于我们没有总股本数据，使用本地数据估算市值
         """
         try:
-            # 构建文件路径
-            csv_file = os.path.join(self.data_path, f'{stock_code}.csv')
-            if not os.path.exists(csv_file):
-                print(f"股票数据文件不存在: {csv_file}")
+            # 从列式存储读取日线（已统一为英文列）
+            df = self.bar_store.get_stock_data(stock_code)
+            if df.empty:
+                print(f"股票 {stock_code} 无本地日线数据")
                 return 0, 0  # 返回默认值
             
-            df = pd.read_csv(csv_file)
-            # 重命名列以处理中文列名
-            df.rename(columns={
-                '股\u3000\u3000票\u3000\u3000代\u3000\u3000码\u3000': 'code',
-                '股\u3000票\u3000代\u3000码': 'code',
-                '开\u3000\u3000盘': 'open',
-                '开\u3000盘': 'open',
-                '收\u3000\u3000盘': 'close',
-                '收\u3000盘': 'close',
-                '最\u3000\u3000高': 'high',
-                '最\u3000高': 'high',
-                '最\u3000\u3000低': 'low',
-                '最\u3000低': 'low',
-                '成\u3000\u3000交\u3000量': 'volume',
-                '成\u3000交\u3000量': 'volume',
-                '成\u3000\u3000交\u3000额': 'amount',
-                '成\u3000交\u3000额': 'amount',
-                '振\u3000\u3000幅': 'amplitude',
-                '振\u3000幅': 'amplitude',
-                '涨\u3000\u3000跌\u3000\u3000幅': 'pct_change',
-                '涨\u3000跌\u3000幅': 'pct_change',
-                '涨\u3000\u3000跌\u3000\u3000额': 'change',
-                '涨\u3000跌\u3000额': 'change',
-                '换\u3000\u3000手\u3000\u3000率': 'turnover',
-                '换\u3000手\u3000率': 'turnover'
-            }, inplace=True)
-            
-            df['date'] = pd.to_datetime(df['date'])
-            
             # 查找指定日期的数据
             day_data = df[df['date'] == pd.to_datetime(date_str)]
             if day_data.empty:
@@ -274,120 +267,36 @@ class TodayStockSelector:
         self.cached_market_data = None
         self.last_market_data_fetch_time = None
 
+    def prefetch_auction_data(self, stock_codes, date_str):
+        """
+        并发批量获取候选股票的竞价数据，供选股循环直接使用
+        获取失败或超时的股票在选股时直接回退到日线估算，不再单独请求
+        """
+        table = self.auction_fetcher.fetch_batch(stock_codes, date_str)
+        for stock_code in stock_codes:
+            self._auction_attempted.add((stock_code, date_str))
+        for stock_code, row in table.iterrows():
+            self._prefetched_auctions[(stock_code, date_str)] = row.to_dict()
+        return table
+
     def get_historical_auction_data(self, stock_code, date_str):
         """
         获取历史竞价数据
-        对于历史日期，如果没有API数据，使用开盘价作为竞价价的近似
+        优先使用批量预取的结果；对于历史日期，如果没有API数据，使用开盘价作为竞价价的近似
         """
-        from datetime import datetime
-
-        # 获取今天的日期
-        today = datetime.now().strftime('%Y-%m-%d')
-        
-        # 使用原始API接口
-        # 将日期格式从 YYYY-MM-DD 转换为 YYYYMMDD
-        formatted_date = date_str.replace("-", "")
-        url = f"http://localhost:8080/api/minute-trade-all?code={stock_code}&date={formatted_date}"
+        key = (stock_code, date_str)
+        if key in self._prefetched_auctions:
+            return self._prefetched_auctions[key]
 
-        # 如果是今天的日期，则调用API获取真实的竞价数据
-        if date_str == today:
-            url = f"http://localhost:8080/api/minute-trade-all?code={stock_code}"
+        if key not in self._auction_attempted:
+            auction_data = self.auction_fetcher.fetch_one(stock_code, date_str)
+            if auction_data is not None:
+                print(f"成功获取竞价数据，股票 {stock_code}，时间: {auction_data['time']}, "
+                      f"价格: {auction_data['price']}, 成交量: {auction_data['volume']}")
+                return auction_data
 
-        try:
-            print(f"尝试获取股票 {stock_code} 在 {date_str} 的竞价数据，API请求URL: {url}")
-            response = requests.get(url, timeout=10)
-
-            if response.status_code == 200:
-                print(f"API响应成功，股票 {stock_code} 在 {date_str}")
-                data = response.json()
-                if 'data' in data and 'List' in data['data']:
-                    # 获取竞价时段的数据（9:25-9:29之间的数据）
-                    trade_list = data['data']['List']
-                    if trade_list:
-                        print(f"API返回 {len(trade_list)} 条交易数据，股票 {stock_code} 在 {date_str}")
-                        # 筛选竞价时段的数据（9:25-9:29）
-                        auction_trades = []
-                        for trade in trade_list:
-                            time_str = trade.get('Time', '')
-                            # 检查是否在竞价时段（9:25-9:29）
-                            if ('T09:25:' in time_str or 'T09:26:' in time_str or
-                                'T09:27:' in time_str or 'T09:28:' in time_str or
-                                'T09:29:' in time_str):
-                                auction_trades.append(trade)
-
-                        # 如果找到竞价时段数据，取最接近9:26-9:30的数据
-                        if auction_trades:
-                            print(f"找到 {len(auction_trades)} 条竞价时段数据，股票 {stock_code} 在 {date_str}")
-                            # 按时间排序，取最后一个（最晚的，最接近9:26-9:30开盘的数据）
-                            latest_auction = auction_trades[-1]
-                            # 保留原始价格和成交量的处理
-                            price = latest_auction.get('Price', 0) / 1000
-                            volume = latest_auction.get('Volume', 0) * 100  # 成交量需要乘以100
-                            
-                            auction_data = {
-                                'time': latest_auction.get('Time', ''),
-                                'price': price,
-                                'volume': volume,
-                                'direction': 'B' if latest_auction.get('Status') == 1 else 'S',
-                                'order': latest_auction.get('Number', 0)
-                            }
-                            print(f"成功获取竞价数据，时间: {auction_data['time']}, 价格: {auction_data['price']}, 成交量: {auction_data['volume']}")
-                            return auction_data
-
-                        # 如果没有找到竞价时段数据，但有9点时段的数据，取最接近9:26的数据
-                        morning_trades = []
-                        for trade in trade_list:
-                            time_str = trade.get('Time', '')
-                            if 'T09:' in time_str:  # 早上9点时段的数据
-                                morning_trades.append(trade)
-
-                        if morning_trades:
-                            print(f"找到 {len(morning_trades)} 条早盘数据，股票 {stock_code} 在 {date_str}")
-                            # 按时间排序，取最后一个
-                            latest_morning = morning_trades[-1]
-                            price = latest_morning.get('Price', 0) / 1000  # 价格也除以1000
-                            volume = latest_morning.get('Volume', 0) * 100  # 成交量需要乘以100
-                            
-                            auction_data = {
-                                'time': latest_morning.get('Time', ''),
-                                'price': price,
-                                'volume': volume,
-                                'direction': 'B' if latest_morning.get('Status') == 1 else 'S',
-                                'order': latest_morning.get('Number', 0)
-                            }
-                            print(f"使用早盘数据，时间: {auction_data['time']}, 价格: {auction_data['price']}, 成交量: {auction_data['volume']}")
-                            return auction_data
-
-                        # 如果仍然没有找到早盘数据，取最后一条数据
-                        last_trade = trade_list[-1]
-                        price = last_trade.get('Price', 0) / 1000  # 价格也除以1000
-                        volume = last_trade.get('Volume', 0) * 100  # 成交量需要乘以100
-                        
-                        auction_data = {
-                            'time': last_trade.get('Time', ''),
-                            'price': price,
-                            'volume': volume,
-                            'direction': 'B' if last_trade.get('Status') == 1 else 'S',
-                            'order': last_trade.get('Number', 0)
-                        }
-                        print(f"使用最后一条数据，时间: {auction_data['time']}, 价格: {auction_data['price']}, 成交量: {auction_data['volume']}")
-                        return auction_data
-                    else:
-                        print(f"API返回空数据列表，股票 {stock_code} 在 {date_str}")
-                        # 如果API返回空数据，尝试从本地数据获取
-                        return self.get_auction_data_from_daily_data(stock_code, date_str)
-                else:
-                    print(f"API返回格式错误，缺少'data.List'字段，股票 {stock_code} 在 {date_str}")
-                    # 如果API返回格式错误，尝试从本地数据获取
-                    return self.get_auction_data_from_daily_data(stock_code, date_str)
-            else:
-                print(f"API请求失败，状态码: {response.status_code}，股票 {stock_code} 在 {date_str}")
-                # 如果API不可用，尝试从本地日线数据获取
-                return self.get_auction_data_from_daily_data(stock_code, date_str)
-        except Exception as e:
-            # 如果API调用失败，尝试从本地日线数据获取
-            print(f"API调用异常，股票 {stock_code} 在 {date_str}: {e}")
-            return self.get_auction_data_from_daily_data(stock_code, date_str)
+        # 如果API不可用或无数据，尝试从本地日线数据获取
+        return self.get_auction_data_from_daily_data(stock_code, date_str)
 
     def get_auction_data_from_daily_data(self, stock_code, date_str):
         """
@@ -395,50 +304,12 @@ class TodayStockSelector:
         使用开盘价作为竞价价的近似
         """
         try:
-            # 构建文件路径获取本地数据
-            csv_file = os.path.join(self.data_path, f'{stock_code}.csv')
-            if not os.path.exists(csv_file):
-                print(f"股票数据文件不存在: {csv_file}")
-                return None
-            
-            print(f"从本地文件获取数据: {csv_file}")
-            df = pd.read_csv(csv_file)
-            # 重命名列以处理中文列名
-            df.rename(columns={
-                '股\u3000\u3000票\u3000\u3000代\u3000\u3000码\u3000': 'code',
-                '股\u3000票\u3000代\u3000码': 'code',
-                '开\u3000\u3000盘': 'open',
-                '开\u3000盘': 'open',
-                '收\u3000\u3000盘': 'close',
-                '收\u3000盘': 'close',
-                '最\u3000\u3000高': 'high',
-                '最\u3000高': 'high',
-                '最\u3000\u3000低': 'low',
-                '最\u3000低': 'low',
-                '成\u3000\u3000交\u3000量': 'volume',
-                '成\u3000交\u3000量': 'volume',
-                '成\u3000\u3000交\u3000额': 'amount',
-                '成\u3000交\u3000额': 'amount',
-                '振\u3000\u3000幅': 'amplitude',
-                '振\u3000幅': 'amplitude',
-                '涨\u3000\u3000跌\u3000\u3000幅': 'pct_change',
-                '涨\u3000跌\u3000幅': 'pct_change',
-                '涨\u3000\u3000跌\u3000\u3000额': 'change',
-                '涨\u3000跌\u3000额': 'change',
-                '换\u3000\u3000手\u3000\u3000率': 'turnover',
-                '换\u3000手\u3000率': 'turnover'
-            }, inplace=True)
-            
-            df['date'] = pd.to_datetime(df['date'])
-            
-            # 查找指定日期的数据
-            day_data = df[df['date'] == pd.to_datetime(date_str)]
-            if day_data.empty:
+            # 从列式存储直接取当日日线
+            day_data = self.bar_store.get_bar(stock_code, date_str)
+            if day_data is None:
                 print(f"未找到股票 {stock_code} 在 {date_str} 的数据")
                 return None
             
-            day_data = day_data.iloc[0]
-            
             open_price = float(day_data.get('open', 0)) if pd.notna(day_data.get('open', 0)) else 0
             
             if open_price <= 0:
@@ -461,6 +332,75 @@ class TodayStockSelector:
             print(f"从本地日线数据获取竞价信息失败 for {stock_code}: {e}")
             return None
 
+    def _evaluate_candidates(self, stock_codes, date_str, pool_data):
+        """计算一批候选股票的全部选股指标，并合并竞价数据（预取结果或日线开盘价近似）和首板标记"""
+        features = self.evaluator.compute_features(stock_codes, date_str)
+        missing = [code for code in features.index if (code, date_str) not in self._prefetched_auctions]
+        if missing:
+            print(f"{len(missing)} 只股票无竞价接口数据，使用开盘价近似")
+        auctions = {code: self._prefetched_auctions.get((code, date_str)) for code in features.index}
+        features = self.evaluator.add_auction(features, auctions)
+        features['is_first_board'] = self._first_board_mask(features.index, pool_data)
+        return features
+
+    def _first_board_mask(self, stock_codes, pool_data):
+        """
+        首板判断：昨日涨停且前日未涨停
+        涨跌停状态表已包含昨日时直接按连板数判断
+        """
+        prev_trading_date = pool_data.get('prev_trading_date')
+        if self.limit_table.covers(prev_trading_date):
+            board_counts = self.limit_table.get_board_counts(prev_trading_date)
+            return pd.Series([board_counts.get(code) == 1 for code in stock_codes], index=stock_codes)
+        limit_up_yesterday = set(pool_data.get('limit_up_stocks', []))
+        limit_up_2_days_ago = set(pool_data.get('limit_up_2_days_ago', []))
+        return pd.Series([code in limit_up_yesterday and code not in limit_up_2_days_ago for code in stock_codes],
+                         index=stock_codes)
+
+    def evaluate_strategies(self, candidates, date_str, pool_data):
+        """
+        按策略配置筛选候选股票
+        :param candidates: {股票池类别: 股票代码列表}，与策略配置中的 candidates 对应
+        :return: {策略名称: 入选股票代码列表}
+        """
+        selected = {}
+        for pool_key, stock_codes in candidates.items():
+            strategies = [s for s in self.strategies.values() if s.candidates == pool_key]
+            if not strategies:
+                continue
+            features = self._evaluate_candidates(stock_codes, date_str, pool_data)
+            # 市值需要逐只查询，只为通过其余条件的股票查询
+            need_caps = pd.Series(False, index=features.index)
+            for strategy in strategies:
+                need_caps |= strategy.prefilter(features)
+            market_caps = {code: self.get_market_cap(code, date_str) for code in features.index[need_caps]}
+            features = self.evaluator.add_market_caps(features, market_caps)
+
+            for strategy in strategies:
+                results = strategy.evaluate(features)
+                passed = results.all(axis=1)
+                selected[strategy.name] = features.index[passed].tolist()
+                failures = strategy.first_failure(results)
+                print(f"{strategy.label}: {len(stock_codes)} 只候选，入选 {int(passed.sum())} 只，"
+                      f"未通过条件统计: {failures[failures != ''].value_counts().to_dict()}")
+                for stock_code in selected[strategy.name]:
+                    row = features.loc[stock_code]
+                    print(f"股票 {stock_code} 满足{strategy.label}条件: 成交额={row.prev_amount/1e8:.2f}亿, "
+                          f"市值={row.market_cap:.2f}亿, 竞价比例={row.auction_ratio:.3f}, 左压周期={row.zyts_0}天")
+        return selected
+
+    def explain_universe(self, target_date_str, pool_data):
+        """
+        对全市场股票（不限股票池）一次性判断所有策略，竞价价格用开盘价近似
+        :return: 以股票代码为索引，列为 <策略>（是否入选）与 <策略>_failed（第一个未通过的条件）
+        """
+        features = self._evaluate_candidates(self.bar_store.get_codes(), target_date_str, pool_data)
+        need_caps = pd.Series(False, index=features.index)
+        for strategy in self.strategies.values():
+            need_caps |= strategy.prefilter(features)
+        market_caps = {code: self.get_market_cap(code, target_date_str) for code in features.index[need_caps]}
+        return explain(self.strategies, self.evaluator.add_market_caps(features, market_caps))
+
     def select_stocks_from_pool(self, target_date_str, pool_data):
         """
         使用JSON格式的pool数据进行选股
@@ -481,7 +421,6 @@ class TodayStockSelector:
             target_date = datetime.strptime(target_date_str, '%Y-%m-%d')
             
             # 从pool_data中获取涨停股票列表
-            limit_up_stocks_today = pool_data.get('limit_up_stocks', [])
             limit_up_stocks_yesterday = pool_data.get('limit_up_stocks', [])  # 昨日涨停即为今天看昨天的涨停
             limit_up_2_days_ago = pool_data.get('limit_up_2_days_ago', [])
             first_board_stocks = pool_data.get('first_board_stocks', [])
@@ -502,429 +441,18 @@ class TodayStockSelector:
             
             print(f"曾涨停未封板股票: {len(ever_limit_up_not_closed_yesterday)}")
             
-            # 按策略分类的股票列表
-            sbgk_stocks = []  # 首板高开
-            sbdk_stocks = []  # 首板低开
-            rzq_stocks = []  # 弱转强
-            
-            # 对首板股票进行处理（来自first_board_stocks，对应aa.py中的target_list）
-            target_stocks = filtered_first_board_stocks
-            
-            for stock_code in target_stocks:
-                try:
-                    # 构建文件路径
-                    csv_file = os.path.join(self.data_path, f'{stock_code}.csv')
-                    if not os.path.exists(csv_file):
-                        print(f"股票数据文件不存在: {csv_file}，跳过股票 {stock_code}")
-                        continue
-                    
-                    df = pd.read_csv(csv_file)
-                    # 重命名列以处理中文列名
-                    df.rename(columns={
-                        '股\u3000\u3000票\u3000\u3000代\u3000\u3000码\u3000': 'code',
-                        '股\u3000票\u3000代\u3000码': 'code',
-                        '开\u3000\u3000盘': 'open',
-                        '开\u3000盘': 'open',
-                        '收\u3000\u3000盘': 'close',
-                        '收\u3000盘': 'close',
-                        '最\u3000\u3000高': 'high',
-                        '最\u3000高': 'high',
-                        '最\u3000\u3000低': 'low',
-                        '最\u3000低': 'low',
-                        '成\u3000\u3000交\u3000量': 'volume',
-                        '成\u3000交\u3000量': 'volume',
-                        '成\u3000\u3000交\u3000额': 'amount',
-                        '成\u3000交\u3000额': 'amount',
-                        '振\u3000\u3000幅': 'amplitude',
-                        '振\u3000幅': 'amplitude',
-                        '涨\u3000\u3000跌\u3000\u3000幅': 'pct_change',
-                        '涨\u3000跌\u3000幅': 'pct_change',
-                        '涨\u3000\u3000跌\u3000\u3000额': 'change',
-                        '涨\u3000跌\u3000额': 'change',
-                        '换\u3000\u3000手\u3000\u3000率': 'turnover',
-                        '换\u3000手\u3000率': 'turnover'
-                    }, inplace=True)
-                    
-                    df['date'] = pd.to_datetime(df['date'])
-                    
-                    # 即使本地数据中没有当日数据，也要尝试获取竞价数据
-                    # 查找指定日期的数据
-                    day_data = df[df['date'] == pd.to_datetime(target_date_str)]
-                    if day_data.empty:
-                        print(f"未找到股票 {stock_code} 在 {target_date_str} 的本地数据，但仍需获取竞价数据")
-                        # 即使本地数据为空，也继续尝试获取竞价数据
-                        day_data_for_calc = None
-                    else:
-                        day_data_for_calc = day_data.iloc[0]
-                    
-                    # 获取前一个交易日的数据
-                    prev_day_data = df[df['date'] < pd.to_datetime(target_date_str)].tail(1)
-                    if prev_day_data.empty:
-                        print(f"股票 {stock_code} 在 {target_date_str} 前无历史数据，跳过")
-                        continue
-                    
-                    prev_close = float(prev_day_data.iloc[0]['close']) if pd.notna(prev_day_data.iloc[0]['close']) else 0
-                    current_open = float(day_data_for_calc.get('open', 0)) if day_data_for_calc is not None and pd.notna(day_data_for_calc.get('open', 0)) else 0
-                    current_high = float(day_data_for_calc.get('high', 0)) if day_data_for_calc is not None and pd.notna(day_data_for_calc.get('high', 0)) else 0
-                    current_low = float(day_data_for_calc.get('low', 0)) if day_data_for_calc is not None and pd.notna(day_data_for_calc.get('low', 0)) else 0
-                    current_volume = float(day_data_for_calc.get('volume', 0)) if day_data_for_calc is not None and pd.notna(day_data_for_calc.get('volume', 0)) else 0
-                    # 修复成交量数据：本地CSV中的volume可能以手为单位，而实际成交量应为股
-                    # 通常volume字段是以股为单位，但有些数据源会以手为单位（1手=100股）
-                    # 根据数据特征判断，需要乘以100来统一单位
-                    prev_volume_raw = float(prev_day_data.iloc[0]['volume']) if pd.notna(prev_day_data.iloc[0]['volume']) else 1
-                    # 检测是否需要调整成交量单位
-                    # 通过计算均价与收盘价的关系来判断
-                    prev_amount = float(prev_day_data.iloc[0]['amount']) if pd.notna(prev_day_data.iloc[0]['amount']) else 0
-                    
-                    # 检测成交量单位：如果按原始volume计算均价远超收盘价，说明volume单位过小
-                    if prev_volume_raw != 0:
-                        raw_avg_price = prev_amount / prev_volume_raw if prev_volume_raw != 0 else 0
-                        if raw_avg_price > prev_close * 5:  # 如果均价远大于收盘价，可能是单位问题
-                            prev_volume = prev_volume_raw * 100  # 将手转换为股
-                        else:
-                            prev_volume = prev_volume_raw
-                    else:
-                        prev_volume = 1  # 防止除零错误
-                    
-                    if prev_close == 0:
-                        print(f"股票 {stock_code} 前日收盘价为0，跳过")
-                        continue
-                    
-                    # 获取涨停状态（从pool_data中获取）
-                    is_limit_up_today = stock_code in limit_up_stocks_today
-                    was_limit_up_yesterday = stock_code in limit_up_stocks_yesterday
-                    was_limit_up_2_days_ago = stock_code in limit_up_2_days_ago
-                    
-                    # 检查是否满足首板条件（昨日涨停，前日未涨停）
-                    is_first_board = was_limit_up_yesterday and not was_limit_up_2_days_ago
-                    
-                    if is_first_board:
-                        # 获取竞价数据
-                        call_auction_data = self.get_historical_auction_data(stock_code, target_date_str)
-                        if call_auction_data is not None:
-                            auction_price = call_auction_data['price']
-                            # 使用竞价价格计算开盘比例
-                            current_ratio = auction_price / prev_close if prev_close != 0 else 0
-
-                            volume_ratio = call_auction_data['volume'] / prev_volume if prev_volume > 0 else 0
-                            print(f"DEBUG: 竞价成交量={call_auction_data['volume']}, 前日成交量={prev_volume}, 成交量比例={volume_ratio}")
-
-                            # 获取当天开盘价用于对比
-                            current_open = float(day_data_for_calc.get('open', 0)) if day_data_for_calc is not None and pd.notna(day_data_for_calc.get('open', 0)) else 0
-                            
-                        else:
-                            # 与aa.py一致：如果无法获取竞价数据，则跳过该股票
-                            print(f"股票 {stock_code}: 无法获取竞价数据，跳过")
-                            continue
-                            
-                        # 获取市值数据
-                        market_cap_result = self.get_market_cap(stock_code, target_date_str)
-                        
-                        # 检查是否成功获取市值数据
-                        if market_cap_result is None:
-                            print(f"无法获取股票 {stock_code} 的市值数据，跳过该股票")
-                            continue  # 跳过该股票
-                        
-                        market_cap, circulating_market_cap = market_cap_result
-                        
-                        # 条件一：均价，金额，市值，换手率
-                        if prev_volume != 0 and prev_amount != 0:
-                            avg_price = prev_amount / prev_volume
-                            # 修正：根据aa.py中的计算公式
-                            # avg_price_increase_value = prev_day_data['money'][0] / prev_day_data['volume'][0] / prev_day_data['close'][0] *1.1 - 1
-                            avg_price_increase_value = avg_price / prev_close * 1.1 - 1
-                            print(f"股票 {stock_code}: 均价计算详情 - 成交额={prev_amount:.2f}, 成交量={prev_volume:.2f}, 均价={avg_price:.3f}, 收盘价={prev_close:.3f}, 均价获利={avg_price_increase_value:.3f}")
-                            condition1_part1 = avg_price_increase_value >= 0.07  # 收盘获利比例 >= 7%
-                        else:
-                            condition1_part1 = False  # 如果金额或成交量为0，条件不满足
-                            print(f"股票 {stock_code}: 前日成交额或成交量为0，均价获利条件不满足")
-                        condition1_part2 = 5.5e8 <= prev_amount <= 20e8  # 成交额在5.5亿-20亿之间
-                        condition1 = condition1_part1 and condition1_part2
-                        
-                        # 检查条件一中的市值条件
-                        if market_cap < 70 or circulating_market_cap > 520:
-                            print(f"股票 {stock_code}: 市值条件不满足 - 总市值={market_cap:.2f}亿, 流通市值={circulating_market_cap:.2f}亿")
-                            continue  # 市值不在范围内，跳过
-                        
-                        # 条件二：高开,开比
-                        condition2_part1 = volume_ratio >= 0.03  # 集合竞价成交量占比 >= 3%
-                        # 修正开盘比例计算，符合aa.py的逻辑 - 开盘价高于收盘价(高开)且不超过6%
-                        condition2_part2 = 1.0 < current_ratio < 1.06  # 开盘价高于前日收盘价且不超过6%
-                        condition2 = condition2_part1 and condition2_part2
-                        
-                        # 条件三：左压
-                        # 获取历史数据计算左压条件
-                        # 这里应该是获取到前一日（涨停日）为止的历史数据，用于确定左压周期
-                        hst_data = df[df['date'] <= pd.to_datetime(prev_day_data.iloc[0]['date'])]
-                        if len(hst_data) >= 2:
-                            hst = hst_data.tail(101) if len(hst_data) >= 101 else hst_data
-                            if len(hst) >= 2:
-                                # 获取前一日的高点（涨停日的高点）
-                                prev_high = float(hst.iloc[-1]['high']) if pd.notna(hst.iloc[-1]['high']) else 0
-                                
-                                # 计算zyts_0：从倒数第3个开始往前，找到高点大于等于前一日高点的天数
-                                zyts_0 = next((i-1 for i, high in enumerate(hst['high'][-3::-1], 2) if pd.notna(high) and high >= prev_high), 100)  # 计算zyts_0
-                                
-                                zyts = zyts_0 + 5
-                                # 获取高点以来的成交量数据（基于涨停日的历史数据）
-                                volume_data_historical = hst['volume'].tail(zyts) if len(hst) >= zyts else hst['volume']
-                                
-                                if len(volume_data_historical) >= 2:
-                                    max_prev_vol = volume_data_historical.iloc[:-1].max() if len(volume_data_historical) > 1 else volume_data_historical.iloc[0]
-                                    
-                                    # 使用涨停日的成交量来检查左压条件（而不是竞价成交量）
-                                    yesterday_volume = float(prev_day_data.iloc[0]['volume']) if pd.notna(prev_day_data.iloc[0]['volume']) else 0
-                                    
-                                    if max_prev_vol > 0:
-                                        condition3 = yesterday_volume > max_prev_vol * 0.9  # 检查涨停日成交量是否放大
-                                    else:
-                                        condition3 = True  # 如果前期成交量为0，条件通过
-                                else:
-                                    condition3 = False  # 如果数据不足，条件不满足
-                            else:
-                                condition3 = False  # 如果数据不足，条件不满足
-                        else:
-                            condition3 = False  # 如果数据不足，条件不满足
-                        
-                        # 详细输出每个条件的检查结果
-                        print(f"股票 {stock_code}: "
-                              f"均价获利={avg_price_increase_value:.3f}(≥0.07?{condition1_part1}), "
-                              f"成交额={prev_amount/1e8:.2f}亿(in[5.5,20]?{condition1_part2}), "
-                              f"市值总={market_cap:.2f}亿≥70?{market_cap>=70}, "
-                              f"市值流={circulating_market_cap:.2f}亿≤520?{circulating_market_cap<=520}, "
-                              f"竞价量比={volume_ratio:.3f}(≥0.03?{condition2_part1}), "
-                              f"开盘比={current_ratio:.3f}(1.0<{current_ratio:.3f}<1.06?{condition2_part2}), "
-                              f"左压周期={zyts_0}, "
-                              f"昨量={yesterday_volume:.0f}, "
-                              f"前量max={max_prev_vol:.0f}, "
-                              f"左压?{condition3}")
-                        
-                        # 所有条件都满足
-                        if condition1 and condition2 and condition3:
-                            sbgk_stocks.append(stock_code)
-                            print(f'股票 {stock_code} 满足首板高开条件: 成交额={prev_amount/1e8:.2f}亿, 市值={market_cap:.2f}亿, 开盘比例={current_ratio:.3f}, 左压周期={zyts_0}天')
-                    
-                    # 首板低开条件 - 昨日涨停，前日未涨停，低开幅度3%-4.5%
-                    if is_first_board:
-                        # 使用开盘价来计算开盘比例
-                        open_ratio = current_open / prev_close if prev_close != 0 else 0
-                        low_open_condition = 0.955 <= open_ratio <= 0.97  # 低开3%-4.5%
-                        
-                        if low_open_condition:
-                            # 检查其他条件：相对位置和成交额
-                            history_data = df[df['date'] <= pd.to_datetime(prev_day_data.iloc[0]['date'])]
-                            if len(history_data) >= 60:
-                                hist_60 = history_data.tail(60)
-                                close_60 = float(hist_60.iloc[-1]['close']) if pd.notna(hist_60.iloc[-1]['close']) else 0
-                                high_60 = hist_60['high'].max() if len(hist_60) > 0 else 0
-                                low_60 = hist_60['low'].min() if len(hist_60) > 0 else 0
-                                
-                                if high_60 != low_60:
-                                    rp = (close_60 - low_60) / (high_60 - low_60)  # 相对位置
-                                    money_condition = prev_amount >= 1e8  # 昨日成交额>=1亿
-                                        
-                                    if rp <= 0.5 and money_condition:
-                                        # 获取市值数据
-                                        market_cap_result = self.get_market_cap(stock_code, target_date_str)
-                                        
-                                        # 检查是否成功获取市值数据
-                                        if market_cap_result is None:
-                                            print(f"无法获取股票 {stock_code} 的市值数据，跳过该股票")
-                                            continue  # 跳过该股票
-                                        
-                                        market_cap, circulating_market_cap = market_cap_result
-                                        
-                                        sbdk_stocks.append(stock_code)
-                                        print(f'股票 {stock_code} 满足首板低开条件: 相对位置={rp:.3f}, 金额={prev_amount/1e8:.2f}亿, 市值={market_cap:.2f}亿, 开盘比例={open_ratio:.3f}')
-                    
-                except Exception as e:
-                    print(f"处理股票 {stock_code} 时出错: {e}")
-                    continue  # 跳过有问题的股票
+            # 一次性并发获取所有首板和弱转强候选的竞价数据
+            self.prefetch_auction_data(filtered_first_board_stocks + ever_limit_up_not_closed_yesterday, target_date_str)
             
-            # 现在处理弱转强股票：遍历曾涨停未封板的股票（对应aa.py中的target_list2）
-            for stock_code in ever_limit_up_not_closed_yesterday:
-                try:
-                    # 只处理在曾涨停未封板列表中的股票
-                    if stock_code not in ever_limit_up_not_closed_yesterday:
-                        continue
-                    
-                    # 构建文件路径
-                    csv_file = os.path.join(self.data_path, f'{stock_code}.csv')
-                    if not os.path.exists(csv_file):
-                        print(f"股票数据文件不存在: {csv_file}，跳过股票 {stock_code}")
-                        continue
-                    
-                    df = pd.read_csv(csv_file)
-                    # 重命名列以处理中文列名
-                    df.rename(columns={
-                        '股　　票　　代　　码　': 'code',
-                        '股　票　代　碼': 'code',
-                        '开　　盘': 'open',
-                        '开　盘': 'open',
-                        '收　　盘': 'close',
-                        '收　盘': 'close',
-                        '最　　高': 'high',
-                        '最　高': 'high',
-                        '最　　低': 'low',
-                        '最　低': 'low',
-                        '成　　交　量': 'volume',
-                        '成　交　量': 'volume',
-                        '成　　交　额': 'amount',
-                        '成　交　额': 'amount',
-                        '振　　幅': 'amplitude',
-                        '振　幅': 'amplitude',
-                        '涨　　跌　　幅': 'pct_change',
-                        '涨　跌　幅': 'pct_change',
-                        '涨　　跌　　额': 'change',
-                        '涨　跌　额': 'change',
-                        '换　　手　　率': 'turnover',
-                        '换　手　率': 'turnover'
-                    }, inplace=True)
-                    
-                    df['date'] = pd.to_datetime(df['date'])
-                    
-                    # 即使本地数据中没有当日数据，也要尝试获取竞价数据
-                    # 查找指定日期的数据
-                    day_data = df[df['date'] == pd.to_datetime(target_date_str)]
-                    if day_data.empty:
-                        print(f"未找到股票 {stock_code} 在 {target_date_str} 的本地数据，但仍需获取竞价数据")
-                        # 即使本地数据为空，也继续尝试获取竞价数据
-                        day_data_for_calc = None
-                    else:
-                        day_data_for_calc = day_data.iloc[0]
-                    
-                    # 获取前一个交易日的数据
-                    prev_day_data = df[df['date'] < pd.to_datetime(target_date_str)].tail(1)
-                    if prev_day_data.empty:
-                        print(f"股票 {stock_code} 在 {target_date_str} 前无历史数据，跳过")
-                        continue
-                    
-                    prev_close = float(prev_day_data.iloc[0]['close']) if pd.notna(prev_day_data.iloc[0]['close']) else 0
-                    # 注意：对于当天选股，当日收盘价不存在，所以我们不检查当日收盘价
-                    # 我们只关注竞价数据和其他条件
-                    
-                    
-                    # 获取股票名称
-                    stock_name = self.get_stock_name(stock_code)
-                    
-                    current_open = float(day_data_for_calc.get('open', 0)) if day_data_for_calc is not None and pd.notna(day_data_for_calc.get('open', 0)) else 0
-                    current_high = float(day_data_for_calc.get('high', 0)) if day_data_for_calc is not None and pd.notna(day_data_for_calc.get('high', 0)) else 0
-                    current_low = float(day_data_for_calc.get('low', 0)) if day_data_for_calc is not None and pd.notna(day_data_for_calc.get('low', 0)) else 0
-                    current_volume = float(day_data_for_calc.get('volume', 0)) if day_data_for_calc is not None and pd.notna(day_data_for_calc.get('volume', 0)) else 0
-                    # 修复成交量数据：本地CSV中的volume可能以手为单位，而实际成交量应为股
-                    # 通常volume字段是以股为单位，但有些数据源会以手为单位（1手=100股）
-                    # 根据数据特征判断，需要乘以100来统一单位
-                    prev_volume_raw = float(prev_day_data.iloc[0]['volume']) if pd.notna(prev_day_data.iloc[0]['volume']) else 1
-                    # 检测是否需要调整成交量单位
-                    # 通过计算均价与收盘价的关系来判断
-                    prev_amount = float(prev_day_data.iloc[0]['amount']) if pd.notna(prev_day_data.iloc[0]['amount']) else 0
-                    
-                    # 检测成交量单位：如果按原始volume计算均价远超收盘价，说明volume单位过小
-                    if prev_volume_raw != 0:
-                        raw_avg_price = prev_amount / prev_volume_raw if prev_volume_raw != 0 else 0
-                        if raw_avg_price > prev_close * 5:  # 如果均价远大于收盘价，可能是单位问题
-                            prev_volume = prev_volume_raw * 100  # 将手转换为股
-                        else:
-                            prev_volume = prev_volume_raw
-                    else:
-                        prev_volume = 1  # 防止除零错误
-                    
-                    if prev_close == 0:
-                        print(f"股票 {stock_code} 前日收盘价为0，跳过")
-                        continue
-                    
-                    # 获取竞价数据
-                    rzq_call_auction_data = self.get_historical_auction_data(stock_code, target_date_str)
-                    if rzq_call_auction_data is None:
-                        print(f"股票 {stock_code}: 无法获取竞价数据，跳过弱转强判断")
-                        continue
-                    
-                    # 获取最近4天的数据用于弱转强判断
-                    recent_df = df[df['date'] <= pd.to_datetime(prev_day_data.iloc[0]['date'])].tail(4)
-                    if len(recent_df) >= 4:
-                        past_4_close = [float(row['close']) if pd.notna(row['close']) else 0 for _, row in recent_df.iterrows()]
-                        prev_open_val = float(prev_day_data.iloc[0]['open']) if pd.notna(prev_day_data.iloc[0]['open']) else 0
-                        prev_close_val = float(prev_day_data.iloc[0]['close']) if pd.notna(prev_day_data.iloc[0]['close']) else 0
-                        
-                        if len(past_4_close) >= 4 and all(c > 0 for c in past_4_close):
-                            # 检查前3日涨幅 ≤ 28%
-                            increase_ratio = (past_4_close[-1] - past_4_close[0]) / past_4_close[0]
-                            if increase_ratio <= 0.28:  # 前3日涨幅 ≤ 28%
-                                # 检查前一日跌幅 ≥ -5%
-                                open_close_ratio = (prev_close_val - prev_open_val) / prev_open_val if prev_open_val != 0 else 0
-                                if open_close_ratio >= -0.05:  # 前一日跌幅 ≥ -5%
-                                    # 计算开盘价相对于涨停价/1.1的比例（开收比例）
-                                    # 根据聚宽代码修改：使用涨停价/1.1作为基准
-                                    # 需要根据股票类型确定涨停比例
-                                    is_st = 'ST' in stock_code or 'st' in stock_code
-                                    if stock_code.startswith('30'):  # 创业板股票
-                                        limit_ratio = 0.2  # 20%涨停板
-                                    elif is_st:  # ST股票
-                                        limit_ratio = 0.05  # 5%涨停板
-                                    else:
-                                        limit_ratio = 0.1  # 10%涨停板
-                                    limit_price = round(prev_close * (1 + limit_ratio), 2)
-                                    current_ratio_to_close = rzq_call_auction_data['price'] / (limit_price / 1.1) if (limit_price / 1.1) != 0 else 0
-                                    
-                                    # 检查竞价是否在合理范围（相对于昨日收盘价）
-                                    if 0.98 <= current_ratio_to_close <= 1.09:  # -2% 到 +9%
-                                        # 检查成交量占比
-                                        volume_condition = rzq_call_auction_data['volume'] / prev_volume >= 0.03 if prev_volume > 0 else False
-                                        if volume_condition:
-                                            # 检查均价涨幅
-                                            avg_price_increase_value = prev_amount / prev_volume / prev_close - 1 if prev_volume != 0 and prev_close != 0 else 0
-                                            if avg_price_increase_value >= -0.04:  # 均价涨幅 ≥ -4%
-                                                # 检查成交额
-                                                if 3e8 <= prev_amount <= 19e8:  # 成交额在3亿-19亿之间
-                                                    # 获取市值数据
-                                                    market_cap_result = self.get_market_cap(stock_code, target_date_str)
-                                                    
-                                                    # 检查是否成功获取市值数据
-                                                    if market_cap_result is None:
-                                                        print(f"无法获取股票 {stock_code} 的市值数据，跳过该股票")
-                                                        continue  # 跳过该股票
-                                                    
-                                                    market_cap, circulating_market_cap = market_cap_result
-                                                    
-                                                    if market_cap >= 70 and circulating_market_cap <= 520:
-                                                        # 检查左压条件
-                                                        hst_data = df[df['date'] <= pd.to_datetime(prev_day_data.iloc[0]['date'])]
-                                                        if len(hst_data) >= 2:
-                                                            hst = hst_data.tail(101) if len(hst_data) >= 101 else hst_data
-                                                            if len(hst) >= 2:
-                                                                # 获取前一日的高点
-                                                                prev_high = float(hst.iloc[-1]['high']) if pd.notna(hst.iloc[-1]['high']) else 0
-                                                                
-                                                                # 计算zyts_0
-                                                                zyts_0 = next((i-1 for i, high in enumerate(hst['high'][-3::-1], 2) if pd.notna(high) and high >= prev_high), 100)  # 计算zyts_0
-                                                                
-                                                                zyts = zyts_0 + 5
-                                                                # 获取高点以来的成交量数据
-                                                                volume_data = hst['volume'].tail(zyts) if len(hst) >= zyts else hst['volume']
-                                                                
-                                                                if len(volume_data) >= 2 and pd.notna(volume_data.iloc[-1]):
-                                                                    max_prev_vol = volume_data.iloc[:-1].max() if len(volume_data) > 1 else volume_data.iloc[0]
-                                                                    # 检查前一日的成交量是否放大
-                                                                    current_vol = float(hst.iloc[-1]['volume']) if pd.notna(hst.iloc[-1]['volume']) else 0
-                                                                    
-                                                                    if max_prev_vol > 0:
-                                                                        left_pressure_condition = current_vol > max_prev_vol * 0.9
-                                                                    else:
-                                                                        left_pressure_condition = True  # 如果前期成交量为0，条件通过
-                                                                else:
-                                                                    left_pressure_condition = False  # 如果数据不足，条件不满足
-                                                            else:
-                                                                left_pressure_condition = False  # 如果数据不足，条件不满足
-                                                        else:
-                                                            left_pressure_condition = False  # 如果数据不足，条件不满足
-                                                        
-                                                        if left_pressure_condition:
-                                                            rzq_stocks.append(stock_code)
-                                                            print(f'股票 {stock_code} 满足弱转强条件: 前期涨幅={increase_ratio:.3f}, 开收比例={open_close_ratio:.3f}, 成交额={prev_amount/1e8:.2f}亿, 市值={market_cap:.2f}亿, 开盘比例={current_ratio_to_close:.3f}, 左压周期={zyts_0}天')
-                    
-                except Exception as e:
-                    print(f"处理弱转强股票 {stock_code} 时出错: {e}")
-                    continue  # 跳过有问题的股票
+            # 一次性取出所有候选股票的历史窗口，指标按矩阵计算，再用编译好的策略条件筛选
+            candidates = {
+                'first_board_stocks': filtered_first_board_stocks,
+                'limit_up_not_closed_stocks': ever_limit_up_not_closed_yesterday,
+            }
+            selected = self.evaluate_strategies(candidates, target_date_str, pool_data)
+            sbgk_stocks = selected.get('First Board High Open', [])  # 首板高开
+            sbdk_stocks = selected.get('First Board Low Open', [])  # 首板低开
+            rzq_stocks = selected.get('Weak to Strong', [])  # 弱转强
             
             # 合并所有选中的股票
             all_qualified = sbgk_stocks + sbdk_stocks + rzq_stocks
@@ -963,16 +491,13 @@ def select_stocks_by_date(target_date):
     
     print(f"开始选择{target_date}股票: {target_date}")
     
-    # 读取指定日期的pool数据
-    # 修改路径：pool数据位于项目根目录下的full_stock_data/pool_data，而不是当前脚本目录
-    pool_file_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'full_stock_data', 'pool_data', f'pool_{target_date}.json')
+    # 从股票池存储读取指定日期的pool数据（数据库中没有时回退到pool_data下的JSON文件）
+    pool_data = PoolStore(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'full_stock_data')).load_pool(target_date)
     
-    if os.path.exists(pool_file_path):
-        with open(pool_file_path, 'r', encoding='utf-8') as f:
-            pool_data = json.load(f)
-        print(f"已加载pool数据: {pool_file_path}")
+    if pool_data:
+        print(f"已加载{target_date}的pool数据")
     else:
-        print(f"未找到{target_date}的pool数据文件: {pool_file_path}")
+        print(f"未找到{target_date}的pool数据")
         return []
     
     print(f"使用{target_date}选股模块...")
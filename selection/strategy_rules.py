@@ -0,0 +1,173 @@
+"""
+声明式选股规则
+每个策略是一组命名条件：条件由指标表达式（指标列名或 pandas 表达式）和阈值组成，
+编译一次后对整张指标表（候选股票或全市场）做向量化判断，并记录每只股票第一个未通过的条件。
+首板高开 / 首板低开 / 弱转强 的阈值统一在 STRATEGY_RULES 中维护
+"""
+
+import re
+import operator
+from typing import Dict, Iterable, List
+
+import numpy as np
+import pandas as pd
+
+# 阈值关键字 -> 比较运算
+BOUND_OPS = {
+    'min': operator.ge,   # >=
+    'max': operator.le,   # <=
+    'gt': operator.gt,    # >
+    'lt': operator.lt,    # <
+    'eq': operator.eq,    # ==
+}
+
+# 需要额外查询（非矩阵计算）才能得到的指标，先用其余条件过滤再为剩下的股票查询
+LAZY_COLUMNS = {'market_cap', 'circulating_market_cap'}
+
+# 市值条件（三个策略共用）
+MARKET_CAP_CLAUSES = [
+    {'name': '总市值>=70亿', 'expr': 'market_cap', 'min': 70},
+    {'name': '流通市值<=520亿', 'expr': 'circulating_market_cap', 'max': 520},
+]
+
+# 策略配置：candidates 为股票池中的候选类别，clauses 按顺序判断
+STRATEGY_RULES = {
+    'First Board High Open': {
+        'label': '首板高开',
+        'candidates': 'first_board_stocks',
+        'clauses': [
+            {'name': '首板', 'expr': 'is_first_board'},
+            {'name': '有前一日数据', 'expr': 'has_prev'},
+            {'name': '有竞价数据', 'expr': 'has_auction'},
+            {'name': '前一日成交额非0', 'expr': 'prev_amount', 'gt': 0},
+            {'name': '均价获利>=7%', 'expr': 'avg_price_profit', 'min': 0.07},
+            {'name': '成交额5.5亿-20亿', 'expr': 'prev_amount', 'min': 5.5e8, 'max': 20e8},
+            {'name': '竞价量比>=3%', 'expr': 'auction_volume_ratio', 'min': 0.03},
+            {'name': '竞价高开0%-6%', 'expr': 'auction_ratio', 'gt': 1.0, 'lt': 1.06},
+            {'name': '左压放量', 'expr': 'left_pressure'},
+        ] + MARKET_CAP_CLAUSES,
+    },
+    'First Board Low Open': {
+        'label': '首板低开',
+        'candidates': 'first_board_stocks',
+        'clauses': [
+            {'name': '首板', 'expr': 'is_first_board'},
+            {'name': '有前一日数据', 'expr': 'has_prev'},
+            {'name': '有竞价数据', 'expr': 'has_auction'},
+            {'name': '开盘低开3%-4.5%', 'expr': 'open_ratio', 'min': 0.955, 'max': 0.97},
+            {'name': '60日相对位置<=0.5', 'expr': 'rp', 'max': 0.5},
+            {'name': '成交额>=1亿', 'expr': 'prev_amount', 'min': 1e8},
+        ] + MARKET_CAP_CLAUSES,
+    },
+    'Weak to Strong': {
+        'label': '弱转强',
+        'candidates': 'limit_up_not_closed_stocks',
+        'clauses': [
+            {'name': '有前一日数据', 'expr': 'has_prev'},
+            {'name': '有竞价数据', 'expr': 'has_auction'},
+            {'name': '前3日涨幅<=28%', 'expr': 'increase_3d', 'max': 0.28},
+            {'name': '前一日开收跌幅>=-5%', 'expr': 'prev_open_close', 'min': -0.05},
+            {'name': '竞价为涨停价/1.1的0.98-1.09倍', 'expr': 'auction_to_limit', 'min': 0.98, 'max': 1.09},
+            {'name': '竞价量比>=3%', 'expr': 'auction_volume_ratio', 'min': 0.03},
+            {'name': '均价涨幅>=-4%', 'expr': 'avg_price_change', 'min': -0.04},
+            {'name': '成交额3亿-19亿', 'expr': 'prev_amount', 'min': 3e8, 'max': 19e8},
+            {'name': '左压放量', 'expr': 'left_pressure'},
+        ] + MARKET_CAP_CLAUSES,
+    },
+}
+
+
+class CompiledClause:
+    """编译后的单个条件：表达式 + 阈值比较"""
+
+    def __init__(self, spec: Dict):
+        self.name = spec['name']
+        self.expr = spec['expr']
+        self.bounds = [(BOUND_OPS[key], spec[key]) for key in BOUND_OPS if key in spec]
+        unknown = set(spec) - set(BOUND_OPS) - {'name', 'expr'}
+        if unknown:
+            raise ValueError(f"条件 {self.name} 中有未知的阈值: {sorted(unknown)}")
+        # 指标列名直接取列，其余按 pandas 表达式计算
+        self.is_column = self.expr.isidentifier()
+
+    @property
+    def columns(self) -> set:
+        """表达式用到的指标列（列名表达式即自身）"""
+        return set(re.findall(r'[A-Za-z_][A-Za-z0-9_]*', self.expr))
+
+    def evaluate(self, features: pd.DataFrame) -> pd.Series:
+        if self.is_column and self.expr not in features:
+            # 尚未查询的指标（如市值）视为不满足
+            return pd.Series(False, index=features.index)
+        values = features[self.expr] if self.is_column else features.eval(self.expr)
+        if not self.bounds:
+            return values.fillna(False).astype(bool)
+        mask = pd.Series(True, index=features.index)
+        with np.errstate(invalid='ignore'):
+            for op, threshold in self.bounds:
+                # NaN 与任何阈值比较都为False，即指标缺失视为不满足
+                mask &= op(values, threshold)
+        return mask
+
+
+class CompiledStrategy:
+    """编译后的策略：按顺序排列的条件"""
+
+    def __init__(self, name: str, config: Dict):
+        self.name = name
+        self.label = config.get('label', name)
+        self.candidates = config.get('candidates')
+        self.clauses = [CompiledClause(spec) for spec in config['clauses']]
+
+    @property
+    def lazy_clauses(self) -> List[str]:
+        """依赖额外查询指标（如市值）的条件"""
+        return [clause.name for clause in self.clauses if clause.columns & LAZY_COLUMNS]
+
+    def evaluate(self, features: pd.DataFrame, skip: Iterable[str] = ()) -> pd.DataFrame:
+        """
+        对指标表逐条件做向量化判断
+        :param skip: 暂不判断的条件名称（结果中视为通过）
+        :return: 以股票代码为索引、每个条件一列的布尔表
+        """
+        skip = set(skip)
+        return pd.DataFrame({
+            clause.name: (pd.Series(True, index=features.index) if clause.name in skip
+                          else clause.evaluate(features))
+            for clause in self.clauses
+        }, index=features.index)
+
+    def prefilter(self, features: pd.DataFrame) -> pd.Series:
+        """除额外查询指标以外的条件全部通过的股票"""
+        return self.evaluate(features, skip=self.lazy_clauses).all(axis=1)
+
+    def select(self, features: pd.DataFrame) -> pd.Series:
+        """全部条件通过的股票"""
+        return self.evaluate(features).all(axis=1)
+
+    @staticmethod
+    def first_failure(results: pd.DataFrame) -> pd.Series:
+        """每只股票第一个未通过的条件名称，全部通过为空字符串"""
+        failed = ~results
+        names = np.array(results.columns, dtype=object)
+        first = np.where(failed.any(axis=1), names[failed.values.argmax(axis=1)], '')
+        return pd.Series(first, index=results.index)
+
+
+def compile_strategies(rules: Dict = None) -> Dict[str, CompiledStrategy]:
+    """编译策略配置（默认 STRATEGY_RULES）"""
+    rules = STRATEGY_RULES if rules is None else rules
+    return {name: CompiledStrategy(name, config) for name, config in rules.items()}
+
+
+def explain(strategies: Dict[str, CompiledStrategy], features: pd.DataFrame) -> pd.DataFrame:
+    """
+    每只股票在各策略下是否入选及第一个未通过的条件
+    :return: 以股票代码为索引，列为 <策略>（布尔）与 <策略>_failed（条件名称）
+    """
+    table = pd.DataFrame(index=features.index)
+    for name, strategy in strategies.items():
+        results = strategy.evaluate(features)
+        table[name] = results.all(axis=1)
+        table[f"{name}_failed"] = CompiledStrategy.first_failure(results)
+    return table
@@ -9,6 +9,10 @@ import os
 sys.path.append(os.path.join(os.path.dirname(__file__), 'data_processing'))
 
 from local_data_manager import LocalDataManager
+from bar_store import _default_data_dir
+from derived_stores import refresh_derived_stores
+from eod_snapshot import EodSnapshotIngestor
+from trading_calendar import get_calendar
 import akshare as ak
 import concurrent.futures
 import time
@@ -16,17 +20,13 @@ from datetime import datetime, timedelta
 import pandas as pd
 
 def get_trade_days(end_date, count):
-    # Simple approximation
-    days = []
-    curr = end_date
-    while len(days) < count:
-        if curr.weekday() <= 4:  # 工作日（周一到周五）
-            days.append(curr)
-        curr -= timedelta(days=1)
-    return days
+    # 按交易日历取截至 end_date（含）的最近 count 个交易日，最近的在前
+    days = get_calendar().get_trade_days(end_date, count)
+    return [datetime.strptime(d, "%Y-%m-%d").date() for d in reversed(days)]
 
 def update_smart():
-    dm = LocalDataManager()
+    # Write into the same data directory the pools, selector and web app read from
+    dm = LocalDataManager(_default_data_dir())
     
     # 1. Update Stock List (Fast enough)
     print("Updating stock list...")
@@ -39,7 +39,7 @@ def update_smart():
     
     # 包含今天在内的最近交易日
     # 先检查今天是否为交易日
-    is_today_trading_day = today.weekday() < 5  # 周一到周五为交易日
+    is_today_trading_day = get_calendar().is_trading_day(today)
     
     # 获取包括今天在内的最近5个交易日
     trade_days = []
@@ -81,7 +81,15 @@ def update_smart():
 
     print(f"Found {len(target_stocks)} relevant stocks.")
     
-    # 3. Fetch Daily Data for these stocks
+    # 3. After the close, one whole-market snapshot appends today's bar for every stock;
+    #    get_daily_data below then only requests history for stocks the snapshot could not cover
+    snapshot = None
+    try:
+        snapshot = EodSnapshotIngestor(dm.data_dir, writer=dm.csv_writer).ingest()
+    except Exception as e:
+        print(f"Error ingesting close snapshot: {e}")
+
+    # 4. Fetch Daily Data for these stocks
     print("Updating daily data for target stocks...")
     
     def fetch_one(code):
@@ -100,5 +108,10 @@ def update_smart():
     success = sum(results)
     print(f"Updated {success}/{len(target_stocks)} stocks in {time.time() - start_time:.2f}s")
 
+    # 5. Rebuild the bar store / market panel / factor store from the new CSV rows, then append
+    #    the new dates to the limit status table (it reads the rebuilt panel of the same data_dir)
+    if success > 0 or snapshot:
+        refresh_derived_stores(dm.data_dir, written_since=dm.csv_writer.written_since)
+
 if __name__ == "__main__":
     update_smart()
\ No newline at end of file
@@ -8,107 +8,302 @@ import numpy as np
 from datetime import datetime, timedelta
 import os
 import sqlite3
+import sys
 import warnings
+
+# 添加data_processing目录到Python路径，以便导入交易日历
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data_processing'))
+from trading_calendar import get_calendar
+from performance_analytics import performance_summary
+
 warnings.filterwarnings('ignore')
 
+# 成交记录：日期为 1970-01-01 起的天数，证券为持仓簿中的整数编号，方向 1 买入 / -1 卖出
+TRADE_DTYPE = np.dtype([
+    ('date', np.int32),
+    ('security', np.int32),
+    ('side', np.int8),
+    ('shares', np.int64),
+    ('price', np.float64),
+    ('commission', np.float64),
+    ('cash_flow', np.float64),   # 买入为含费总成本（负），卖出为扣费后净收入（正）
+    ('profit', np.float64),      # 卖出相对持仓成本的盈亏，买入为0
+    ('entry_commission', np.float64),  # 卖出为所平仓位分摊的买入手续费（按股数比例），买入为0
+    ('entry_date', np.int32),    # 买入为当日，卖出为所平仓位的最近买入日
+    ('strategy', np.int16),      # 买入时标记的策略编号（卖出沿用持仓的标记），无标记为 -1
+])
+
+# 每日权益记录
+EQUITY_DTYPE = np.dtype([
+    ('date', np.int32),
+    ('portfolio_value', np.float64),
+    ('cash', np.float64),
+    ('positions', np.int32),
+    ('trades', np.int32),
+    ('turnover', np.float64),
+])
+
+# 预分配的初始容量，写满后按倍数扩容（均摊 O(1)）
+INITIAL_LEDGER_CAPACITY = 1024
+
+
+def _day_number(date_str) -> int:
+    """日期字符串 -> 1970-01-01 起的天数"""
+    return int(np.datetime64(str(date_str)[:10], 'D').astype(np.int64))
+
+
+def _day_strings(days: np.ndarray) -> np.ndarray:
+    """天数数组 -> YYYY-MM-DD 字符串数组"""
+    return np.datetime_as_string(np.asarray(days, dtype=np.int64).astype('datetime64[D]'), unit='D')
+
+
+class TradeLedger:
+    """列式账本：成交记录和每日权益各是一个预分配的 NumPy 结构化数组"""
+
+    def __init__(self, capacity: int = INITIAL_LEDGER_CAPACITY):
+        self._trades = np.zeros(capacity, dtype=TRADE_DTYPE)
+        self._equity = np.zeros(capacity, dtype=EQUITY_DTYPE)
+        self.n_trades = 0
+        self.n_days = 0
+
+    @staticmethod
+    def _grow(array: np.ndarray) -> np.ndarray:
+        grown = np.zeros(len(array) * 2, dtype=array.dtype)
+        grown[:len(array)] = array
+        return grown
+
+    def add_trade(self, day, security, side, shares, price, commission, cash_flow, profit, entry_commission,
+                  entry_day, strategy):
+        if self.n_trades == len(self._trades):
+            self._trades = self._grow(self._trades)
+        self._trades[self.n_trades] = (day, security, side, shares, price, commission, cash_flow, profit,
+                                       entry_commission, entry_day, strategy)
+        self.n_trades += 1
+
+    def add_day(self, day, portfolio_value, cash, positions, trades, turnover):
+        if self.n_days == len(self._equity):
+            self._equity = self._grow(self._equity)
+        self._equity[self.n_days] = (day, portfolio_value, cash, positions, trades, turnover)
+        self.n_days += 1
+
+    @property
+    def trades(self) -> np.ndarray:
+        """已记录的成交（视图，不复制）"""
+        return self._trades[:self.n_trades]
+
+    @property
+    def equity(self) -> np.ndarray:
+        """已记录的每日权益（视图，不复制）"""
+        return self._equity[:self.n_days]
+
+
+class PositionBook:
+    """持仓簿：按证券整数编号索引的持股数、持仓成本、未分摊的买入手续费、最近买入日期和策略标记数组"""
+
+    def __init__(self, capacity: int = INITIAL_LEDGER_CAPACITY):
+        self.ids = {}      # 股票代码 -> 编号
+        self.codes = []    # 编号 -> 股票代码
+        self.shares = np.zeros(capacity, dtype=np.int64)
+        self.avg_cost = np.zeros(capacity, dtype=np.float64)
+        self.entry_commission = np.zeros(capacity, dtype=np.float64)
+        self.buy_day = np.full(capacity, -1, dtype=np.int32)
+        self.strategy = np.full(capacity, -1, dtype=np.int16)
+        self.held = set()  # 当前持有的编号
+
+    def security_id(self, stock_code: str) -> int:
+        """股票代码对应的编号，首次出现时分配"""
+        security = self.ids.get(stock_code)
+        if security is None:
+            security = len(self.codes)
+            self.ids[stock_code] = security
+            self.codes.append(stock_code)
+            if security == len(self.shares):
+                size = len(self.shares) * 2
+                self.shares = np.concatenate([self.shares, np.zeros(size - len(self.shares), dtype=np.int64)])
+                self.avg_cost = np.concatenate([self.avg_cost, np.zeros(size - len(self.avg_cost))])
+                self.entry_commission = np.concatenate([self.entry_commission,
+                                                        np.zeros(size - len(self.entry_commission))])
+                self.buy_day = np.concatenate([self.buy_day, np.full(size - len(self.buy_day), -1, dtype=np.int32)])
+                self.strategy = np.concatenate([self.strategy, np.full(size - len(self.strategy), -1, dtype=np.int16)])
+        return security
+
+
 class BacktestEngine:
     """回测引擎"""
     
-    def __init__(self, initial_capital=1000000, commission_rate=0.001):
+    def __init__(self, initial_capital=1000000, commission_rate=0.001, stamp_tax_rate=0.0, min_commission=0.0):
         """
         初始化回测引擎
         :param initial_capital: 初始资金
         :param commission_rate: 手续费率
+        :param stamp_tax_rate: 印花税率（仅卖出收取）
+        :param min_commission: 单笔最低手续费
         """
         self.initial_capital = initial_capital
         self.cash = initial_capital
-        self.positions = {}  # 持仓 {stock_code: {'shares': int, 'avg_cost': float}}
+        self.book = PositionBook()  # 持仓簿
+        self.ledger = TradeLedger()  # 成交与每日权益账本
         self.commission_rate = commission_rate
-        self.trade_log = []  # 交易记录
-        self.portfolio_history = []  # 组合历史
-        self.current_date = None
+        self.stamp_tax_rate = stamp_tax_rate
+        self.min_commission = min_commission
+        self.strategy_names = []  # 策略编号 -> 名称
+        self._strategy_ids = {}
+        self._current_date = None
+        self._day = -1
+        # 当日汇总，换日时清零
+        self.day_trades = 0
+        self.day_turnover = 0.0
+
+    @property
+    def current_date(self):
+        return self._current_date
+
+    @current_date.setter
+    def current_date(self, date_str):
+        """设置当前交易日，换日时清零当日汇总"""
+        if date_str != self._current_date:
+            self._current_date = date_str
+            self._day = _day_number(date_str) if date_str is not None else -1
+            self.day_trades = 0
+            self.day_turnover = 0.0
+
+    def _strategy_id(self, strategy) -> int:
+        if strategy is None:
+            return -1
+        strategy_id = self._strategy_ids.get(strategy)
+        if strategy_id is None:
+            strategy_id = self._strategy_ids[strategy] = len(self.strategy_names)
+            self.strategy_names.append(strategy)
+        return strategy_id
+
+    def _record_trade(self, security, side, shares, price, commission, cash_flow, profit, entry_commission=0.0):
+        book = self.book
+        self.ledger.add_trade(self._day, security, side, shares, price, commission, cash_flow, profit,
+                              entry_commission, book.buy_day[security], book.strategy[security])
+        self.day_trades += 1
+        self.day_turnover += shares * price
         
-    def buy(self, stock_code, shares, price):
-        """买入股票"""
+    def buy(self, stock_code, shares, price, strategy=None):
+        """
+        买入股票
+        :param strategy: 可选的策略名称，用于按策略归因（加仓时以最后一次买入为准）
+        """
         cost = shares * price
-        commission = cost * self.commission_rate
+        commission = max(cost * self.commission_rate, self.min_commission)
         total_cost = cost + commission
         
         if self.cash >= total_cost:
             self.cash -= total_cost
-            
-            if stock_code in self.positions:
-                # 加仓：计算平均成本
-                old_shares = self.positions[stock_code]['shares']
-                old_cost = self.positions[stock_code]['avg_cost']
-                new_shares = old_shares + shares
-                new_avg_cost = (old_shares * old_cost + shares * price) / new_shares
-                self.positions[stock_code] = {'shares': new_shares, 'avg_cost': new_avg_cost}
-            else:
-                # 新建仓位
-                self.positions[stock_code] = {'shares': shares, 'avg_cost': price}
+            book = self.book
+            security = book.security_id(stock_code)
+            old_shares = book.shares[security]
+            # 加仓时按持股数加权计算平均成本
+            book.avg_cost[security] = (old_shares * book.avg_cost[security] + shares * price) / (old_shares + shares)
+            book.shares[security] = old_shares + shares
+            book.entry_commission[security] += commission
+            book.buy_day[security] = self._day
+            book.strategy[security] = self._strategy_id(strategy)
+            book.held.add(security)
             
             # 记录交易
-            self.trade_log.append({
-                'date': self.current_date,
-                'stock': stock_code,
-                'action': 'BUY',
-                'shares': shares,
-                'price': price,
-                'commission': commission,
-                'total_cost': total_cost
-            })
-            
+            self._record_trade(security, 1, shares, price, commission, -total_cost, 0.0)
             return True
         return False
     
     def sell(self, stock_code, shares, price):
         """卖出股票"""
-        if stock_code in self.positions and self.positions[stock_code]['shares'] >= shares:
+        book = self.book
+        security = book.ids.get(stock_code)
+        if security is not None and 0 < shares <= book.shares[security]:
             revenue = shares * price
-            commission = revenue * self.commission_rate
+            commission = max(revenue * self.commission_rate, self.min_commission) + revenue * self.stamp_tax_rate
             net_revenue = revenue - commission
             
             self.cash += net_revenue
+            profit = (price - book.avg_cost[security]) * shares
+            # 买入手续费按卖出股数占持股数的比例分摊到本次卖出，胜负按买卖双边费用后的盈亏判断
+            entry_commission = book.entry_commission[security] * shares / book.shares[security]
             
-            # 更新持仓
-            old_shares = self.positions[stock_code]['shares']
-            old_avg_cost = self.positions[stock_code]['avg_cost']
-            
-            if old_shares == shares:
-                # 全部卖出，清空仓位
-                del self.positions[stock_code]
-            else:
-                # 部分卖出，更新份额
-                remaining_shares = old_shares - shares
-                self.positions[stock_code]['shares'] = remaining_shares
+            # 更新持仓，全部卖出时清空仓位
+            book.shares[security] -= shares
+            book.entry_commission[security] -= entry_commission
+            if book.shares[security] == 0:
+                book.avg_cost[security] = 0.0
+                book.entry_commission[security] = 0.0
+                book.held.discard(security)
             
             # 记录交易
-            self.trade_log.append({
-                'date': self.current_date,
-                'stock': stock_code,
-                'action': 'SELL',
-                'shares': shares,
-                'price': price,
-                'commission': commission,
-                'net_revenue': net_revenue,
-                'profit': (price - old_avg_cost) * shares if 'old_avg_cost' in locals() else 0
-            })
-            
+            self._record_trade(security, -1, shares, price, commission, net_revenue, profit, entry_commission)
             return True
         return False
+
+    @property
+    def positions(self):
+        """当前持仓 {stock_code: {'shares': int, 'avg_cost': float, 'buy_date': str}}（由持仓簿生成）"""
+        book = self.book
+        held = sorted(book.held)
+        buy_dates = _day_strings(book.buy_day[held]) if held else []
+        return {
+            book.codes[security]: {
+                'shares': int(book.shares[security]),
+                'avg_cost': float(book.avg_cost[security]),
+                'buy_date': buy_date,
+            }
+            for security, buy_date in zip(held, buy_dates)
+        }
     
     def get_portfolio_value(self, current_prices):
         """获取当前组合总价值"""
         value = self.cash
-        for stock_code, pos in self.positions.items():
+        book = self.book
+        for security in book.held:
+            stock_code = book.codes[security]
             if stock_code in current_prices:
-                value += pos['shares'] * current_prices[stock_code]
+                value += book.shares[security] * current_prices[stock_code]
         return value
     
     def get_position_size(self):
         """获取当前持仓数量"""
-        return len(self.positions)
+        return len(self.book.held)
+
+    def record_day(self, portfolio_value):
+        """记录当前交易日收盘后的组合价值（当日成交笔数、成交额取自当日汇总）"""
+        self.ledger.add_day(self._day, portfolio_value, self.cash, len(self.book.held),
+                            self.day_trades, self.day_turnover)
+
+    def get_trade_frame(self) -> pd.DataFrame:
+        """导出成交记录"""
+        trades = self.ledger.trades
+        buy = trades['side'] == 1
+        codes = np.array(self.book.codes + [''], dtype=object)
+        # 编号 -1（无标记）取到末尾的空字符串
+        strategies = np.array(self.strategy_names + [''], dtype=object)
+        return pd.DataFrame({
+            'date': _day_strings(trades['date']),
+            'stock': codes[trades['security']],
+            'action': np.where(buy, 'BUY', 'SELL'),
+            'shares': trades['shares'],
+            'price': trades['price'],
+            'commission': trades['commission'],
+            'total_cost': np.where(buy, -trades['cash_flow'], np.nan),
+            'net_revenue': np.where(buy, np.nan, trades['cash_flow']),
+            'profit': trades['profit'],
+            'entry_commission': trades['entry_commission'],
+            'entry_date': _day_strings(trades['entry_date']),
+            'strategy': strategies[trades['strategy']],
+        })
+
+    def get_equity_frame(self) -> pd.DataFrame:
+        """导出每日权益"""
+        equity = self.ledger.equity
+        frame = pd.DataFrame(equity[['portfolio_value', 'cash', 'positions', 'trades', 'turnover']])
+        frame.insert(0, 'date', _day_strings(equity['date']))
+        return frame
+
+    @property
+    def trade_log(self):
+        """成交记录的字典列表（兼容旧接口，每次调用都会从账本导出）"""
+        return self.get_trade_frame().to_dict('records')
 
 
 class StrategySimulator:
@@ -168,16 +363,8 @@ class StrategySimulator:
         """运行回测"""
         print(f"开始回测: {start_date} 到 {end_date}")
         
-        start_dt = datetime.strptime(start_date, '%Y-%m-%d')
-        end_dt = datetime.strptime(end_date, '%Y-%m-%d')
-        
-        # 生成交易日列表（简化：使用连续日期）
-        current_date = start_dt
-        trade_days = []
-        while current_date <= end_dt:
-            if current_date.weekday() < 5:  # 假设周一到周五为交易日
-                trade_days.append(current_date.strftime('%Y-%m-%d'))
-            current_date += timedelta(days=1)
+        # 按交易日历生成交易日列表
+        trade_days = get_calendar().get_range(start_date, end_date)
         
         results = {
             'dates': [],
@@ -243,12 +430,13 @@ class StrategySimulator:
                     current_prices[stock_code] = daily_data[stock_code]['close']
             
             portfolio_value = self.backtest_engine.get_portfolio_value(current_prices)
+            self.backtest_engine.record_day(portfolio_value)
             
             results['dates'].append(date_str)
             results['portfolio_values'].append(portfolio_value)
             results['cash_values'].append(self.backtest_engine.cash)
             results['selected_stocks'].append(len(selected_stocks))
-            results['trade_counts'].append(len([t for t in self.backtest_engine.trade_log if t['date'] == date_str]))
+            results['trade_counts'].append(self.backtest_engine.day_trades)
             
             print(f"  组合价值: {portfolio_value:.2f}, 现金: {self.backtest_engine.cash:.2f}")
         
@@ -264,41 +452,26 @@ class StrategySimulator:
         
         initial_value = self.backtest_engine.initial_capital
         final_value = backtest_results['portfolio_values'][-1]
-        
-        total_return = (final_value - initial_value) / initial_value * 100
-        total_trades = len(self.backtest_engine.trade_log)
+        ledger = self.backtest_engine.ledger
+        summary = performance_summary(backtest_results['portfolio_values'], initial_value, ledger.trades)
         
         print(f"初始资金: {initial_value:,.2f}")
         print(f"最终价值: {final_value:,.2f}")
-        print(f"总收益率: {total_return:.2f}%")
-        print(f"总交易次数: {total_trades}")
+        print(f"总收益率: {summary['total_return'] * 100:.2f}%")
+        print(f"总交易次数: {summary['trades']}")
         print(f"最终持仓数: {self.backtest_engine.get_position_size()}")
-        
-        # 计算年化收益率（假设252个交易日）
-        if len(backtest_results['dates']) > 0:
-            days = len(backtest_results['dates'])
-            annual_return = ((final_value / initial_value) ** (252 / days) - 1) * 100
-            print(f"年化收益率: {annual_return:.2f}%")
-        
-        # 计算最大回撤
-        portfolio_values = backtest_results['portfolio_values']
-        if len(portfolio_values) > 1:
-            max_value = portfolio_values[0]
-            max_drawdown = 0
-            for value in portfolio_values:
-                if value > max_value:
-                    max_value = value
-                drawdown = (max_value - value) / max_value * 100
-                if drawdown > max_drawdown:
-                    max_drawdown = drawdown
-            print(f"最大回撤: {max_drawdown:.2f}%")
+        print(f"年化收益率: {summary['annual_return'] * 100:.2f}%")
+        print(f"最大回撤: {summary['max_drawdown'] * 100:.2f}%（最长 {summary['max_drawdown_days']} 个交易日）")
+        print(f"夏普比率: {summary['sharpe']:.2f}，索提诺比率: {summary['sortino']:.2f}，卡玛比率: {summary['calmar']:.2f}")
+        print(f"胜率: {summary['win_rate'] * 100:.2f}%，盈亏比: {summary['profit_factor']:.2f}")
         
         return {
-            'total_return': total_return,
-            'annual_return': annual_return if 'annual_return' in locals() else 0,
-            'max_drawdown': max_drawdown if 'max_drawdown' in locals() else 0,
-            'total_trades': total_trades,
-            'final_value': final_value
+            'total_return': summary['total_return'] * 100,
+            'annual_return': summary['annual_return'] * 100,
+            'max_drawdown': summary['max_drawdown'] * 100,
+            'total_trades': summary['trades'],
+            'final_value': final_value,
+            'summary': summary,
         }
 
 
@@ -0,0 +1,99 @@
+"""
+回测的日内撮合模型
+按 (股票代码, 日期) 从本地竞价缓存（auction_cache.db）读取竞价快照和1分钟K线，
+与实盘（aa.py）的下单时点一致：09:26 按竞价价买入，11:25 / 14:50 按当时的最新价判断卖出。
+买入量不超过竞价成交量的一定比例（部分成交），竞价价已在涨停价的买不进。
+数据按交易日惰性加载，换日即释放，内存只与当日涉及的股票数有关；
+缓存中没有的股票由调用方回退到日线开盘价/收盘价
+"""
+
+import os
+import sys
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data_processing'))
+from auction_cache import AuctionCache
+from auction_fetcher import MINUTE_SOURCE
+
+# 实盘卖出的检查时点
+SELL_TIMES = ('11:25', '14:50')
+
+# 单只股票最多成交竞价成交量的比例
+AUCTION_PARTICIPATION = 0.1
+
+
+class IntradayFillModel:
+    """
+    日内撮合：竞价快照决定买入价和可成交量，1分钟K线决定卖出时点的价格
+    :param cache: AuctionCache，默认 <data_dir>/auction_cache.db
+    :param fetcher: 可选的 AuctionFetcher（需带同一个缓存），缓存未命中时请求接口补齐
+    :param participation: 单只股票最多成交竞价成交量的比例
+    """
+
+    def __init__(self, data_dir=None, cache: AuctionCache = None, fetcher=None,
+                 participation: float = AUCTION_PARTICIPATION, sell_times=SELL_TIMES, lot_size: int = 100):
+        self.cache = cache or AuctionCache(data_dir)
+        self.fetcher = fetcher
+        self.participation = participation
+        self.sell_times = tuple(sell_times)
+        self.lot_size = lot_size
+
+        self.date_str = None
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def begin_day(self, date_str: str, stock_codes: List[str]):
+        """加载某个交易日需要的股票（释放前一交易日的数据）"""
+        stock_codes = list(dict.fromkeys(stock_codes))
+        self.date_str = date_str
+        self._entries = {}
+        if not stock_codes:
+            return
+        if self.fetcher is not None:
+            loaded = self.fetcher.fetch_minute_bars(stock_codes, date_str)
+        else:
+            loaded = {code: {'auction': entry['auction'], 'bars': entry['ticks'] or []}
+                      for code, entry in self.cache.get_many(stock_codes, date_str, MINUTE_SOURCE).items()}
+        for code, entry in loaded.items():
+            bars = entry['bars']
+            self._entries[code] = {
+                'auction': entry['auction'],
+                'times': [bar[0] for bar in bars],
+                'bars': bars,
+            }
+        self.hits += len(self._entries)
+        self.misses += len(stock_codes) - len(self._entries)
+
+    def auction_fill(self, stock_code: str) -> Optional[Tuple[float, int]]:
+        """
+        09:26 按竞价价买入
+        :return: (竞价价, 最多可买股数)，当日没有缓存数据返回None
+        """
+        entry = self._entries.get(stock_code)
+        if entry is None or not entry['auction'] or not entry['auction'].get('price'):
+            return None
+        auction = entry['auction']
+        max_shares = int(auction.get('volume', 0) * self.participation / self.lot_size) * self.lot_size
+        return auction['price'], max_shares
+
+    def bar_at(self, stock_code: str, time_str: str) -> Optional[List]:
+        """某时点（HH:MM）已走完的最近一根1分钟K线 [HH:MM, 开, 高, 低, 收, 成交量]，没有返回None"""
+        entry = self._entries.get(stock_code)
+        if entry is None:
+            return None
+        i = bisect_right(entry['times'], time_str)
+        return entry['bars'][i - 1] if i > 0 else None
+
+    def sell_quotes(self, stock_code: str) -> List[Tuple[float, float]]:
+        """各卖出时点的 (最新价, 该分钟最高价)，没有分钟数据的时点不返回"""
+        quotes = []
+        for time_str in self.sell_times:
+            bar = self.bar_at(stock_code, time_str)
+            if bar is not None:
+                quotes.append((bar[4], bar[2]))
+        return quotes
+
+    def stats(self) -> Dict:
+        return {'date': self.date_str, 'loaded': len(self._entries), 'hits': self.hits, 'misses': self.misses}
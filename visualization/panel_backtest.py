@@ -0,0 +1,345 @@
+"""
+基于行情面板的回测
+一次性加载 日期×股票 行情面板、涨跌停状态和因子库，把所有日期的候选股票一次算出选股指标，
+用 strategy_rules 中编译好的策略条件一次得到全部日期的买入信号矩阵；
+之后只按日期循环模拟成交（开盘买入、T+1 后按实盘止盈/止损规则在收盘卖出、整手、手续费和印花税、
+涨停开盘买不进、一字跌停卖不出），不再逐日逐只股票读取日线。
+传入 IntradayFillModel 时改为按缓存的竞价快照买入、按 11:25 / 14:50 的分钟价格卖出
+"""
+
+import os
+import sys
+import time
+from bisect import bisect_left, bisect_right
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+_project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(_project_root, 'data_processing'))
+sys.path.insert(0, os.path.join(_project_root, 'selection'))
+from bar_store import BarStore, _default_data_dir
+from market_panel import MarketPanel
+from factor_store import FactorStore
+from limit_status import PRICE_TOLERANCE, compute_limit_masks, get_limit_ratios, load_st_codes
+from candidate_evaluator import CandidateEvaluator
+from strategy_rules import compile_strategies
+from backtest_engine import BacktestEngine, StrategySimulator
+from performance_analytics import analyze_engine, print_report
+
+# 每手股数
+LOT_SIZE = 100
+
+# 印花税率（卖出收取）与单笔最低佣金
+STAMP_TAX_RATE = 0.0005
+MIN_COMMISSION = 5.0
+
+# 行情面板上无法还原的条件：历史竞价成交量（竞价价用当日开盘价近似），市值条件另按 lazy_clauses 跳过
+PANEL_SKIP_CLAUSES = ['竞价量比>=3%']
+
+
+class PanelStrategySimulator(StrategySimulator):
+    """
+    面板回测：信号按矩阵一次生成，逐日循环只做撮合和记账
+    与实盘（aa.py）一致：09:26 按开盘价等额买入当日全部入选股票，
+    持仓次日起收盘价低于涨停价且高于成本时止盈、跌破5日线时止损
+    """
+
+    def __init__(self, data_dir=None, initial_capital=1000000, commission_rate=0.001,
+                 stamp_tax_rate=STAMP_TAX_RATE, min_commission=MIN_COMMISSION, lot_size=LOT_SIZE,
+                 strategies=None, skip_clauses=None, verbose=True, fill_model=None):
+        """
+        :param strategies: 编译好的策略（默认 compile_strategies()）
+        :param fill_model: 可选的 IntradayFillModel，有缓存数据的股票按竞价/分钟价格撮合
+        :param skip_clauses: 回测中不判断的条件名称（默认 PANEL_SKIP_CLAUSES）
+        :param verbose: 是否打印加载和回测进度（参数扫描时关闭）
+        """
+        super().__init__(data_manager=None)
+        if data_dir is None:
+            data_dir = _default_data_dir()
+        self.data_dir = data_dir
+        self.engine_params = {
+            'initial_capital': initial_capital,
+            'commission_rate': commission_rate,
+            'stamp_tax_rate': stamp_tax_rate,
+            'min_commission': min_commission,
+        }
+        self.backtest_engine = BacktestEngine(**self.engine_params)
+        self.lot_size = lot_size
+
+        self.bar_store = BarStore(data_dir)
+        self.market_panel = MarketPanel(data_dir)
+        self.factor_store = FactorStore(data_dir)
+        self.evaluator = CandidateEvaluator(self.bar_store, self.factor_store)
+        self.strategies = strategies or compile_strategies()
+        self.skip_clauses = PANEL_SKIP_CLAUSES if skip_clauses is None else skip_clauses
+        self.verbose = verbose
+        self.fill_model = fill_model
+
+        self._data = None
+        self._candidates = None
+        self.signals = None
+
+    def _log(self, message: str):
+        if self.verbose:
+            print(message)
+
+    # ------------------------------------------------------------------ 加载
+
+    def load(self) -> Dict:
+        """一次性加载回测需要的全部矩阵（只在首次调用时执行）"""
+        if self._data is not None:
+            return self._data
+        if not self.market_panel.ensure_built():
+            raise RuntimeError("行情面板不可用，请先运行 python bar_store.py 生成列式存储")
+        if not self.factor_store.is_fresh():
+            self.factor_store.update()
+
+        start_time = time.time()
+        panel = self.market_panel
+        dates = panel.get_date_strs()
+        codes = panel.get_codes()
+        close = np.asarray(panel.field('close'), dtype=np.float64)
+        high = np.asarray(panel.field('high'), dtype=np.float64)
+        masks = compute_limit_masks(close, high, panel.field('pct_change'),
+                                    get_limit_ratios(codes, load_st_codes(os.path.join(self.data_dir, 'stock_data.db'))))
+
+        # 每个 (日期, 股票) 在列式存储中的行号（无数据为 -1），前一交易日行号为此前最近一根K线
+        bar_codes, offsets, columns = self.bar_store.get_columns()
+        row_days = np.asarray(columns['date'])
+        panel_days = np.load(os.path.join(panel.panel_dir, "dates.npy"))
+        rows = np.full(panel.shape, -1, dtype=np.int64)
+        rows[np.searchsorted(panel_days, row_days), np.repeat(np.arange(len(bar_codes)), np.diff(offsets))] = \
+            np.arange(len(row_days))
+        prev_rows = np.full_like(rows, -1)
+        prev_rows[1:] = np.maximum.accumulate(rows, axis=0)[:-1]
+
+        self._data = {
+            'dates': dates,
+            'codes': np.array(codes),
+            'code_index': {code: i for i, code in enumerate(codes)},
+            'open': np.asarray(panel.field('open'), dtype=np.float64),
+            'high': high,
+            'low': np.asarray(panel.field('low'), dtype=np.float64),
+            'close': close,
+            'prev_close': masks['prev_close'],
+            'limit_up_price': masks['limit_up_price'],
+            'limit_down_price': masks['limit_down_price'],
+            'sealed': masks['sealed'],
+            'broken': masks['broken'],
+            'board_count': masks['board_count'],
+            'rows': rows,
+            'prev_rows': prev_rows,
+            'starts': offsets[:-1],
+            'columns': columns,
+            'ma5': self.factor_store.factor('ma5'),
+        }
+        self._log(f"回测数据加载完成，耗时: {time.time() - start_time:.2f}秒，"
+                  f"{len(dates)} 个交易日 × {len(codes)} 只股票")
+        return self._data
+
+    # ------------------------------------------------------------------ 信号
+
+    def _candidate_masks(self) -> Dict[str, np.ndarray]:
+        """各股票池类别在所有日期上的候选掩码（与 StockPoolGenerator 的定义一致）"""
+        data = self.load()
+        sealed = data['sealed']
+        first_board = np.zeros_like(sealed)
+        # 昨日涨停封板且前日未封板
+        first_board[2:] = sealed[1:-1] & ~sealed[:-2]
+        first_board[1] = sealed[0]
+        # 昨日炸板
+        not_closed = np.zeros_like(sealed)
+        not_closed[1:] = data['broken'][:-1]
+        return {'first_board_stocks': first_board, 'limit_up_not_closed_stocks': not_closed}
+
+    def candidate_features(self) -> Dict[str, Dict]:
+        """
+        所有日期全部候选股票的选股指标（与策略阈值无关，只计算一次）
+        :return: {股票池类别: {'date_idx': 日期行号, 'code_idx': 股票列号, 'features': 指标表}}
+        """
+        if self._candidates is not None:
+            return self._candidates
+        data = self.load()
+        pool_keys = {strategy.candidates for strategy in self.strategies.values()}
+        candidates = {}
+        for pool_key, mask in self._candidate_masks().items():
+            if pool_key not in pool_keys:
+                continue
+            date_idx, code_idx = np.nonzero(mask)
+            features = self.evaluator.features_at_rows(
+                data['codes'][code_idx].tolist(), data['columns'], data['starts'][code_idx],
+                data['prev_rows'][date_idx, code_idx], data['rows'][date_idx, code_idx], True)
+            # 历史竞价数据按当日开盘价近似
+            features = self.evaluator.add_auction(features, {})
+            features['is_first_board'] = data['board_count'][date_idx - 1, code_idx] == 1
+            candidates[pool_key] = {'date_idx': date_idx, 'code_idx': code_idx, 'features': features}
+        self._candidates = candidates
+        return candidates
+
+    def generate_signals(self, strategies=None) -> Dict[str, np.ndarray]:
+        """
+        一次生成全部日期的买入信号
+        :param strategies: 编译好的策略，默认使用构造时的策略
+        :return: {策略名称: (交易日数, 股票数) 的布尔矩阵}
+        """
+        strategies = strategies or self.strategies
+        data = self.load()
+        candidates = self.candidate_features()
+        start_time = time.time()
+        shape = data['rows'].shape
+        signals = {}
+        for strategy in strategies.values():
+            pool = candidates.get(strategy.candidates)
+            if pool is None:
+                continue
+            passed = strategy.evaluate(pool['features'], skip=strategy.lazy_clauses + self.skip_clauses).all(axis=1)
+            passed = passed.to_numpy()
+            matrix = np.zeros(shape, dtype=bool)
+            matrix[pool['date_idx'][passed], pool['code_idx'][passed]] = True
+            signals[strategy.name] = matrix
+        self.signals = signals
+        self._log(f"信号生成完成，耗时: {time.time() - start_time:.2f}秒，"
+                  + "，".join(f"{strategies[name].label} {int(m.sum())} 次" for name, m in signals.items()))
+        return signals
+
+    def select_stocks_for_date(self, date_str):
+        """指定日期任一策略入选的股票"""
+        data = self.load()
+        signals = self.signals if self.signals is not None else self.generate_signals()
+        if date_str not in data['dates']:
+            return []
+        i = data['dates'].index(date_str)
+        selected = np.zeros(len(data['codes']), dtype=bool)
+        for matrix in signals.values():
+            selected |= matrix[i]
+        return data['codes'][selected].tolist()
+
+    # ------------------------------------------------------------------ 撮合
+
+    def run_backtest(self, start_date, end_date):
+        """运行回测：只按日期循环，每日先开盘买入再收盘卖出"""
+        data = self.load()
+        signals = self.signals if self.signals is not None else self.generate_signals()
+        self._log(f"开始回测: {start_date} 到 {end_date}")
+        start_time = time.time()
+
+        engine = self.backtest_engine = BacktestEngine(**self.engine_params)
+        codes = data['codes']
+        code_index = data['code_index']
+        lot = self.lot_size
+        # 每个 (日期, 股票) 归属的策略编号，同时入选多个策略时按策略配置的顺序取第一个（与选股结果一致）
+        strategy_names = list(signals)
+        buy_strategy = np.full(data['rows'].shape, -1, dtype=np.int8)
+        for k in range(len(strategy_names) - 1, -1, -1):
+            buy_strategy[signals[strategy_names[k]]] = k
+
+        results = {
+            'dates': [],
+            'portfolio_values': [],
+            'cash_values': [],
+            'selected_stocks': [],
+            'trade_counts': []
+        }
+        # 日期升序，只遍历回测区间内的行（滚动窗口回测时每个窗口只模拟自己的区间）
+        first, last = bisect_left(data['dates'], start_date), bisect_right(data['dates'], end_date)
+        for i in range(first, last):
+            date_str = data['dates'][i]
+            engine.current_date = date_str
+            open_, close = data['open'][i], data['close'][i]
+
+            selected = np.flatnonzero(buy_strategy[i] >= 0)
+            book = engine.book
+            fill_model = self.fill_model
+            if fill_model is not None:
+                fill_model.begin_day(date_str, [codes[j] for j in selected] + [book.codes[k] for k in book.held])
+
+            # 09:26 等额买入：按竞价价（无缓存时按开盘价），竞价即涨停（排队买不进）或停牌的跳过
+            if len(selected):
+                value = engine.cash / len(selected)
+                for j in selected:
+                    price, max_shares = open_[j], None
+                    fill = fill_model.auction_fill(codes[j]) if fill_model is not None else None
+                    if fill is not None:
+                        price, max_shares = fill
+                    if np.isnan(price) or price <= 0 or price >= data['limit_up_price'][i, j] - PRICE_TOLERANCE:
+                        continue
+                    shares = int(value / (price * (1 + engine.commission_rate)) / lot) * lot
+                    if max_shares is not None:
+                        shares = min(shares, max_shares)
+                    if shares >= lot:
+                        engine.buy(codes[j], shares, price, strategy_names[buy_strategy[i, j]])
+
+            # 卖出（T+1）：低于涨停价且盈利止盈，跌破5日线（含当前价）止损；停牌或跌停封死卖不出
+            # 有分钟数据时依次检查 11:25 / 14:50 的价格，否则按收盘价检查
+            for security in list(book.held):
+                if book.buy_day[security] == engine._day:
+                    continue
+                stock_code = book.codes[security]
+                j = code_index[stock_code]
+                if np.isnan(close[j]):
+                    continue
+                quotes = fill_model.sell_quotes(stock_code) if fill_model is not None else []
+                if not quotes:
+                    quotes = [(close[j], data['high'][i, j])]
+                # 前4日收盘价之和，5日线 = (前4日收盘价之和 + 当前价) / 5
+                prev_4_sum = data['ma5'][data['rows'][i, j]] * 5 - close[j]
+                for price, high in quotes:
+                    if high <= data['limit_down_price'][i, j] + PRICE_TOLERANCE:
+                        continue
+                    take_profit = (price < data['limit_up_price'][i, j] - PRICE_TOLERANCE
+                                   and price > book.avg_cost[security])
+                    if take_profit or price < (prev_4_sum + price) / 5:
+                        engine.sell(stock_code, int(book.shares[security]), price)
+                        break
+
+            # 停牌股票按最近收盘价估值
+            portfolio_value = engine.cash
+            for security in book.held:
+                j = code_index[book.codes[security]]
+                price = close[j] if not np.isnan(close[j]) else data['prev_close'][i, j]
+                portfolio_value += book.shares[security] * price
+            engine.record_day(portfolio_value)
+
+            results['dates'].append(date_str)
+            results['portfolio_values'].append(portfolio_value)
+            results['cash_values'].append(engine.cash)
+            results['selected_stocks'].append(len(selected))
+            results['trade_counts'].append(engine.day_trades)
+
+        self._log(f"回测完成，{len(results['dates'])} 个交易日，{engine.ledger.n_trades} 笔交易，"
+                  f"耗时: {time.time() - start_time:.2f}秒")
+        return results
+
+    def get_trade_log(self) -> pd.DataFrame:
+        """最近一次回测的成交记录"""
+        return self.backtest_engine.get_trade_frame()
+
+    def get_equity_curve(self) -> pd.DataFrame:
+        """最近一次回测的每日权益"""
+        return self.backtest_engine.get_equity_frame()
+
+
+def main():
+    """命令行：python panel_backtest.py [开始日期] [结束日期] [数据目录] [--intraday]"""
+    intraday = '--intraday' in sys.argv
+    args = [arg for arg in sys.argv[1:] if arg != '--intraday']
+    start_date = args[0] if len(args) > 0 else "2025-01-01"
+    end_date = args[1] if len(args) > 1 else "2025-12-31"
+    data_dir = args[2] if len(args) > 2 else None
+
+    start_time = time.time()
+    fill_model = None
+    if intraday:
+        from fill_model import IntradayFillModel
+        fill_model = IntradayFillModel(data_dir)
+    simulator = PanelStrategySimulator(data_dir, fill_model=fill_model)
+    results = simulator.run_backtest(start_date, end_date)
+    simulator.analyze_results(results)
+    print_report(analyze_engine(simulator.backtest_engine))
+    print(f"总耗时: {time.time() - start_time:.2f}秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""
+策略参数扫描
+在面板回测之上批量回测多组策略阈值（成交额区间、开盘比例区间等），输出收益、回撤、夏普和交易次数的结果表。
+与阈值无关的部分（行情矩阵、涨跌停价、全部候选股票的选股指标）只在主进程计算一次，
+放入共享内存后由各工作进程直接映射，每个进程只需按自己的阈值重新判断条件并模拟撮合
+"""
+
+import os
+import sys
+import copy
+import time
+import random
+import itertools
+from datetime import datetime
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+_project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(_project_root, 'data_processing'))
+sys.path.insert(0, os.path.join(_project_root, 'selection'))
+from bar_store import _default_data_dir
+from strategy_rules import STRATEGY_RULES, BOUND_OPS, compile_strategies
+from panel_backtest import PanelStrategySimulator
+from performance_analytics import performance_summary
+
+# 参数名格式：<策略名>/<条件名>/<阈值关键字>，如 "First Board High Open/成交额5.5亿-20亿/min"
+PARAM_SEPARATOR = '/'
+
+# 工作进程需要的行情矩阵（回测撮合只用到这些字段）
+SHARED_FIELDS = ['open', 'high', 'close', 'prev_close', 'limit_up_price', 'limit_down_price', 'rows', 'ma5']
+
+
+def apply_params(config: Dict, rules: Dict = None) -> Dict:
+    """
+    把一组参数写入策略配置的副本
+    :param config: {参数名: 阈值}
+    :param rules: 基准策略配置（默认 STRATEGY_RULES）
+    """
+    rules = copy.deepcopy(STRATEGY_RULES if rules is None else rules)
+    for name, value in config.items():
+        parts = name.split(PARAM_SEPARATOR)
+        if len(parts) != 3:
+            raise ValueError(f"参数名应为 <策略名>/<条件名>/<阈值关键字>: {name}")
+        strategy_name, clause_name, bound = parts
+        if strategy_name not in rules:
+            raise ValueError(f"未知的策略: {strategy_name}")
+        if bound not in BOUND_OPS:
+            raise ValueError(f"未知的阈值关键字: {bound}")
+        clauses = [clause for clause in rules[strategy_name]['clauses'] if clause['name'] == clause_name]
+        if not clauses:
+            raise ValueError(f"策略 {strategy_name} 中没有条件: {clause_name}")
+        clauses[0][bound] = value
+    return rules
+
+
+def grid_configs(space: Dict[str, List]) -> List[Dict]:
+    """网格搜索：{参数名: 候选值列表} 的全部组合"""
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+
+def random_configs(space: Dict, n_samples: int, seed: int = 0) -> List[Dict]:
+    """
+    随机搜索
+    :param space: {参数名: 候选值列表（随机取一个） 或 (下限, 上限)（均匀分布）}
+    """
+    rng = random.Random(seed)
+    configs = []
+    for _ in range(n_samples):
+        config = {}
+        for name, values in space.items():
+            if isinstance(values, tuple):
+                config[name] = rng.uniform(*values)
+            else:
+                config[name] = rng.choice(list(values))
+        configs.append(config)
+    return configs
+
+
+# ---------------------------------------------------------------------- 共享内存
+
+def _share_arrays(arrays: Dict[str, np.ndarray]) -> Tuple[List, Dict]:
+    """把数组复制到共享内存，返回共享内存对象（由调用方释放）和供子进程映射的描述"""
+    blocks = []
+    spec = {}
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+        blocks.append(block)
+        spec[name] = (block.name, array.shape, array.dtype.str)
+    return blocks, spec
+
+
+def _attach_arrays(spec: Dict) -> Tuple[List, Dict[str, np.ndarray]]:
+    """在子进程中映射共享内存（只读使用，不复制）"""
+    blocks = []
+    arrays = {}
+    for name, (block_name, shape, dtype) in spec.items():
+        # 子进程与主进程共用同一个资源跟踪器，共享内存由主进程统一释放
+        block = shared_memory.SharedMemory(name=block_name)
+        blocks.append(block)
+        arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+    return blocks, arrays
+
+
+# 工作进程内的回测器和共享内存引用
+_worker_state = {}
+
+
+def _init_worker(data_dir, simulator_params, objects, data_spec, candidate_specs):
+    """工作进程初始化：映射共享内存，组装一个不需要再加载数据的回测器"""
+    blocks, data = _attach_arrays(data_spec)
+    data.update(objects)
+    candidates = {}
+    for pool_key, (spec, index) in candidate_specs.items():
+        pool_blocks, arrays = _attach_arrays(spec)
+        blocks.extend(pool_blocks)
+        features = pd.DataFrame({name: arrays[name] for name in arrays if name not in ('date_idx', 'code_idx')},
+                                index=index, copy=False)
+        candidates[pool_key] = {'date_idx': arrays['date_idx'], 'code_idx': arrays['code_idx'], 'features': features}
+
+    simulator = PanelStrategySimulator(data_dir, verbose=False, **simulator_params)
+    simulator._data = data
+    simulator._candidates = candidates
+    _worker_state['blocks'] = blocks
+    _worker_state['simulator'] = simulator
+
+
+def _run_config(task):
+    """在工作进程中回测一组参数"""
+    config, start_date, end_date = task
+    return _backtest_config(_worker_state['simulator'], config, start_date, end_date)
+
+
+def _backtest_config(simulator: PanelStrategySimulator, config: Dict, start_date: str, end_date: str) -> Dict:
+    strategies = compile_strategies(apply_params(config))
+    simulator.generate_signals(strategies)
+    results = simulator.run_backtest(start_date, end_date)
+    ledger = simulator.backtest_engine.ledger
+    row = dict(config)
+    row.update(performance_summary(results['portfolio_values'], simulator.engine_params['initial_capital'],
+                                   ledger.trades))
+    return row
+
+
+class ParameterSweep:
+    """参数扫描：主进程准备共享数据，工作进程并行回测各组参数"""
+
+    def __init__(self, start_date: str, end_date: str, data_dir=None, max_workers: int = None, **simulator_params):
+        """
+        :param max_workers: 工作进程数，默认 CPU 核数
+        :param simulator_params: 传给 PanelStrategySimulator 的资金、费率等参数
+        """
+        if data_dir is None:
+            data_dir = _default_data_dir()
+        self.data_dir = data_dir
+        self.start_date = start_date
+        self.end_date = end_date
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.simulator_params = simulator_params
+        self.simulator = PanelStrategySimulator(data_dir, **simulator_params)
+
+    def run(self, configs: List[Dict]) -> pd.DataFrame:
+        """
+        回测全部参数组合
+        :return: 每组参数一行，包含参数和 performance_summary 的各项指标（收益、回撤、夏普、胜率、交易次数等），按夏普降序
+        """
+        for config in configs:
+            apply_params(config)  # 先在主进程校验参数名
+        print(f"开始参数扫描: {len(configs)} 组参数，{self.start_date} 到 {self.end_date}")
+        start_time = time.time()
+
+        data = self.simulator.load()
+        candidates = self.simulator.candidate_features()
+        tasks = [(config, self.start_date, self.end_date) for config in configs]
+
+        n_workers = min(self.max_workers, len(configs))
+        if n_workers > 1:
+            blocks, data_spec = _share_arrays({name: data[name] for name in SHARED_FIELDS})
+            candidate_specs = {}
+            try:
+                for pool_key, pool in candidates.items():
+                    arrays = {name: pool['features'][name].to_numpy() for name in pool['features'].columns}
+                    arrays['date_idx'] = pool['date_idx']
+                    arrays['code_idx'] = pool['code_idx']
+                    pool_blocks, spec = _share_arrays(arrays)
+                    blocks.extend(pool_blocks)
+                    candidate_specs[pool_key] = (spec, pool['features'].index)
+                objects = {name: data[name] for name in ('dates', 'codes', 'code_index')}
+                with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                                         initargs=(self.data_dir, self.simulator_params, objects,
+                                                   data_spec, candidate_specs)) as executor:
+                    rows = list(executor.map(_run_config, tasks,
+                                             chunksize=max(1, len(tasks) // (n_workers * 4))))
+            finally:
+                for block in blocks:
+                    block.close()
+                    block.unlink()
+        else:
+            self.simulator.verbose = False
+            rows = [_backtest_config(self.simulator, *task) for task in tasks]
+            self.simulator.verbose = True
+
+        table = pd.DataFrame(rows).sort_values('sharpe', ascending=False).reset_index(drop=True)
+        print(f"参数扫描完成，{n_workers} 个进程，耗时: {time.time() - start_time:.2f}秒")
+        return table
+
+    def grid(self, space: Dict[str, List]) -> pd.DataFrame:
+        """网格搜索"""
+        return self.run(grid_configs(space))
+
+    def random(self, space: Dict, n_samples: int, seed: int = 0) -> pd.DataFrame:
+        """随机搜索"""
+        return self.run(random_configs(space, n_samples, seed))
+
+    def save(self, table: pd.DataFrame, path: str = None) -> str:
+        """保存结果表（默认 full_stock_data/sweep_results/sweep_<时间>.csv）"""
+        if path is None:
+            result_dir = os.path.join(self.data_dir, "sweep_results")
+            os.makedirs(result_dir, exist_ok=True)
+            path = os.path.join(result_dir, f"sweep_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+        table.to_csv(path, index=False, encoding='utf-8-sig')
+        print(f"扫描结果已保存: {path}")
+        return path
+
+
+# 默认扫描空间：首板高开/弱转强的成交额区间、首板低开的开盘比例区间
+DEFAULT_SPACE = {
+    'First Board High Open/成交额5.5亿-20亿/min': [4e8, 5.5e8, 7e8],
+    'First Board High Open/成交额5.5亿-20亿/max': [15e8, 20e8, 25e8],
+    'First Board Low Open/开盘低开3%-4.5%/min': [0.95, 0.955, 0.96],
+    'First Board Low Open/开盘低开3%-4.5%/max': [0.97, 0.98],
+    'Weak to Strong/成交额3亿-19亿/min': [2e8, 3e8, 4e8],
+}
+
+
+def main():
+    """命令行：python parameter_sweep.py [开始日期] [结束日期] [random 组数]"""
+    args = sys.argv[1:]
+    start_date = args[0] if len(args) > 0 else "2025-01-01"
+    end_date = args[1] if len(args) > 1 else "2025-12-31"
+
+    sweep = ParameterSweep(start_date, end_date)
+    if len(args) > 3 and args[2] == 'random':
+        table = sweep.random(DEFAULT_SPACE, int(args[3]))
+    else:
+        table = sweep.grid(DEFAULT_SPACE)
+    print(table.head(10).to_string())
+    sweep.save(table)
+
+
+if __name__ == "__main__":
+    main()
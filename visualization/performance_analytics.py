@@ -0,0 +1,214 @@
+"""
+回测绩效分析
+输入为回测账本导出的数组：每日组合价值（权益曲线）和成交记录（backtest_engine.TRADE_DTYPE 结构化数组），
+回撤、收益风险比、胜率、盈亏比、按策略归因、持仓周期分布、月度收益都由 NumPy 累积运算一次算出，
+没有逐日或逐笔的 Python 循环，可以在参数扫描中对大量回测结果直接调用
+"""
+
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+# 年化使用的交易日数
+TRADING_DAYS_PER_YEAR = 252
+
+# 卖出方向（与 backtest_engine.TRADE_DTYPE 的 side 一致）
+SELL_SIDE = -1
+
+
+def equity_curve(values: np.ndarray, initial_capital: float) -> np.ndarray:
+    """在每日组合价值前补上初始资金，作为计算收益和回撤的权益曲线"""
+    return np.concatenate([[float(initial_capital)], np.asarray(values, dtype=np.float64)])
+
+
+def daily_returns(equity: np.ndarray) -> np.ndarray:
+    """权益曲线的逐日收益率"""
+    equity = np.asarray(equity, dtype=np.float64)
+    return equity[1:] / equity[:-1] - 1
+
+
+def drawdown_series(equity: np.ndarray) -> np.ndarray:
+    """每日回撤（相对历史最高权益的跌幅，非负）"""
+    equity = np.asarray(equity, dtype=np.float64)
+    return 1 - equity / np.maximum.accumulate(equity)
+
+
+def max_drawdown_duration(drawdown: np.ndarray) -> int:
+    """最长的回撤持续天数（从创新高到再次创新高）"""
+    in_drawdown = drawdown > 0
+    if not in_drawdown.any():
+        return 0
+    idx = np.arange(len(drawdown))
+    # 每个位置之前最近一次处于高点的行号
+    last_peak = np.maximum.accumulate(np.where(in_drawdown, -1, idx))
+    return int((idx - last_peak)[in_drawdown].max())
+
+
+def trade_statistics(trades: np.ndarray) -> Dict:
+    """按卖出成交统计胜率、盈亏比、平均盈亏（盈亏扣除卖出手续费和所平仓位分摊的买入手续费）"""
+    sells = trades[trades['side'] == SELL_SIDE]
+    profit = sells['profit'] - sells['commission'] - sells['entry_commission']
+    wins = profit > 0
+    gross_profit = profit[wins].sum()
+    gross_loss = -profit[~wins].sum()
+    return {
+        'trades': int(len(trades)),
+        'closed_trades': int(len(sells)),
+        'win_rate': float(wins.mean()) if len(sells) else 0.0,
+        'profit_factor': float(gross_profit / gross_loss) if gross_loss > 0 else (np.inf if gross_profit > 0 else 0.0),
+        'avg_win': float(profit[wins].mean()) if wins.any() else 0.0,
+        'avg_loss': float(profit[~wins].mean()) if (~wins).any() else 0.0,
+        'commission': float(trades['commission'].sum()),
+    }
+
+
+def performance_summary(values: np.ndarray, initial_capital: float, trades: np.ndarray = None,
+                        periods_per_year: int = TRADING_DAYS_PER_YEAR) -> Dict:
+    """
+    绩效汇总
+    :param values: 每日组合价值
+    :param trades: 可选的成交记录，提供时一并统计胜率、盈亏比
+    :return: 收益率均为小数（0.1 即 10%）
+    """
+    values = np.asarray(values, dtype=np.float64)
+    summary = {
+        'total_return': 0.0, 'annual_return': 0.0, 'volatility': 0.0, 'max_drawdown': 0.0,
+        'max_drawdown_days': 0, 'sharpe': 0.0, 'sortino': 0.0, 'calmar': 0.0,
+    }
+    if len(values):
+        equity = equity_curve(values, initial_capital)
+        returns = daily_returns(equity)
+        drawdown = drawdown_series(equity)
+        total_return = values[-1] / initial_capital - 1
+        annual_return = (values[-1] / initial_capital) ** (periods_per_year / len(values)) - 1
+        std = returns.std(ddof=1) if len(returns) > 1 else 0.0
+        # 下行波动：只计负收益（正收益按0计）的均方根
+        downside = np.sqrt(np.mean(np.minimum(returns, 0) ** 2))
+        max_drawdown = drawdown.max()
+        summary.update({
+            'total_return': float(total_return),
+            'annual_return': float(annual_return),
+            'volatility': float(std * np.sqrt(periods_per_year)),
+            'max_drawdown': float(max_drawdown),
+            'max_drawdown_days': max_drawdown_duration(drawdown),
+            'sharpe': float(returns.mean() / std * np.sqrt(periods_per_year)) if std > 0 else 0.0,
+            'sortino': float(returns.mean() / downside * np.sqrt(periods_per_year)) if downside > 0 else 0.0,
+            'calmar': float(annual_return / max_drawdown) if max_drawdown > 0 else 0.0,
+        })
+    if trades is not None:
+        summary.update(trade_statistics(trades))
+    return summary
+
+
+def strategy_attribution(trades: np.ndarray, strategy_names: List[str]) -> pd.DataFrame:
+    """
+    按策略归因（以卖出成交结算已实现盈亏，买卖手续费都计入对应策略；
+    胜负和盈亏比按扣除买卖双边手续费后的平仓盈亏判断，未平仓部分的买入手续费只计入净盈亏）
+    :param strategy_names: 策略编号 -> 名称（BacktestEngine.strategy_names）
+    :return: 每个策略一行：买入次数、平仓次数、胜率、已实现盈亏、手续费、扣费后净盈亏、盈亏比
+    """
+    n = len(strategy_names) + 1
+    # 无标记（-1）放在最后一行
+    ids = np.where(trades['strategy'] >= 0, trades['strategy'], n - 1)
+    sell = trades['side'] == SELL_SIDE
+    net = np.where(sell, trades['profit'] - trades['commission'] - trades['entry_commission'], 0.0)
+    win = sell & (net > 0)
+
+    buys = np.bincount(ids[~sell], minlength=n)
+    closed = np.bincount(ids[sell], minlength=n)
+    wins = np.bincount(ids[win], minlength=n)
+    gross_profit = np.bincount(ids[win], weights=net[win], minlength=n)
+    gross_loss = -np.bincount(ids[sell & ~win], weights=net[sell & ~win], minlength=n)
+    realized = np.bincount(ids[sell], weights=trades['profit'][sell], minlength=n)
+    commission = np.bincount(ids, weights=trades['commission'], minlength=n)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        table = pd.DataFrame({
+            'buys': buys,
+            'closed_trades': closed,
+            'win_rate': np.where(closed > 0, wins / np.maximum(closed, 1), 0.0),
+            'realized_profit': realized,
+            'commission': commission,
+            'net_profit': realized - commission,
+            'profit_factor': np.where(gross_loss > 0, gross_profit / gross_loss, np.where(gross_profit > 0, np.inf, 0.0)),
+        }, index=pd.Index(list(strategy_names) + [''], name='strategy'))
+    return table[(table['buys'] > 0) | (table['closed_trades'] > 0)]
+
+
+def holding_periods(trades: np.ndarray, dates: np.ndarray) -> np.ndarray:
+    """
+    每笔卖出的持仓交易日数
+    :param dates: 回测的全部交易日（1970-01-01 起的天数，升序，如账本中权益记录的 date 列）
+    """
+    sells = trades[trades['side'] == SELL_SIDE]
+    dates = np.asarray(dates)
+    return np.searchsorted(dates, sells['date']) - np.searchsorted(dates, sells['entry_date'])
+
+
+def holding_distribution(periods: np.ndarray) -> pd.Series:
+    """持仓交易日数的分布（天数 -> 笔数）"""
+    periods = np.asarray(periods, dtype=np.int64)
+    if not len(periods):
+        return pd.Series(dtype=np.int64, name='trades')
+    counts = np.bincount(periods)
+    days = np.flatnonzero(counts)
+    return pd.Series(counts[days], index=pd.Index(days, name='holding_days'), name='trades')
+
+
+def monthly_returns(dates: np.ndarray, values: np.ndarray, initial_capital: float) -> pd.DataFrame:
+    """
+    月度收益表（年 × 月）
+    :param dates: 每日组合价值对应的日期（1970-01-01 起的天数，升序）
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if not len(values):
+        return pd.DataFrame()
+    months = np.asarray(dates, dtype=np.int64).astype('datetime64[D]').astype('datetime64[M]')
+    # 每个月最后一个交易日的权益
+    month_keys, last_idx = np.unique(months[::-1], return_index=True)
+    month_end = values[len(values) - 1 - last_idx]
+    prev_end = np.concatenate([[float(initial_capital)], month_end[:-1]])
+    month_index = pd.DatetimeIndex(month_keys)
+    table = pd.Series(month_end / prev_end - 1, index=month_index).to_frame('return')
+    table['year'] = month_index.year
+    table['month'] = month_index.month
+    return table.pivot(index='year', columns='month', values='return')
+
+
+def analyze_engine(engine, periods_per_year: int = TRADING_DAYS_PER_YEAR) -> Dict:
+    """
+    对 BacktestEngine 的账本做完整分析
+    :return: {'summary', 'drawdown', 'attribution', 'holding_distribution', 'monthly_returns'}
+    """
+    equity = engine.ledger.equity
+    trades = engine.ledger.trades
+    values = equity['portfolio_value']
+    return {
+        'summary': performance_summary(values, engine.initial_capital, trades, periods_per_year),
+        'drawdown': drawdown_series(equity_curve(values, engine.initial_capital))[1:],
+        'attribution': strategy_attribution(trades, engine.strategy_names),
+        'holding_distribution': holding_distribution(holding_periods(trades, equity['date'])),
+        'monthly_returns': monthly_returns(equity['date'], values, engine.initial_capital),
+    }
+
+
+def print_report(analysis: Dict):
+    """打印 analyze_engine 的结果"""
+    summary = analysis['summary']
+    print("\n=== 绩效分析 ===")
+    print(f"总收益率: {summary['total_return']:.2%}，年化收益率: {summary['annual_return']:.2%}，"
+          f"年化波动率: {summary['volatility']:.2%}")
+    print(f"最大回撤: {summary['max_drawdown']:.2%}（最长 {summary['max_drawdown_days']} 个交易日）")
+    print(f"夏普: {summary['sharpe']:.2f}，索提诺: {summary['sortino']:.2f}，卡玛: {summary['calmar']:.2f}")
+    if 'win_rate' in summary:
+        print(f"成交 {summary['trades']} 笔，平仓 {summary['closed_trades']} 笔，胜率: {summary['win_rate']:.2%}，"
+              f"盈亏比: {summary['profit_factor']:.2f}，手续费: {summary['commission']:,.2f}")
+    if len(analysis['attribution']):
+        print("\n按策略归因:")
+        print(analysis['attribution'].to_string())
+    if len(analysis['holding_distribution']):
+        print("\n持仓交易日数分布:")
+        print(analysis['holding_distribution'].to_string())
+    if len(analysis['monthly_returns']):
+        print("\n月度收益:")
+        print(analysis['monthly_returns'].map(lambda x: f"{x:.2%}" if pd.notna(x) else '').to_string())
@@ -1,19 +1,21 @@
 import os
-import json
-import pandas as pd
 from flask import Flask, render_template, request, jsonify
-import glob
-from datetime import datetime, timedelta
+from datetime import datetime
 import akshare as ak
-import numpy as np
-import sqlite3
 import logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
 import threading
 import sys
 import importlib
 import time
 
+# 添加data_processing目录到Python路径，以便导入列式日线存储
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data_processing'))
+from bar_store import BarStore
+from trading_calendar import get_calendar
+from pool_store import PoolStore
+from auction_cache import AuctionCache
+from data_catalog import DataCatalog
+
 # 初始化Flask应用
 app = Flask(__name__)
 
@@ -31,7 +33,28 @@ print("TDX数据获取器已被禁用")
 
 # TDX连接池和缓存
 tdx_connection = None
-auction_data_cache = {}  # 竞价数据缓存
+
+# 竞价数据持久化缓存（full_stock_data/auction_cache.db），接口与akshare回退的结果共用同一来源标识
+auction_cache = AuctionCache()
+AUCTION_CACHE_SOURCE = 'web-trade'
+
+# 列式日线存储（项目根目录下的full_stock_data）
+bar_store = BarStore()
+
+# 交易日历
+trading_calendar = get_calendar()
+
+# 股票池存储
+pool_store = PoolStore()
+
+# 日线数据目录（每只股票的首末日期、行数、校验和）
+data_catalog = DataCatalog()
+
+# 共享的选股器，首次筛选时创建
+strategy_selector = None
+
+# 共享的竞价查询器（复用竞价缓存和HTTP连接），首次查询时创建
+trade_selector = None
 
 def get_tdx_connection():
     """获取TDX连接，复用现有连接 - 已禁用"""
@@ -53,9 +76,9 @@ def get_call_auction_data(stock_code, date_str):
     from datetime import datetime
     
     # 检查缓存
-    cache_key = f"{stock_code}_{date_str}"
-    if cache_key in auction_data_cache:
-        return auction_data_cache[cache_key]
+    cached = auction_cache.get_auction(stock_code, date_str, AUCTION_CACHE_SOURCE)
+    if cached is not None:
+        return cached
     
     try:
         # 将日期格式从 YYYY-MM-DD 转换为 YYYYMMDD
@@ -95,7 +118,7 @@ def get_call_auction_data(stock_code, date_str):
                             'order': latest_auction.get('Number', 0)
                         }
                         # 缓存结果
-                        auction_data_cache[cache_key] = auction_data
+                        auction_cache.put(stock_code, date_str, auction_data, source=AUCTION_CACHE_SOURCE)
                         return auction_data
 
                     # 如果没有找到竞价时段数据，但有9点时段的数据，取最接近9:26的数据
@@ -116,7 +139,7 @@ def get_call_auction_data(stock_code, date_str):
                             'order': latest_morning.get('Number', 0)
                         }
                         # 缓存结果
-                        auction_data_cache[cache_key] = auction_data
+                        auction_cache.put(stock_code, date_str, auction_data, source=AUCTION_CACHE_SOURCE)
                         return auction_data
 
                     # 如果仍然没有找到早盘数据，取最后一条数据
@@ -129,7 +152,7 @@ def get_call_auction_data(stock_code, date_str):
                         'order': last_trade.get('Number', 0)
                     }
                     # 缓存结果
-                    auction_data_cache[cache_key] = auction_data
+                    auction_cache.put(stock_code, date_str, auction_data, source=AUCTION_CACHE_SOURCE)
                     return auction_data
                 else:
                     print(f"API返回空的交易列表")
@@ -204,8 +227,7 @@ def get_call_auction_data_fallback(stock_code, date_str):
                 }
                 
                 # 缓存结果
-                cache_key = f"{stock_code}_{date_str}"
-                auction_data_cache[cache_key] = result
+                auction_cache.put(stock_code, date_str, result, source=AUCTION_CACHE_SOURCE)
                 return result
             else:
                 # 如果没有9:26之前的数据，尝试重试
@@ -294,296 +316,50 @@ def get_stock_name(stock_code):
     except:
         return f"股票{stock_code}"
 
-def calculate_technical_indicators(df):
-    """计算技术指标"""
-    # 计算移动平均线等技术指标
-    if len(df) >= 5:
-        df['MA5'] = df['close'].rolling(window=5).mean()
-    if len(df) >= 10:
-        df['MA10'] = df['close'].rolling(window=10).mean()
-    if len(df) >= 20:
-        df['MA20'] = df['close'].rolling(window=20).mean()
-    
-    # 计算涨跌幅
-    df['pct_change'] = df['close'].pct_change()
-    
-    return df
-
 @app.route('/')
 def index():
     """渲染主页"""
     return render_template('index.html')
 
+def get_strategy_selector():
+    """获取共享的选股器（策略条件统一由 selection/strategy_rules.py 配置）"""
+    global strategy_selector
+    if strategy_selector is None:
+        selection_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'selection')
+        if selection_path not in sys.path:
+            sys.path.insert(0, selection_path)
+        from select_2026_01_12 import TodayStockSelector
+        strategy_selector = TodayStockSelector()
+    return strategy_selector
+
+def get_trade_selector():
+    """获取共享的竞价查询器（FastWebStrategySelector），避免每次请求重新建立连接"""
+    global trade_selector
+    if trade_selector is None:
+        sys.path.append(os.path.dirname(__file__))  # 添加当前目录到路径
+        fast_selector_module = importlib.import_module('fast_web_strategy')
+        trade_selector = getattr(fast_selector_module, 'FastWebStrategySelector')()
+    return trade_selector
+
 def screen_stocks_by_date(target_date_str, strategy='mixed', max_stocks=200):
     """按指定日期执行股票筛选，输出日志"""
     try:
-        # 将字符串转换为日期对象
-        target_date = datetime.strptime(target_date_str, '%Y-%m-%d')
-        
-        # 计算前一个交易日和前两个交易日
-        prev_date = target_date - timedelta(days=1)
-        while prev_date.weekday() >= 5:  # 跳过周末
-            prev_date -= timedelta(days=1)
-        prev_date_str = prev_date.strftime('%Y-%m-%d')
-        
-        prev_2_date = prev_date - timedelta(days=1)
-        while prev_2_date.weekday() >= 5:  # 跳过周末
-            prev_2_date -= timedelta(days=1)
-        prev_2_date_str = prev_2_date.strftime('%Y-%m-%d')
-        
-        # 获取指定日期的涨停股票数据
-        limit_up_stocks_today = get_limit_up_stocks(target_date_str)
-        limit_up_stocks_yesterday = get_limit_up_stocks(prev_date_str)
-        limit_up_stocks_2_days_ago = get_limit_up_stocks(prev_2_date_str)
-        
-        # 定义数据路径 - 修正为相对于项目根目录的路径
-        DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'full_stock_data', 'daily_data')
-        
-        # 从股票池加载首板股票，只对这些股票进行筛选以提高性能
-        try:
-            pool_data_dir = os.path.join(os.path.dirname(__file__), 'full_stock_data', 'pool_data')
-            pool_file = os.path.join(pool_data_dir, f"pool_{target_date_str}.json")
-            
-            if os.path.exists(pool_file):
-                with open(pool_file, 'r', encoding='utf-8') as f:
-                    pool_data = json.load(f)
-                first_board_stocks = pool_data.get('first_board_stocks', [])
-            else:
-                # 如果没有对应的pool文件，使用传统的扫描方式，但限制数量
-                csv_files = glob.glob(os.path.join(DATA_PATH, "*.csv"))
-                first_board_stocks = []
-                for file_path in csv_files[:max_stocks]:
-                    stock_code = os.path.basename(file_path).replace('.csv', '')
-                    first_board_stocks.append(stock_code)
-        except Exception as e:
-            logger.error(f'加载股票池数据失败: {e}')
-            # 如果加载失败，使用传统的扫描方式
-            csv_files = glob.glob(os.path.join(DATA_PATH, "*.csv"))
-            first_board_stocks = []
-            for file_path in csv_files[:max_stocks]:
-                stock_code = os.path.basename(file_path).replace('.csv', '')
-                first_board_stocks.append(stock_code)
-        
-        # 按策略分类的股票列表
-        sbgk_stocks = []  # 首板高开
-        sbdk_stocks = []  # 首板低开
-        rzq_stocks = []  # 弱转强
-        
-        # 只检查股票池中的股票以提高性能
-        for stock_code in first_board_stocks[:max_stocks]:
-            try:
-                file = os.path.join(DATA_PATH, f"{stock_code}.csv")
-                df = pd.read_csv(file)
-                # 重命名列以处理中文列名
-                df.rename(columns={
-                    '股\u3000\u3000票\u3000\u3000代\u3000\u3000码\u3000': 'code',
-                    '股\u3000票\u3000代\u3000码': 'code',
-                    '开\u3000\u3000盘': 'open',
-                    '开\u3000盘': 'open',
-                    '收\u3000\u3000盘': 'close',
-                    '收\u3000盘': 'close',
-                    '最\u3000\u3000高': 'high',
-                    '最\u3000高': 'high',
-                    '最\u3000\u3000低': 'low',
-                    '最\u3000低': 'low',
-                    '成\u3000\u3000交\u3000量': 'volume',
-                    '成\u3000交\u3000量': 'volume',
-                    '成\u3000\u3000交\u3000额': 'amount',
-                    '成\u3000交\u3000额': 'amount',
-                    '振\u3000\u3000幅': 'amplitude',
-                    '振\u3000幅': 'amplitude',
-                    '涨\u3000\u3000跌\u3000\u3000幅': 'pct_change',
-                    '涨\u3000跌\u3000幅': 'pct_change',
-                    '涨\u3000\u3000跌\u3000\u3000额': 'change',
-                    '涨\u3000跌\u3000额': 'change',
-                    '换\u3000\u3000手\u3000\u3000率': 'turnover',
-                    '换\u3000手\u3000率': 'turnover'
-                }, inplace=True)
-                
-                df = calculate_technical_indicators(df)
-                df['date'] = pd.to_datetime(df['date'])
-                
-                # 查找指定日期的数据
-                day_data = df[df['date'] == pd.to_datetime(target_date_str)]
-                if day_data.empty:
-                    continue
-                
-                day_data = day_data.iloc[0]
-                current_close = float(day_data.get('close', 0)) if pd.notna(day_data.get('close', 0)) else 0
-                
-                if current_close <= 0:  # 无效价格，跳过
-                    continue
-                
-                # 获取股票名称
-                stock_name = get_stock_name(stock_code)
-                
-                # 获取前一个交易日的数据
-                prev_day_data = df[df['date'] < pd.to_datetime(target_date_str)].tail(1)
-                if prev_day_data.empty:
-                    continue
-                
-                prev_close = float(prev_day_data.iloc[0]['close']) if pd.notna(prev_day_data.iloc[0]['close']) else 0
-                current_open = float(day_data.get('open', 0)) if pd.notna(day_data.get('open', 0)) else 0
-                current_high = float(day_data.get('high', 0)) if pd.notna(day_data.get('high', 0)) else 0
-                current_low = float(day_data.get('low', 0)) if pd.notna(day_data.get('low', 0)) else 0
-                current_volume = float(day_data.get('volume', 0)) if pd.notna(day_data.get('volume', 0)) else 0
-                prev_volume = float(prev_day_data.iloc[0]['volume']) if pd.notna(prev_day_data.iloc[0]['volume']) else 1
-                prev_amount = float(prev_day_data.iloc[0]['amount']) if pd.notna(prev_day_data.iloc[0]['amount']) else 0
-                
-                if prev_close == 0:
-                    continue
-                
-                # 使用竞价数据而不是开盘价
-                call_auction_data = get_call_auction_data(stock_code, target_date_str)
-                if call_auction_data is not None:
-                    auction_price = call_auction_data['price']
-                    open_ratio = (auction_price - prev_close) / prev_close  # 使用竞价价格vs前收盘价
-                    current_ratio = auction_price / prev_close  # 使用竞价价格vs前收盘价
-                else:
-                    # Fallback到开盘价
-                    current_open = float(day_data.get('open', 0)) if pd.notna(day_data.get('open', 0)) else 0
-                    open_ratio = (current_open - prev_close) / prev_close
-                    current_ratio = current_open / prev_close if prev_close != 0 else 0
-                
-                # 使用涨停股票列表来判断是否为涨停板（更准确）
-                is_limit_up_today = stock_code in limit_up_stocks_today
-                was_limit_up_yesterday = stock_code in limit_up_stocks_yesterday
-                was_limit_up_2_days_ago = stock_code in limit_up_stocks_2_days_ago
-                
-                # 首板高开条件 - 更接近aa.py的完整逻辑
-                # 1. 昨日涨停，前日未涨停
-                if was_limit_up_yesterday and not was_limit_up_2_days_ago:
-                    # aa.py的首板高开条件：
-                    # 条件一：均价，金额，市值，换手率
-                    # avg_price_increase_value = prev_day_data['money'][0] / prev_day_data['volume'][0] / prev_day_data['close'][0] *1.1 - 1
-                    # 过滤：收盘获利比例低于7%，成交额小于5.5亿或者大于20亿
-                    if prev_volume != 0 and prev_amount != 0:
-                        avg_price = prev_amount / prev_volume
-                        avg_price_increase_value = avg_price / prev_close * 1.1 - 1
-                        condition1_part1 = avg_price_increase_value >= 0.07  # 收盘获利比例 >= 7%
-                    else:
-                        condition1_part1 = True  # 如果金额或成交量为0，跳过此检查
-                    
-                    condition1_part2 = 5.5e8 <= prev_amount <= 20e8  # 成交额在5.5亿-20亿之间
-                    condition1 = condition1_part1 and condition1_part2
-                    
-                    # 条件二：高开,开比
-                    if prev_close != 0:
-                        volume_ratio = current_volume / prev_volume if prev_volume > 0 else 0
-                        condition2_part1 = volume_ratio >= 0.03  # 成交量占比
-                        condition2_part2 = 1 < current_ratio < 1.06  # 高开但未涨停
-                        condition2 = condition2_part1 and condition2_part2
-                    else:
-                        condition2 = False
-                    
-                    # 条件三：左压
-                    # 获取历史数据计算左压条件
-                    # 获取前一日及之前的数据来检查左压条件
-                    hst_data = df[df['date'] <= pd.to_datetime(prev_date_str)]
-                    if len(hst_data) >= 2:
-                        hst = hst_data.tail(101) if len(hst_data) >= 101 else hst_data
-                        if len(hst) >= 2:
-                            # 获取前一日的高点
-                            prev_high = float(hst.iloc[-1]['high']) if pd.notna(hst.iloc[-1]['high']) else 0
-                            
-                            # 计算zyts_0：从倒数第2个开始往前，找到高点大于等于前一日高点的天数
-                            zyts_0 = 100  # 默认值
-                            for i in range(len(hst)-2, -1, -1):  # 从倒数第2个开始往前
-                                if i >= 0 and pd.notna(hst.iloc[i]['high']):
-                                    if float(hst.iloc[i]['high']) >= prev_high:
-                                        zyts_0 = len(hst) - 1 - i  # 计算天数
-                                        break
-                            
-                            zyts = zyts_0 + 5
-                            # 获取高点以来的成交量数据
-                            volume_data = hst['volume'].tail(zyts) if len(hst) >= zyts else hst['volume']
-                            
-                            if len(volume_data) >= 2 and pd.notna(volume_data.iloc[-1]):
-                                max_prev_vol = volume_data.iloc[:-1].max() if len(volume_data) > 1 else volume_data.iloc[0]
-                                # 注意：这里应该是前一日的成交量，而不是当日成交量
-                                current_vol = float(hst.iloc[-1]['volume']) if pd.notna(hst.iloc[-1]['volume']) else 0
-                                
-                                if max_prev_vol > 0:
-                                    condition3 = current_vol > max_prev_vol * 0.9  # 检查前一日的成交量是否放大
-                                else:
-                                    condition3 = True  # 如果前期成交量为0，条件通过
-                            else:
-                                condition3 = True  # 如果数据不足，条件通过
-                        else:
-                            condition3 = True  # 如果数据不足，条件通过
-                    else:
-                        condition3 = True  # 如果数据不足，条件通过
-                    
-                    # 所有条件都满足
-                    if condition1 and condition2 and condition3:
-                        # 检查是否非ST股票等其他条件
-                        if 'ST' not in stock_name and '退' not in stock_name:  # 类似于aa.py的过滤条件
-                            sbgk_stocks.append(stock_code)
-                
-                # 首板低开条件 - 昨日涨停，前日未涨停，今日低开（-9.5%到-3%）
-                elif was_limit_up_yesterday and not was_limit_up_2_days_ago and -0.095 <= open_ratio <= -0.03:
-                    # 类似地应用其他条件，如成交量等
-                    prev_day_volume = float(prev_day_data.iloc[0]['volume']) if pd.notna(prev_day_data.iloc[0]['volume']) else 1
-                    volume_ratio = current_volume / prev_day_volume if prev_day_volume > 0 else 0
-                    if volume_ratio >= 0.03 and 'ST' not in stock_name and '退' not in stock_name:
-                        sbdk_stocks.append(stock_code)
-                
-                # 弱转强条件 - 模拟aa.py中的弱转强逻辑
-                elif len(df) >= 5:
-                    recent_df = df[df['date'] <= pd.to_datetime(target_date_str)].tail(5)
-                    if len(recent_df) >= 5:
-                        past_4_close = recent_df['close'].tail(5).tolist()[:-1]  # 前4天收盘价
-                        current_close_val = float(day_data.get('close', 0))
-                        
-                        if len(set(past_4_close)) > 1:  # 确保不是相同价格
-                            # 检查是否前期涨幅不超过28%
-                            if len(past_4_close) > 1:
-                                increase_ratio = (past_4_close[-1] - past_4_close[0]) / past_4_close[0]
-                                if increase_ratio <= 0.28:  # 前期涨幅不超过28%
-                                    # 检查前一日收盘是否比开盘价高不超过5%
-                                    prev_day_open = float(prev_day_data.iloc[0]['open']) if pd.notna(prev_day_data.iloc[0]['open']) else 0
-                                    if prev_day_open != 0:
-                                        open_close_ratio = (prev_close - prev_day_open) / prev_day_open
-                                        if open_close_ratio >= -0.05:  # 前一日收盘价不低于开盘价5%以上
-                                            # 检查今日是否高开且价格超过前期高点
-                                            if open_ratio > 0.02 and current_close_val > max(past_4_close):
-                                                # 检查成交量是否放大（可选条件）
-                                                prev_day_volume = float(prev_day_data.iloc[0]['volume']) if pd.notna(prev_day_data.iloc[0]['volume']) else 1
-                                                if prev_day_volume > 0 and current_volume / prev_day_volume >= 0.03:  # 成交量占比
-                                                    rzq_stocks.append(stock_code)
-                                
-            except Exception as e:
-                continue  # 跳过有问题的股票文件
-        
-        # 合并所有选中的股票
-        all_qualified = sbgk_stocks + sbdk_stocks + rzq_stocks
-        
+        pool_data = pool_store.load_pool(target_date_str)
+        if not pool_data:
+            logger.error(f'未找到{target_date_str}的股票池数据')
+            return []
+
+        result = get_strategy_selector().select_stocks_from_pool(target_date_str, pool_data)
+        if strategy != 'mixed':
+            result = [r for r in result if r['strategy'] == strategy]
+        if max_stocks is not None:
+            result = result[:max_stocks]
+
         # 记录日志，模仿aa.py的格式
-        logger.info(f'今日选股：{all_qualified}')
-        logger.info(f'首板高开：{sbgk_stocks}')
-        logger.info(f'首板低开：{sbdk_stocks}')
-        logger.info(f'弱转强：{rzq_stocks}')
-        
-        # 返回结果
-        result = []
-        for stock_code in all_qualified:
-            stock_name = get_stock_name(stock_code)
-            if stock_code in sbgk_stocks:
-                strategy_name = 'First Board High Open'
-            elif stock_code in sbdk_stocks:
-                strategy_name = 'First Board Low Open'
-            elif stock_code in rzq_stocks:
-                strategy_name = 'Weak to Strong'
-            else:
-                strategy_name = 'Mixed Strategy'
-            
-            result.append({
-                'code': stock_code,
-                'name': stock_name,
-                'date': target_date_str,
-                'strategy': strategy_name
-            })
-        
+        logger.info(f'今日选股：{[r["code"] for r in result]}')
+        logger.info(f'首板高开：{[r["code"] for r in result if r["strategy"] == "First Board High Open"]}')
+        logger.info(f'首板低开：{[r["code"] for r in result if r["strategy"] == "First Board Low Open"]}')
+        logger.info(f'弱转强：{[r["code"] for r in result if r["strategy"] == "Weak to Strong"]}')
         return result
     except Exception as e:
         logger.error(f'选股过程中出错: {e}')
@@ -626,16 +402,13 @@ def fast_screen_stocks():
             selector = TodayStockSelector()
             
             # 读取指定日期的pool数据
-            pool_file_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'full_stock_data', 'pool_data', f'pool_{target_date}.json')
+            pool_data = pool_store.load_pool(target_date)
             
-            if not os.path.exists(pool_file_path):
+            if not pool_data:
                 return jsonify({
-                    'error': f'未找到{target_date}的pool数据文件: {pool_file_path}'
+                    'error': f'未找到{target_date}的pool数据'
                 }), 404
             
-            with open(pool_file_path, 'r', encoding='utf-8') as f:
-                pool_data = json.load(f)
-            
             start_time = time.time()
             results = selector.select_stocks_from_pool(target_date, pool_data)
             execution_time = time.time() - start_time
@@ -669,225 +442,14 @@ def fast_screen_stocks():
         return jsonify({'error': str(e)}), 500
 
 def load_and_filter_stock_pool(date_str):
-    """从pool_data加载股票池并应用筛选条件"""
-    import pandas as pd
-    
-    # 获取前一个交易日
-    target_date = datetime.strptime(date_str, '%Y-%m-%d')
-    prev_date = target_date - timedelta(days=1)
-    while prev_date.weekday() >= 5:  # 跳过周末
-        prev_date -= timedelta(days=1)
-    prev_date_str = prev_date.strftime('%Y-%m-%d')
-    
-    DATA_PATH = os.path.join(os.path.dirname(__file__), 'full_stock_data', 'daily_data')
-    
-    # 加载pool_data中的首板股票
-    pool_data_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'full_stock_data', 'pool_data')
-    pool_file = os.path.join(pool_data_dir, f"pool_{date_str}.json")
-    
-    if not os.path.exists(pool_file):
-        return []
-    
-    with open(pool_file, 'r', encoding='utf-8') as f:
-        pool_data = json.load(f)
-    
-    first_board_stocks = pool_data.get('first_board_stocks', [])
-    
-    # 从本地数据中获取这些股票的详细信息并应用筛选条件
-    qualified_stocks = []
-    
-    for stock_code in first_board_stocks:
-        try:
-            file_path = os.path.join(DATA_PATH, f"{stock_code}.csv")
-            if not os.path.exists(file_path):
-                # 尝试带交易所后缀的文件名
-                for suffix in ['.XSHG', '.XSHE']:
-                    alt_file_path = os.path.join(DATA_PATH, f"{stock_code}{suffix}.csv")
-                    if os.path.exists(alt_file_path):
-                        file_path = alt_file_path
-                        break
-            
-            if not os.path.exists(file_path):
-                continue
-            
-            df = pd.read_csv(file_path)
-            # 重命名列以处理中文列名
-            df.rename(columns={
-                '股\u3000\u3000票\u3000\u3000代\u3000\u3000码\u3000': 'code',
-                '股\u3000票\u3000代\u3000码': 'code',
-                '开\u3000\u3000盘': 'open',
-                '开\u3000盘': 'open',
-                '收\u3000\u3000盘': 'close',
-                '收\u3000盘': 'close',
-                '最\u3000\u3000高': 'high',
-                '最\u3000高': 'high',
-                '最\u3000\u3000低': 'low',
-                '最\u3000低': 'low',
-                '成\u3000\u3000交\u3000量': 'volume',
-                '成\u3000交\u3000量': 'volume',
-                '成\u3000\u3000交\u3000额': 'amount',
-                '成\u3000交\u3000额': 'amount',
-                '振\u3000\u3000幅': 'amplitude',
-                '振\u3000幅': 'amplitude',
-                '涨\u3000\u3000跌\u3000\u3000幅': 'pct_change',
-                '涨\u3000跌\u3000幅': 'pct_change',
-                '涨\u3000\u3000跌\u3000\u3000额': 'change',
-                '涨\u3000跌\u3000额': 'change',
-                '换\u3000\u3000手\u3000\u3000率': 'turnover',
-                '换\u3000手\u3000率': 'turnover'
-            }, inplace=True)
-            
-            df['date'] = pd.to_datetime(df['date'])
-            df = df.sort_values('date').reset_index(drop=True)
-            
-            # 查找指定日期的数据
-            day_data = df[df['date'] == pd.to_datetime(date_str)]
-            if day_data.empty:
-                continue
-            
-            day_data = day_data.iloc[0]
-            current_close = float(day_data.get('close', 0)) if pd.notna(day_data.get('close', 0)) else 0
-            
-            if current_close <= 0:  # 无效价格，跳过
-                continue
-            
-            # 获取前一个交易日的数据
-            prev_day_data = df[df['date'] < pd.to_datetime(date_str)].tail(1)
-            if prev_day_data.empty:
-                continue
-            
-            prev_close = float(prev_day_data.iloc[0]['close']) if pd.notna(prev_day_data.iloc[0]['close']) else 0
-            current_open = float(day_data.get('open', 0)) if pd.notna(day_data.get('open', 0)) else 0
-            current_high = float(day_data.get('high', 0)) if pd.notna(day_data.get('high', 0)) else 0
-            current_low = float(day_data.get('low', 0)) if pd.notna(day_data.get('low', 0)) else 0
-            current_volume = float(day_data.get('volume', 0)) if pd.notna(day_data.get('volume', 0)) else 0
-            prev_volume = float(prev_day_data.iloc[0]['volume']) if pd.notna(prev_day_data.iloc[0]['volume']) else 1
-            prev_amount = float(prev_day_data.iloc[0]['amount']) if pd.notna(prev_day_data.iloc[0]['amount']) else 0
-            
-            if prev_close == 0:
-                continue
-            
-            # 计算开盘比例
-            open_ratio = (current_open - prev_close) / prev_close
-            current_ratio = current_open / prev_close if prev_close != 0 else 0
-            
-            # 只有在初步筛选通过后，才尝试获取更精确的竞价数据
-            # 以避免对所有股票都进行昂贵的API调用
-            
-            # 首先使用开盘价进行初步筛选
-            # 条件二：高开,开比 - 初步筛选
-            if prev_close != 0:
-                volume_ratio = current_volume / prev_volume if prev_volume > 0 else 0
-                condition2_part1 = volume_ratio >= 0.03  # 成交量占比
-                condition2_part2 = 1 < current_ratio < 1.06  # 高开但未涨停
-                condition2_initial = condition2_part1 and condition2_part2
-            else:
-                condition2_initial = False
-            
-            # 应用首板高开的筛选条件
-            # 条件一：均价，金额，市值，换手率
-            if prev_volume != 0 and prev_amount != 0:
-                avg_price = prev_amount / prev_volume
-                avg_price_increase_value = avg_price / prev_close * 1.1 - 1
-                condition1_part1 = avg_price_increase_value >= 0.07  # 收盘获利比例 >= 7%
-            else:
-                condition1_part1 = True  # 如果金额或成交量为0，跳过此检查
-            
-            condition1_part2 = 5.5e8 <= prev_amount <= 20e8  # 成交额在5.5亿-20亿之间
-            condition1 = condition1_part1 and condition1_part2
-            
-            # 如果初步筛选通过，再尝试获取竞价数据进行精确判断
-            if condition1 and condition2_initial:
-                # 获取竞价数据以进行更精确的判断（使用pytdx如果可用）
-                call_auction_data = None
-                try:
-                    call_auction_data = get_call_auction_data(stock_code, date_str)
-                except:
-                    # 如果获取竞价数据失败，继续使用开盘价数据
-                    call_auction_data = None
-                
-                if call_auction_data is not None:
-                    auction_price = call_auction_data['price']
-                    open_ratio = (auction_price - prev_close) / prev_close  # 使用竞价价格vs前收盘价
-                    current_ratio = auction_price / prev_close  # 使用竞价价格vs前收盘价
-                    
-                    # 使用竞价数据重新计算条件二
-                    volume_ratio = current_volume / prev_volume if prev_volume > 0 else 0
-                    condition2_part1 = volume_ratio >= 0.03  # 成交量占比
-                    condition2_part2 = 1 < current_ratio < 1.06  # 高开但未涨停
-                    condition2 = condition2_part1 and condition2_part2
-                else:
-                    # 如果无法获取竞价数据，使用开盘价数据
-                    condition2 = condition2_initial
-            else:
-                # 如果初步筛选未通过，直接使用计算结果
-                condition2 = condition2_initial
-            
-            # 条件三：左压
-            hst_data = df[df['date'] <= pd.to_datetime(prev_date_str)]
-            if len(hst_data) >= 2:
-                hst = hst_data.tail(101) if len(hst_data) >= 101 else hst_data
-                if len(hst) >= 2:
-                    # 获取前一日的高点
-                    prev_high = float(hst.iloc[-1]['high']) if pd.notna(hst.iloc[-1]['high']) else 0
-                    
-                    # 计算zyts_0：从倒数第2个开始往前，找到高点大于等于前一日高点的天数
-                    zyts_0 = 100  # 默认值
-                    for i in range(len(hst)-2, -1, -1):  # 从倒数第2个开始往前
-                        if i >= 0 and pd.notna(hst.iloc[i]['high']):
-                            if float(hst.iloc[i]['high']) >= prev_high:
-                                zyts_0 = len(hst) - 1 - i  # 计算天数
-                                break
-                    
-                    zyts = zyts_0 + 5
-                    # 获取高点以来的成交量数据
-                    volume_data = hst['volume'].tail(zyts) if len(hst) >= zyts else hst['volume']
-                    
-                    if len(volume_data) >= 2 and pd.notna(volume_data.iloc[-1]):
-                        max_prev_vol = volume_data.iloc[:-1].max() if len(volume_data) > 1 else volume_data.iloc[0]
-                        # 注意：这里应该是前一日的成交量，而不是当日成交量
-                        current_vol = float(hst.iloc[-1]['volume']) if pd.notna(hst.iloc[-1]['volume']) else 0
-                        
-                        if max_prev_vol > 0:
-                            condition3 = current_vol > max_prev_vol * 0.9  # 检查前一日的成交量是否放大
-                        else:
-                            condition3 = True  # 如果前期成交量为0，条件通过
-                    else:
-                        condition3 = True  # 如果数据不足，条件通过
-                else:
-                    condition3 = True  # 如果数据不足，条件通过
-            else:
-                condition3 = True  # 如果数据不足，条件通过
-            
-            # 所有条件都满足
-            if condition1 and condition2 and condition3:
-                # 检查是否非ST股票等其他条件
-                stock_name = get_stock_name(stock_code)
-                if 'ST' not in stock_name and '退' not in stock_name:  # 类似于Web应用的过滤条件
-                    qualified_stocks.append({
-                        'code': stock_code,
-                        'name': stock_name,
-                        'date': date_str,
-                        'strategy': 'First Board High Open'
-                    })
-        
-        except Exception as e:
-            # 如果处理某只股票出错，继续处理下一只
-            continue
-    
-    return qualified_stocks
+    """从股票池加载首板股票并应用首板高开条件"""
+    return screen_stocks_by_date(date_str, strategy='First Board High Open', max_stocks=None)
 
 @app.route('/api/data_status')
 def get_data_status():
-    """获取本地数据状态"""
+    """获取本地数据状态（由数据目录回答，不读取日线文件）"""
     try:
-        import glob
-        from datetime import datetime
-        import pandas as pd
-        
-        daily_data_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'full_stock_data', 'daily_data')
-        
-        if not os.path.exists(daily_data_dir):
+        if not os.path.exists(data_catalog.daily_data_dir):
             return jsonify({
                 'status': 'error',
                 'message': '数据目录不存在',
@@ -895,29 +457,20 @@ def get_data_status():
                 'total_stocks': 0
             })
         
-        # 获取所有CSV文件
-        csv_files = glob.glob(os.path.join(daily_data_dir, "*.csv"))
-        
-        # 获取最新数据日期
-        latest_date = None
-        for file in csv_files[:100]:  # 只检查前100个文件以提高性能
-            try:
-                df = pd.read_csv(file)
-                if 'date' in df.columns:
-                    df['date'] = pd.to_datetime(df['date'])
-                    file_latest = df['date'].max()
-                    if latest_date is None or file_latest > latest_date:
-                        latest_date = file_latest
-            except:
-                continue
-        
-        latest_date_str = latest_date.strftime('%Y-%m-%d') if latest_date else 'N/A'
+        # 目录为空（尚未建立）时先扫描一次
+        if data_catalog.is_empty():
+            data_catalog.refresh()
+        summary = data_catalog.summary()
+        latest_date_str = summary['latest_date'] or 'N/A'
         
         return jsonify({
             'status': 'success',
             'latest_date': latest_date_str,
-            'total_stocks': len(csv_files),
-            'message': f'数据最新到 {latest_date_str}，共 {len(csv_files)} 只股票'
+            'total_stocks': summary['total_stocks'],
+            'up_to_date_stocks': summary['up_to_date_stocks'],
+            'total_rows': summary['total_rows'],
+            'last_fetch': summary['last_fetch'],
+            'message': f"数据最新到 {latest_date_str}，共 {summary['total_stocks']} 只股票"
         })
     except Exception as e:
         return jsonify({
@@ -941,15 +494,8 @@ def get_trade_data():
         if not code:
             return jsonify({'error': '股票代码不能为空'}), 400
         
-        # 动态导入FastWebStrategySelector
-        sys.path.append(os.path.dirname(__file__))  # 添加当前目录到路径
-        fast_selector_module = importlib.import_module('fast_web_strategy')
-        FastWebStrategySelector = getattr(fast_selector_module, 'FastWebStrategySelector')
-        
-        selector = FastWebStrategySelector()
-        
-        # 获取竞价数据
-        auction_data = selector.get_trade_data(code, date)
+        # 获取竞价数据（共享的查询器，经本地竞价缓存）
+        auction_data = get_trade_selector().get_trade_data(code, date)
         
         if auction_data is not None:
             return jsonify({
@@ -1068,19 +614,9 @@ def generate_stock_pool():
 def load_stock_pool():
     """加载股票池"""
     try:
-        import sys
-        import os
-        # 添加data_processing目录到Python路径
-        data_proc_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data_processing')
-        if data_proc_path not in sys.path:
-            sys.path.insert(0, data_proc_path)
-        
-        from stock_pool_generator import StockPoolGenerator
-        
         date_str = request.args.get('date', datetime.now().strftime('%Y-%m-%d'))
         
-        generator = StockPoolGenerator()
-        pool_data = generator.load_stock_pool(date_str)
+        pool_data = pool_store.load_pool(date_str)
         
         if not pool_data:
             return jsonify({
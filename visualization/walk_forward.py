@@ -0,0 +1,196 @@
+"""
+滚动窗口 / 前推（walk-forward）回测
+把回测区间切成若干 训练窗口 + 测试窗口：在训练窗口上从候选参数中选出指标最好的一组，再在紧随其后的测试窗口上
+检验样本外表现，窗口按步长前移，最后把各测试窗口的收益串成一条样本外权益曲线。
+行情矩阵和全部候选股票的选股指标只加载、计算一次；每组参数的信号矩阵覆盖全部日期，生成一次后缓存，
+各窗口共用，每个窗口只重新模拟组合（撮合和记账），总耗时约等于一次全量回测加上各窗口的撮合
+"""
+
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+_project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(_project_root, 'data_processing'))
+sys.path.insert(0, os.path.join(_project_root, 'selection'))
+from bar_store import _default_data_dir
+from strategy_rules import compile_strategies
+from panel_backtest import PanelStrategySimulator
+from parameter_sweep import DEFAULT_SPACE, apply_params, grid_configs
+from performance_analytics import performance_summary
+
+# 训练窗口、测试窗口的默认交易日数
+TRAIN_DAYS = 120
+TEST_DAYS = 40
+
+
+def walk_forward_windows(dates: List[str], train_days: int = TRAIN_DAYS, test_days: int = TEST_DAYS,
+                         step_days: int = None, anchored: bool = False) -> List[Tuple[str, str, str, str]]:
+    """
+    切分训练/测试窗口
+    :param dates: 升序的交易日
+    :param step_days: 窗口前移的交易日数，默认等于测试窗口（测试窗口首尾相接、互不重叠）
+    :param anchored: 为True时训练窗口起点固定在第一个交易日（扩展窗口），否则为固定长度的滚动窗口
+    :return: [(训练开始, 训练结束, 测试开始, 测试结束)]，最后一个测试窗口可能不足 test_days
+    """
+    step_days = step_days or test_days
+    windows = []
+    for train_start in range(0, len(dates) - train_days, step_days):
+        test_start = train_start + train_days
+        test_end = min(test_start + test_days, len(dates)) - 1
+        windows.append((dates[0 if anchored else train_start], dates[test_start - 1],
+                        dates[test_start], dates[test_end]))
+    return windows
+
+
+def _config_key(config: Dict) -> Tuple:
+    return tuple(sorted(config.items()))
+
+
+class WalkForwardBacktest:
+    """前推回测：候选参数的信号矩阵各生成一次，按窗口只重新模拟组合"""
+
+    def __init__(self, start_date: str, end_date: str, data_dir=None, train_days: int = TRAIN_DAYS,
+                 test_days: int = TEST_DAYS, step_days: int = None, anchored: bool = False,
+                 metric: str = 'sharpe', **simulator_params):
+        """
+        :param metric: 训练窗口上选参数的指标（performance_summary 的键，越大越好）
+        :param simulator_params: 传给 PanelStrategySimulator 的资金、费率等参数
+        """
+        if data_dir is None:
+            data_dir = _default_data_dir()
+        self.data_dir = data_dir
+        self.start_date = start_date
+        self.end_date = end_date
+        self.train_days = train_days
+        self.test_days = test_days
+        self.step_days = step_days
+        self.anchored = anchored
+        self.metric = metric
+        self.simulator = PanelStrategySimulator(data_dir, **simulator_params)
+        self.initial_capital = self.simulator.engine_params['initial_capital']
+
+        # 参数 -> 信号矩阵（与窗口无关）；(参数, 开始, 结束) -> 绩效（重叠的窗口不重复模拟）
+        self._signals = {}
+        self._summaries = {}
+        self.simulations = 0
+
+    def windows(self) -> List[Tuple[str, str, str, str]]:
+        """回测区间内的训练/测试窗口"""
+        dates = [d for d in self.simulator.load()['dates'] if self.start_date <= d <= self.end_date]
+        return walk_forward_windows(dates, self.train_days, self.test_days, self.step_days, self.anchored)
+
+    def signals_for(self, config: Dict) -> Dict[str, np.ndarray]:
+        """某组参数的全部日期信号（首次使用时生成）"""
+        key = _config_key(config)
+        if key not in self._signals:
+            signals = self.simulator.generate_signals(compile_strategies(apply_params(config)))
+            # 信号很稀疏，缓存入选的 (日期行号, 股票列号)，参数组数多时也不占用大块内存
+            self._signals[key] = {name: np.nonzero(matrix) for name, matrix in signals.items()}
+        shape = self.simulator.load()['rows'].shape
+        signals = {}
+        for name, index in self._signals[key].items():
+            signals[name] = np.zeros(shape, dtype=bool)
+            signals[name][index] = True
+        return signals
+
+    def simulate(self, config: Dict, start_date: str, end_date: str) -> Dict:
+        """用缓存的信号模拟一个窗口，返回 run_backtest 的结果"""
+        self.simulator.signals = self.signals_for(config)
+        self.simulations += 1
+        return self.simulator.run_backtest(start_date, end_date)
+
+    def evaluate(self, config: Dict, start_date: str, end_date: str) -> Dict:
+        """某组参数在一个窗口上的绩效（相同参数和区间只模拟一次）"""
+        key = (_config_key(config), start_date, end_date)
+        if key not in self._summaries:
+            results = self.simulate(config, start_date, end_date)
+            self._summaries[key] = performance_summary(results['portfolio_values'], self.initial_capital,
+                                                       self.simulator.backtest_engine.ledger.trades)
+        return self._summaries[key]
+
+    def run(self, configs: List[Dict]) -> Tuple[pd.DataFrame, pd.Series]:
+        """
+        前推回测
+        :param configs: 候选参数（parameter_sweep 的参数名格式），只有一组时即为固定参数的滚动窗口回测
+        :return: (每个窗口一行：窗口日期、选中的参数、训练指标、测试绩效；样本外权益曲线)
+        """
+        if not configs:
+            raise ValueError("至少需要一组参数")
+        for config in configs:
+            apply_params(config)  # 先校验参数名
+        start_time = time.time()
+        windows = self.windows()
+        print(f"开始前推回测: {len(windows)} 个窗口 × {len(configs)} 组参数，{self.start_date} 到 {self.end_date}")
+
+        self.simulator.verbose = False
+        rows = []
+        oos_dates, oos_returns = [], []
+        try:
+            for train_start, train_end, test_start, test_end in windows:
+                scores = [self.evaluate(config, train_start, train_end)[self.metric] for config in configs]
+                best = int(np.argmax(scores))
+                results = self.simulate(configs[best], test_start, test_end)
+                summary = performance_summary(results['portfolio_values'], self.initial_capital,
+                                              self.simulator.backtest_engine.ledger.trades)
+
+                row = {'train_start': train_start, 'train_end': train_end,
+                       'test_start': test_start, 'test_end': test_end,
+                       'config': best, f'train_{self.metric}': scores[best]}
+                row.update(configs[best])
+                row.update({f'test_{name}': value for name, value in summary.items()})
+                rows.append(row)
+
+                # 各测试窗口都从初始资金开始，按日收益率串联成样本外权益曲线
+                equity = np.concatenate([[self.initial_capital], results['portfolio_values']])
+                oos_dates.extend(results['dates'])
+                oos_returns.append(equity[1:] / equity[:-1])
+        finally:
+            self.simulator.verbose = True
+
+        table = pd.DataFrame(rows)
+        growth = np.concatenate(oos_returns) if oos_returns else np.array([])
+        oos_equity = pd.Series(self.initial_capital * np.cumprod(growth), index=pd.Index(oos_dates, name='date'),
+                               name='portfolio_value')
+        print(f"前推回测完成，{len(self._signals)} 组信号，{self.simulations} 次组合模拟，"
+              f"耗时: {time.time() - start_time:.2f}秒")
+        return table, oos_equity
+
+    def save(self, table: pd.DataFrame, path: str = None) -> str:
+        """保存窗口结果表（默认 full_stock_data/sweep_results/walk_forward_<时间>.csv）"""
+        if path is None:
+            result_dir = os.path.join(self.data_dir, "sweep_results")
+            os.makedirs(result_dir, exist_ok=True)
+            path = os.path.join(result_dir, f"walk_forward_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+        table.to_csv(path, index=False, encoding='utf-8-sig')
+        print(f"前推回测结果已保存: {path}")
+        return path
+
+
+def main():
+    """命令行：python walk_forward.py [开始日期] [结束日期] [训练交易日数] [测试交易日数]"""
+    args = sys.argv[1:]
+    start_date = args[0] if len(args) > 0 else "2024-01-01"
+    end_date = args[1] if len(args) > 1 else "2025-12-31"
+    train_days = int(args[2]) if len(args) > 2 else TRAIN_DAYS
+    test_days = int(args[3]) if len(args) > 3 else TEST_DAYS
+
+    walk_forward = WalkForwardBacktest(start_date, end_date, train_days=train_days, test_days=test_days)
+    table, oos_equity = walk_forward.run(grid_configs(DEFAULT_SPACE))
+    columns = ['train_start', 'test_start', 'test_end', f'train_{walk_forward.metric}',
+               'test_total_return', 'test_max_drawdown', 'test_sharpe', 'test_trades']
+    print(table[columns].to_string())
+    if len(oos_equity):
+        summary = performance_summary(oos_equity.to_numpy(), walk_forward.initial_capital)
+        print(f"样本外总收益率: {summary['total_return']:.2%}，最大回撤: {summary['max_drawdown']:.2%}，"
+              f"夏普: {summary['sharpe']:.2f}")
+    walk_forward.save(table)
+
+
+if __name__ == "__main__":
+    main()